@@ -12,10 +12,13 @@ from nove.config import settings
 from nove.database import Base
 
 # Import all models so Alembic sees them
-from nove.coach.models import Conversation, Message  # noqa: F401
+from nove.billing.models import UsageEvent, UsagePeriodTotal  # noqa: F401
+from nove.coach.models import Conversation, MemoryDocument, Message  # noqa: F401
 from nove.garmin.models import GarminConnection, GarminDataPoint  # noqa: F401
 from nove.labs.models import LabBiomarkerValue, LabOrder, LabPanel, LabPartner, LabResult  # noqa: F401
+from nove.notifications.models import Notification  # noqa: F401
 from nove.users.models import User, UserHealthProfile  # noqa: F401
+from nove.worker.models import CheckInBatch  # noqa: F401
 
 config = context.config
 # Escape % for configparser interpolation (e.g. %40 in URL-encoded passwords)
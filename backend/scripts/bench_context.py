@@ -0,0 +1,194 @@
+# ABOUTME: Benchmark for coach context assembly latency (time spent before the model call).
+# ABOUTME: Runs the same build_context call on one connection at a time and on pooled sessions.
+"""Usage: uv run python scripts/bench_context.py [--iterations 50] [--rtt-ms 5]
+
+Seeds a throwaway user with a profile, Garmin data, lab values and a 50-message
+conversation, then times cold-cache ``build_context`` (recall included) twice:
+once with its sessions forced to take turns on a single connection, and once as
+it runs in the app. Both do exactly the same queries. ``--rtt-ms`` adds a
+simulated network round-trip per query, which is what dominates against a
+remote database. The peak number of pooled connections checked out is reported
+alongside the latencies.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import UTC, date, datetime, timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove.coach import context_cache
+from nove.coach.models import Conversation, Message
+from nove.coach.service import build_context
+from nove.database import engine
+from nove.garmin.models import GarminConnection, GarminDataPoint
+from nove.labs.models import LabBiomarkerValue, LabResult
+from nove.users.models import User, UserHealthProfile
+
+
+class _Probe:
+    """Tracks the most pooled connections checked out at once."""
+
+    def __init__(self) -> None:
+        self.peak = 0
+
+    def sample(self) -> None:
+        self.peak = max(self.peak, engine.pool.checkedout())  # type: ignore[attr-defined]
+
+
+def _bench_session(rtt: float, probe: _Probe, lock: asyncio.Lock | None) -> type[AsyncSession]:
+    """A session class that adds ``rtt`` per query; with ``lock``, one session at a time."""
+
+    class BenchSession(AsyncSession):
+        async def __aenter__(self):  # type: ignore[no-untyped-def]
+            if lock is not None:
+                await lock.acquire()
+            return await super().__aenter__()
+
+        async def __aexit__(self, *exc):  # type: ignore[no-untyped-def]
+            try:
+                await super().__aexit__(*exc)
+            finally:
+                if lock is not None:
+                    lock.release()
+
+        async def execute(self, *args, **kwargs):  # type: ignore[no-untyped-def]
+            await asyncio.sleep(rtt)
+            result = await super().execute(*args, **kwargs)
+            probe.sample()
+            return result
+
+        async def scalar(self, *args, **kwargs):  # type: ignore[no-untyped-def]
+            await asyncio.sleep(rtt)
+            result = await super().scalar(*args, **kwargs)
+            probe.sample()
+            return result
+
+        async def get(self, *args, **kwargs):  # type: ignore[no-untyped-def]
+            await asyncio.sleep(rtt)
+            result = await super().get(*args, **kwargs)
+            probe.sample()
+            return result
+
+    return BenchSession
+
+
+async def _seed(factory: async_sessionmaker[AsyncSession]) -> tuple[User, uuid.UUID]:
+    async with factory() as db:
+        user = User(
+            email=f"bench-{uuid.uuid4().hex[:8]}@example.com",
+            full_name="Bench User",
+            health_goals=["dormir mejor"],
+        )
+        db.add(user)
+        await db.flush()
+        db.add(UserHealthProfile(user_id=user.id, lifestyle_notes={"diet": "mixta"}))
+        db.add(
+            GarminConnection(
+                user_id=user.id,
+                garmin_user_id=f"bench-{uuid.uuid4().hex[:8]}",
+                access_token="x",
+                refresh_token="x",
+                token_expires_at=datetime.now(UTC) + timedelta(days=1),
+            )
+        )
+        for i in range(7):
+            day = date.today() - timedelta(days=i)
+            db.add(
+                GarminDataPoint(
+                    user_id=user.id, data_type="sleep", date=day, data={"durationInSeconds": 25000}
+                )
+            )
+            db.add(
+                GarminDataPoint(
+                    user_id=user.id, data_type="activity", date=day, data={"steps": 8000}
+                )
+            )
+        result = LabResult(user_id=user.id, processing_status="verified")
+        db.add(result)
+        await db.flush()
+        for i in range(30):
+            db.add(
+                LabBiomarkerValue(
+                    result_id=result.id,
+                    user_id=user.id,
+                    biomarker_code=f"BM{i}",
+                    biomarker_name=f"Biomarcador {i}",
+                    value=float(i),
+                    unit="mg/dL",
+                    status="normal",
+                    date=date.today(),
+                )
+            )
+        conversation = Conversation(user_id=user.id, title="Bench")
+        db.add(conversation)
+        await db.flush()
+        # Distinct timestamps keep the window in order, so it fits without a summary refresh
+        started = datetime.now(UTC) - timedelta(hours=1)
+        for i in range(50):
+            db.add(
+                Message(
+                    conversation_id=conversation.id,
+                    role="user" if i % 2 == 0 else "assistant",
+                    content=f"Mensaje {i} " * 20,
+                    created_at=started + timedelta(seconds=i),
+                )
+            )
+        await db.commit()
+        return user, conversation.id
+
+
+async def _time(fn, iterations: int) -> list[float]:  # type: ignore[no-untyped-def]
+    samples = []
+    for _ in range(iterations):
+        context_cache.clear()
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _report(label: str, samples: list[float], probe: _Probe) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(0.95 * (len(samples) - 1))]
+    print(
+        f"{label:<12} p50={statistics.median(samples):7.2f}ms  p95={p95:7.2f}ms"
+        f"  peak connections={probe.peak}"
+    )
+
+
+async def main(iterations: int, rtt_ms: float) -> None:
+    user, conversation_id = await _seed(async_sessionmaker(engine, expire_on_commit=False))
+    query = "como va mi sueno y mi glucosa"
+    rtt = rtt_ms / 1000
+    try:
+        results = []
+        for label, lock in (("one conn", asyncio.Lock()), ("pooled", None)):
+            probe = _Probe()
+            factory = async_sessionmaker(
+                engine, expire_on_commit=False, class_=_bench_session(rtt, probe, lock)
+            )
+            samples = await _time(
+                lambda f=factory: build_context(user, conversation_id, f, query), iterations
+            )
+            results.append((label, samples, probe))
+        print(f"build_context, cold cache, {iterations} iterations, rtt={rtt_ms}ms")
+        for label, samples, probe in results:
+            _report(label, samples, probe)
+    finally:
+        async with async_sessionmaker(engine)() as db:
+            await db.execute(delete(User).where(User.id == user.id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.rtt_ms))
@@ -0,0 +1,108 @@
+# ABOUTME: Benchmark for coach long-term memory retrieval latency over a large message history.
+# ABOUTME: Seeds one user with N synthetic memory documents and times memory.search per query.
+"""Usage: uv run python scripts/bench_memory.py [--documents 100000] [--iterations 50]
+
+Documents are random sentences over a small health vocabulary, so common words
+match tens of thousands of rows and rare ones a handful: the worst and best
+cases for the candidate scan. The user and its documents are deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, insert, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from nove.coach import memory
+from nove.coach.models import MemoryDocument
+from nove.database import engine
+from nove.users.models import User
+
+COMMON = ["dormir", "sueno", "cansado", "correr", "comer", "agua", "estres", "trabajo"]
+RARE = ["rodilla", "tiroides", "migrana", "ferritina", "colesterol", "ayuno", "magnesio"]
+FILLER = ["hoy", "ayer", "semana", "mucho", "poco", "bien", "mal", "siempre", "nunca", "mejor"]
+QUERIES = [
+    "como puedo dormir mejor si estoy cansado",
+    "me duele la rodilla al correr",
+    "que significa mi ferritina baja",
+    "ideas para bajar el estres del trabajo",
+]
+BATCH = 5_000
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(FILLER, k=rng.randint(6, 30)) + rng.choices(COMMON, k=rng.randint(1, 4))
+    if rng.random() < 0.02:
+        words.append(rng.choice(RARE))
+    rng.shuffle(words)
+    return " ".join(words).capitalize() + "."
+
+
+async def _seed(factory: async_sessionmaker, documents: int) -> User:
+    rng = random.Random(7)
+    started = datetime.now(UTC) - timedelta(days=365)
+    async with factory() as db:
+        user = User(email=f"bench-{uuid.uuid4().hex[:8]}@example.com", full_name="Bench User")
+        db.add(user)
+        await db.flush()
+        for offset in range(0, documents, BATCH):
+            await db.execute(
+                insert(MemoryDocument),
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "user_id": user.id,
+                        "source": "user" if i % 2 == 0 else "assistant",
+                        "source_id": uuid.uuid4(),
+                        "language": "es",
+                        "content": _sentence(rng),
+                        "created_at": started + timedelta(minutes=5 * i),
+                    }
+                    for i in range(offset, min(offset + BATCH, documents))
+                ],
+            )
+        await db.commit()
+        # Candidate selection reads lexeme frequencies from the planner statistics
+        await db.execute(text("ANALYZE memory_documents"))
+        await db.commit()
+        return user
+
+
+def _report(label: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(0.95 * (len(samples) - 1))]
+    print(f"{label:<45} p50={statistics.median(samples):7.2f}ms  p95={p95:7.2f}ms")
+
+
+async def main(documents: int, iterations: int) -> None:
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    seeded = time.perf_counter()
+    user = await _seed(factory, documents)
+    print(f"seeded {documents} documents in {time.perf_counter() - seeded:.1f}s")
+    try:
+        for query in QUERIES:
+            samples = []
+            async with factory() as db:
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    await memory.search(db, user.id, query)
+                    samples.append((time.perf_counter() - started) * 1000)
+            _report(query, samples)
+    finally:
+        async with factory() as db:
+            await db.execute(delete(User).where(User.id == user.id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.documents, args.iterations))
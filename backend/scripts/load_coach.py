@@ -0,0 +1,238 @@
+# ABOUTME: Load driver for the coach chat endpoint: N concurrent SSE sessions against the API.
+# ABOUTME: Seeds throwaway users, streams turns, reports TTFT, throughput and server saturation.
+"""Usage: uv run python scripts/load_coach.py [--sessions 50] [--turns 3] [--history 40]
+    [--base-url http://127.0.0.1:8000]
+
+Hermetic setup, three shells with the same DATABASE_URL and JWT_SECRET_KEY:
+
+    uv run python -m nove.devtools.fake_anthropic --ttft 0.5 --tokens-per-second 40
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8090 ANTHROPIC_API_KEY=fake \\
+        uv run uvicorn nove.main:app --port 8000
+    uv run python scripts/load_coach.py --sessions 50
+
+Each session is one seeded user with a ``--history``-message conversation. It
+opens the conversation (GET messages), then sends ``--turns`` messages one
+after another, timing the first delta of each reply. Server-side event-loop
+lag, pool usage and LLM queueing come from /metrics, so restart the API
+between runs for clean numbers. Seeded users are deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime, timedelta
+
+import httpx
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from nove.auth.service import create_access_token
+from nove.coach.models import Conversation, Message
+from nove.database import engine
+from nove.garmin.models import GarminDataPoint
+from nove.users.models import User, UserHealthProfile
+
+PREFIX = "/api/v1"
+MESSAGES = [
+    "Hola, como dormi esta semana?",
+    "Que puedo hacer para tener mas energia en las tardes?",
+    "gracias",
+    "Y si camino despues de comer, ayuda con la glucosa?",
+]
+# Server series worth reading after a run, by name prefix
+SERVER_TIMINGS = (
+    "event_loop_lag_ms",
+    "db_pool_checked_out",
+    "llm_queue_ms",
+    "coach_context_ms",
+    "coach_ttft_ms",
+    "coach_latency_ms",
+)
+
+
+@dataclass
+class Results:
+    ttft_ms: list[float] = field(default_factory=list)
+    turn_ms: list[float] = field(default_factory=list)
+    open_ms: list[float] = field(default_factory=list)
+    words: int = 0
+    errors: dict[str, int] = field(default_factory=dict)
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+async def _seed(sessions: int, history: int) -> list[tuple[uuid.UUID, uuid.UUID]]:
+    tag = uuid.uuid4().hex[:8]
+    users = [
+        {
+            "id": uuid.uuid4(),
+            "email": f"load-{tag}-{i}@example.com",
+            "full_name": f"Load User {i}",
+            "onboarding_completed": True,
+            "health_goals": ["dormir mejor"],
+        }
+        for i in range(sessions)
+    ]
+    conversations = [{"id": uuid.uuid4(), "user_id": u["id"], "title": "Carga"} for u in users]
+    started = datetime.now(UTC) - timedelta(days=1)
+    messages = [
+        {
+            "conversation_id": c["id"],
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"Mensaje {i} " * 20,
+            "created_at": started + timedelta(minutes=i),
+        }
+        for c in conversations
+        for i in range(history)
+    ]
+    sleep = [
+        {
+            "user_id": u["id"],
+            "data_type": "sleep",
+            "date": date.today() - timedelta(days=d),
+            "data": {"durationInSeconds": 25000},
+        }
+        for u in users
+        for d in range(7)
+    ]
+    async with async_sessionmaker(engine)() as db:
+        await db.execute(insert(User), users)
+        await db.execute(insert(UserHealthProfile), [{"user_id": u["id"]} for u in users])
+        await db.execute(insert(Conversation), conversations)
+        if messages:
+            await db.execute(insert(Message), messages)
+        await db.execute(insert(GarminDataPoint), sleep)
+        await db.commit()
+    return [(u["id"], c["id"]) for u, c in zip(users, conversations, strict=True)]
+
+
+async def _turn(
+    client: httpx.AsyncClient, url: str, headers: dict, content: str, results: Results
+) -> None:
+    started = time.perf_counter()
+    first = None
+    event = ""
+    try:
+        async with client.stream("POST", url, json={"content": content}, headers=headers) as resp:
+            if resp.status_code != 200:
+                results.error(f"http_{resp.status_code}")
+                return
+            async for line in resp.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: ") :]
+                elif line.startswith("data: ") and event == "delta":
+                    if first is None:
+                        first = time.perf_counter()
+                    results.words += len(json.loads(line[len("data: ") :])["text"].split())
+                elif line.startswith("data: ") and event == "error":
+                    results.error("stream_error")
+                    return
+    except httpx.HTTPError as exc:
+        results.error(type(exc).__name__)
+        return
+    if first is None:
+        results.error("no_delta")
+        return
+    results.ttft_ms.append((first - started) * 1000)
+    results.turn_ms.append((time.perf_counter() - started) * 1000)
+
+
+async def _session(
+    client: httpx.AsyncClient,
+    user_id: uuid.UUID,
+    conversation_id: uuid.UUID,
+    turns: int,
+    results: Results,
+) -> None:
+    headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+    url = f"{PREFIX}/conversations/{conversation_id}/messages"
+
+    started = time.perf_counter()
+    try:
+        resp = await client.get(url, headers=headers)
+    except httpx.HTTPError as exc:
+        results.error(type(exc).__name__)
+        return
+    if resp.status_code != 200:
+        results.error(f"open_http_{resp.status_code}")
+        return
+    results.open_ms.append((time.perf_counter() - started) * 1000)
+
+    for i in range(turns):
+        await _turn(client, url, headers, MESSAGES[i % len(MESSAGES)], results)
+
+
+def _report(label: str, samples: list[float]) -> None:
+    if not samples:
+        print(f"{label:<22} no samples")
+        return
+    samples = sorted(samples)
+    p95 = samples[int(0.95 * (len(samples) - 1))]
+    p99 = samples[int(0.99 * (len(samples) - 1))]
+    print(
+        f"{label:<22} p50={statistics.median(samples):8.1f}  p95={p95:8.1f}  "
+        f"p99={p99:8.1f}  max={samples[-1]:8.1f}"
+    )
+
+
+def _report_server(snapshot: dict) -> None:
+    print("server (since start):")
+    for key, timing in sorted(snapshot["timings"].items()):
+        if key.startswith(SERVER_TIMINGS):
+            print(
+                f"  {key:<36} p50={timing['p50']:8.1f}  p95={timing['p95']:8.1f}  "
+                f"max={timing['max']:8.1f}  n={timing['count']}"
+            )
+    size = snapshot["gauges"].get("db_pool_size")
+    peak = snapshot["timings"].get("db_pool_checked_out", {}).get("max")
+    if size and peak is not None:
+        print(f"  db pool peak {peak:.0f} checked out of {size:.0f} (+ overflow)")
+
+
+async def main(args: argparse.Namespace) -> None:
+    pairs = await _seed(args.sessions, args.history)
+    results = Results()
+    limits = httpx.Limits(max_connections=args.sessions + 10)
+    timeout = httpx.Timeout(args.timeout)
+    try:
+        async with httpx.AsyncClient(
+            base_url=args.base_url, limits=limits, timeout=timeout
+        ) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(_session(client, u, c, args.turns, results) for u, c in pairs))
+            elapsed = time.perf_counter() - started
+            snapshot = (await client.get("/metrics")).json()
+
+        print(
+            f"{args.sessions} sessions x {args.turns} turns, "
+            f"{args.history} history messages, {elapsed:.1f}s"
+        )
+        _report("open (GET) ms", results.open_ms)
+        _report("ttft ms", results.ttft_ms)
+        _report("turn ms", results.turn_ms)
+        print(
+            f"throughput             {len(results.turn_ms) / elapsed:8.1f} turns/s  "
+            f"{results.words / elapsed:8.1f} words/s"
+        )
+        print(f"errors                 {results.errors or 'none'}")
+        _report_server(snapshot)
+    finally:
+        async with async_sessionmaker(engine)() as db:
+            await db.execute(delete(User).where(User.id.in_([u for u, _ in pairs])))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--history", type=int, default=40)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main(parser.parse_args()))
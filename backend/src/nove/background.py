@@ -0,0 +1,41 @@
+# ABOUTME: Fire-and-forget background tasks that outlive the request that spawned them.
+# ABOUTME: Keeps strong references, logs failures, and drains pending work on shutdown.
+
+import asyncio
+from collections.abc import Coroutine
+from typing import Any
+
+import structlog
+
+logger = structlog.get_logger()
+
+_tasks: set[asyncio.Task[Any]] = set()
+
+
+def spawn(coro: Coroutine[Any, Any, Any], name: str) -> asyncio.Task[Any]:
+    """Run a coroutine in the background without awaiting it."""
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
+
+
+def _on_done(task: asyncio.Task[Any]) -> None:
+    _tasks.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logger.error("background_task_failed", task=task.get_name(), exc_info=exc)
+
+
+async def drain(timeout: float = 10.0) -> None:
+    """Wait for pending background tasks, cancelling whatever is still running at timeout."""
+    if not _tasks:
+        return
+    _, pending = await asyncio.wait(set(_tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+        logger.warning("background_tasks_cancelled", count=len(pending))
@@ -0,0 +1,58 @@
+# ABOUTME: Subscription tier quotas, checked against the user's running monthly usage total.
+# ABOUTME: A check is one primary-key read of usage_period_totals; the ledger is never summed.
+
+import uuid
+from datetime import date
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from nove import metrics
+from nove.billing.models import UsagePeriodTotal
+from nove.billing.usage import current_period
+from nove.config import settings
+from nove.users.models import User
+
+
+class QuotaExceededError(Exception):
+    """The user has used up their tier's monthly allowance."""
+
+    def __init__(self, tier: str, limit: int, used: int) -> None:
+        super().__init__(f"{tier} quota of {limit} tokens reached")
+        self.tier = tier
+        self.limit = limit
+        self.used = used
+
+
+def monthly_limit(tier: str) -> int | None:
+    """Tokens a tier may use per month, or None for no limit. Unknown tiers get free's."""
+    limits = {
+        "free": settings.billing_free_monthly_tokens,
+        "plus": settings.billing_plus_monthly_tokens,
+        "pro": settings.billing_pro_monthly_tokens,
+    }
+    return limits.get(tier, settings.billing_free_monthly_tokens) or None
+
+
+async def period_total(
+    db: AsyncSession, user_id: uuid.UUID, period: date | None = None
+) -> UsagePeriodTotal | None:
+    """The user's running total for ``period`` (this month by default)."""
+    return await db.get(
+        UsagePeriodTotal, (user_id, period or current_period()), populate_existing=True
+    )
+
+
+async def check(db: AsyncSession, user: User) -> None:
+    """Raise QuotaExceededError if ``user`` is at their tier's monthly limit.
+
+    Totals trail the ledger by one background batch, so a user can go a turn
+    or two past the limit; that is the price of never blocking on the write.
+    """
+    limit = monthly_limit(user.tier)
+    if limit is None:
+        return
+    total = await period_total(db, user.id)
+    used = total.tokens if total is not None else 0
+    if used >= limit:
+        metrics.incr("billing_quota_rejected", tier=user.tier)
+        raise QuotaExceededError(user.tier, limit, used)
@@ -0,0 +1,26 @@
+# ABOUTME: Billing API endpoints.
+# ABOUTME: GET /billing/usage reports this month's metered usage against the tier quota.
+
+from fastapi import APIRouter
+
+from nove.billing import quota
+from nove.billing.schemas import UsageRead
+from nove.billing.usage import current_period
+from nove.deps import DB, CurrentUser
+
+router = APIRouter(prefix="/billing", tags=["billing"])
+
+
+@router.get("/usage", response_model=UsageRead)
+async def get_usage(user: CurrentUser, db: DB) -> UsageRead:
+    """This month's usage. It trails the latest model calls by a moment."""
+    period = current_period()
+    total = await quota.period_total(db, user.id, period)
+    return UsageRead(
+        tier=user.tier,
+        period=period,
+        tokens=total.tokens if total else 0,
+        limit=quota.monthly_limit(user.tier),
+        coach_turns=total.coach_turns if total else 0,
+        pages=total.pages if total else 0,
+    )
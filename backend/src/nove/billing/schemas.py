@@ -0,0 +1,16 @@
+# ABOUTME: Pydantic schemas for billing API responses.
+# ABOUTME: The user's tier and usage for the current month against its quota.
+
+from datetime import date
+
+from pydantic import BaseModel
+
+
+class UsageRead(BaseModel):
+    tier: str
+    period: date
+    tokens: int
+    # None when the tier has no monthly limit
+    limit: int | None
+    coach_turns: int
+    pages: int
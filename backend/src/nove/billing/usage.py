@@ -0,0 +1,205 @@
+# ABOUTME: LLM usage ledger: model calls are recorded in memory and written in background batches.
+# ABOUTME: Each batch also adds itself to the per-user monthly totals in the same transaction.
+
+import asyncio
+import random
+import uuid
+from datetime import UTC, date, datetime
+from typing import Any
+
+import structlog
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove import background, metrics
+from nove.billing.models import UsageEvent, UsagePeriodTotal
+from nove.database import async_session_factory
+from nove.users.models import User
+
+logger = structlog.get_logger()
+
+COUNT_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_read_input_tokens",
+    "cache_creation_input_tokens",
+    "pages",
+)
+TOTAL_FIELDS = (*COUNT_FIELDS, "tokens", "coach_turns")
+# Most events written per transaction; a longer backlog goes out over several
+MAX_BATCH = 1000
+# Most events held while the database is unreachable; past it the oldest are dropped
+MAX_PENDING = 100_000
+RETRY_BASE_SECONDS = 0.5
+RETRY_CAP_SECONDS = 30.0
+
+_pending: list[dict[str, Any]] = []
+_flusher: asyncio.Task[None] | None = None
+
+
+def current_period(now: datetime | None = None) -> date:
+    """The first day of the month ``now`` falls in, in UTC."""
+    return (now or datetime.now(UTC)).astimezone(UTC).date().replace(day=1)
+
+
+def event(
+    user_id: uuid.UUID,
+    feature: str,
+    provider: str,
+    model: str,
+    created_at: datetime | None = None,
+    **counts: int | None,
+) -> dict[str, Any]:
+    """A ledger row; ``counts`` are any of COUNT_FIELDS, the rest are zero."""
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "feature": feature,
+        "provider": provider,
+        "model": model,
+        "created_at": created_at or datetime.now(UTC),
+        **dict.fromkeys(COUNT_FIELDS, 0),
+        **{field: counts[field] or 0 for field in COUNT_FIELDS if field in counts},
+    }
+
+
+def record(
+    user_id: uuid.UUID, feature: str, provider: str, model: str, **counts: int | None
+) -> None:
+    """Queue a model call for the ledger; it is written shortly after, off the request path."""
+    global _flusher
+    _pending.append(event(user_id, feature, provider, model, None, **counts))
+    metrics.incr("usage_events", provider=provider, feature=feature)
+    if _flusher is None:
+        _flusher = background.spawn(_flush_pending(), name="billing_usage_flush")
+
+
+def record_message(user_id: uuid.UUID, feature: str, message: Any) -> None:
+    """Queue a finished Claude message's usage for the ledger."""
+    counts = {field: getattr(message.usage, field, None) for field in COUNT_FIELDS[:4]}
+    record(user_id, feature, "anthropic", message.model, **counts)
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(RETRY_CAP_SECONDS, RETRY_BASE_SECONDS * 2**attempt))
+
+
+async def _flush_pending() -> None:
+    global _flusher
+    attempt = 0
+    try:
+        # Whatever is recorded while a batch is being written goes in the next one
+        while _pending:
+            try:
+                await flush()
+            except Exception:
+                # The batch is back at the head of the queue
+                await asyncio.sleep(_backoff(attempt))
+                attempt += 1
+                continue
+            attempt = 0
+    finally:
+        _flusher = None
+
+
+async def flush(
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> int:
+    """Write up to MAX_BATCH queued events now. Returns how many were written.
+
+    If the write fails the batch goes back to the head of the queue, ahead of
+    anything recorded meanwhile, and the error is raised.
+    """
+    batch = _pending[:MAX_BATCH]
+    del _pending[:MAX_BATCH]
+    if not batch:
+        return 0
+    try:
+        async with session_factory() as db:
+            # Accounts deleted since their calls were recorded take their usage along
+            live = set(
+                await db.scalars(
+                    select(User.id).where(User.id.in_({row["user_id"] for row in batch}))
+                )
+            )
+            rows = [row for row in batch if row["user_id"] in live]
+            await write(db, rows)
+            await db.commit()
+    except Exception:
+        _requeue(batch)
+        metrics.incr("usage_flush_failures")
+        logger.exception("usage_flush_failed", events=len(batch), pending=len(_pending))
+        raise
+    metrics.incr("usage_events_written", len(rows))
+    return len(rows)
+
+
+def _requeue(batch: list[dict[str, Any]]) -> None:
+    _pending[:0] = batch
+    overflow = len(_pending) - MAX_PENDING
+    if overflow > 0:
+        del _pending[:overflow]
+        metrics.incr("usage_events_dropped", overflow)
+        logger.error("usage_events_dropped", events=overflow)
+
+
+async def drain(
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> None:
+    """Write everything still queued, once, on shutdown; a failed batch stops the drain."""
+    try:
+        while _pending:
+            await flush(session_factory)
+    except Exception:
+        logger.error("usage_drain_incomplete", pending=len(_pending))
+
+
+def _totals(events: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Sum events per user and month, in key order so concurrent writers lock rows alike."""
+    totals: dict[tuple[uuid.UUID, date], dict[str, int]] = {}
+    for row in events:
+        key = (row["user_id"], current_period(row["created_at"]))
+        total = totals.setdefault(key, dict.fromkeys(TOTAL_FIELDS, 0))
+        for field in COUNT_FIELDS:
+            total[field] += row[field]
+        total["tokens"] += billable_tokens(row)
+        total["coach_turns"] += row["feature"] == "coach"
+    return [
+        {"user_id": user_id, "period": period, **total}
+        for (user_id, period), total in sorted(totals.items())
+    ]
+
+
+def billable_tokens(counts: dict[str, Any]) -> int:
+    return int(
+        counts["input_tokens"] + counts["cache_creation_input_tokens"] + counts["output_tokens"]
+    )
+
+
+async def write(db: AsyncSession, events: list[dict[str, Any]]) -> None:
+    """Insert ledger rows and add them onto their monthly totals; the caller commits."""
+    if not events:
+        return
+    await db.execute(insert(UsageEvent), events)
+    upsert = pg_insert(UsagePeriodTotal).values(_totals(events))
+    await db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[UsagePeriodTotal.user_id, UsagePeriodTotal.period],
+            set_={
+                **{
+                    field: getattr(UsagePeriodTotal, field) + getattr(upsert.excluded, field)
+                    for field in TOTAL_FIELDS
+                },
+                "updated_at": func.now(),
+            },
+        )
+    )
+
+
+def clear() -> None:
+    """Drop queued events. Tests use this for isolation."""
+    global _flusher
+    _pending.clear()
+    _flusher = None
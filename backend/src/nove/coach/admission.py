@@ -0,0 +1,142 @@
+# ABOUTME: Admission control for coach reply streams: per-process and per-user in-flight caps.
+# ABOUTME: Past the caps a request waits in a short bounded queue, then is shed with a retry hint.
+
+import asyncio
+import time
+import uuid
+from collections import deque
+
+from nove import metrics
+from nove.config import settings
+
+
+class OverloadedError(Exception):
+    """No stream slot is available; the caller should answer 503 with Retry-After."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps reply streams in flight, from admission until generation finishes.
+
+    A user at their own cap is turned away at once: waiting would only queue
+    them behind themselves. Otherwise, when the process is full, requests wait
+    first-come first-served for up to ``wait_seconds`` in a queue of at most
+    ``queue_size``; a released slot is handed straight to the oldest waiter.
+    """
+
+    def __init__(
+        self,
+        max_streams: int,
+        per_user: int,
+        queue_size: int,
+        wait_seconds: float,
+        retry_after: int,
+    ) -> None:
+        self.max_streams = max_streams
+        self.per_user = per_user
+        self.queue_size = queue_size
+        self.wait_seconds = wait_seconds
+        self.retry_after = retry_after
+        self._inflight = 0
+        # user -> streams admitted or queued
+        self._users: dict[uuid.UUID, int] = {}
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @classmethod
+    def from_settings(cls) -> "AdmissionController":
+        return cls(
+            max_streams=settings.coach_max_streams,
+            per_user=settings.coach_max_streams_per_user,
+            queue_size=settings.coach_admission_queue,
+            wait_seconds=settings.coach_admission_wait_seconds,
+            retry_after=settings.coach_retry_after_seconds,
+        )
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def _reject(self, reason: str) -> OverloadedError:
+        metrics.incr("coach_admission_rejected", reason=reason)
+        return OverloadedError(reason, self.retry_after)
+
+    def _record(self) -> None:
+        metrics.set_gauge("coach_admission_inflight", self._inflight)
+        metrics.set_gauge("coach_admission_queue_depth", len(self._waiters))
+
+    async def acquire(self, user_id: uuid.UUID) -> None:
+        """Take a stream slot for ``user_id`` or raise OverloadedError."""
+        if self._users.get(user_id, 0) >= self.per_user:
+            raise self._reject("user_limit")
+
+        if self._inflight < self.max_streams and not self._waiters:
+            self._inflight += 1
+            self._users[user_id] = self._users.get(user_id, 0) + 1
+            metrics.incr("coach_admission_admitted", queued=False)
+            self._record()
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            raise self._reject("queue_full")
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._users[user_id] = self._users.get(user_id, 0) + 1
+        self._record()
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait({waiter}, timeout=self.wait_seconds)
+        except asyncio.CancelledError:
+            # The client left while queued; give back a slot handed over meanwhile
+            if waiter.done():
+                self.release(user_id)
+            else:
+                self._abandon(waiter, user_id)
+            raise
+        metrics.observe("coach_admission_wait_ms", (time.perf_counter() - queued_at) * 1000)
+        if not waiter.done():
+            self._abandon(waiter, user_id)
+            raise self._reject("queue_timeout")
+        metrics.incr("coach_admission_admitted", queued=True)
+
+    def _abandon(self, waiter: asyncio.Future[None], user_id: uuid.UUID) -> None:
+        waiter.cancel()
+        self._waiters.remove(waiter)
+        self._forget(user_id)
+        self._record()
+
+    def _forget(self, user_id: uuid.UUID) -> None:
+        count = self._users.get(user_id, 0) - 1
+        if count > 0:
+            self._users[user_id] = count
+        else:
+            self._users.pop(user_id, None)
+
+    def release(self, user_id: uuid.UUID) -> None:
+        """Free ``user_id``'s slot, handing it to the oldest waiter if there is one."""
+        self._forget(user_id)
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self._inflight -= 1
+        self._record()
+
+
+_controller: AdmissionController | None = None
+
+
+def get_controller() -> AdmissionController:
+    """Return the process admission controller, creating it from settings on first use."""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController.from_settings()
+    return _controller
+
+
+def set_controller(controller: AdmissionController | None) -> None:
+    global _controller
+    _controller = controller
@@ -0,0 +1,256 @@
+# ABOUTME: Coach context sections: queries, formatting, per-section budgets and prompt blocks.
+# ABOUTME: Shared by the interactive turn, the coach's tools and the batched check-ins (worker/).
+
+import uuid
+from collections.abc import Sequence
+from datetime import date, timedelta
+from typing import Any
+
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from nove import metrics
+from nove.coach import context_cache
+from nove.coach.summary import estimate_tokens
+from nove.config import settings
+from nove.garmin.models import GarminConnection, GarminDataPoint
+from nove.labs.models import LabResult
+from nove.labs.service import latest_biomarkers
+from nove.labs.summary import biomarker_line
+from nove.users.models import User, UserHealthProfile
+
+WEARABLE_DAYS = 7
+MAX_LAB_SUMMARIES = 3
+# Out-of-range biomarkers lead the lab section, so a budget cut drops normal ones first
+STATUS_ORDER = {"flagged": 0, "borderline": 1}
+# System context sections, dropped or cut in this order when the prompt is over budget
+TRIM_ORDER = ("memory", "wearable", "summary", "user_memory", "labs")
+
+
+def build_profile_context(user: User, profile: UserHealthProfile | None) -> str:
+    """Build a text summary of the user's health profile for the system context."""
+    parts = [f"Nombre: {user.full_name}"]
+
+    if user.date_of_birth:
+        age = (date.today() - user.date_of_birth.date()).days // 365
+        parts.append(f"Edad: {age} anos")
+    if user.sex:
+        parts.append(f"Sexo: {user.sex}")
+    if user.weight_kg:
+        parts.append(f"Peso: {user.weight_kg} kg")
+    if user.height_cm:
+        parts.append(f"Altura: {user.height_cm} cm")
+    if user.health_goals:
+        parts.append(f"Metas: {', '.join(user.health_goals)}")
+
+    if profile:
+        if profile.medical_conditions:
+            parts.append(f"Condiciones medicas: {profile.medical_conditions}")
+        if profile.lifestyle_notes:
+            parts.append(f"Estilo de vida: {profile.lifestyle_notes}")
+
+    return "\n".join(parts)
+
+
+def format_wearable(points: Sequence[GarminDataPoint], days: int = WEARABLE_DAYS) -> str | None:
+    """Summarize a user's Garmin data points over the last ``days``."""
+    if not points:
+        return None
+
+    parts = [f"Datos de wearable Garmin (ultimos {days} dias):"]
+
+    sleep_points = [p for p in points if p.data_type == "sleep"]
+    if sleep_points:
+        durations = []
+        for sp in sleep_points:
+            total = sp.data.get("durationInSeconds")
+            if isinstance(total, (int, float)):
+                durations.append(total / 3600)
+        if durations:
+            avg_sleep = sum(durations) / len(durations)
+            parts.append(f"- Sueno promedio: {avg_sleep:.1f} horas/noche")
+
+    activity_points = [p for p in points if p.data_type == "activity"]
+    if activity_points:
+        steps_list = []
+        rhr_list = []
+        for ap in activity_points:
+            steps = ap.data.get("steps")
+            if isinstance(steps, (int, float)):
+                steps_list.append(steps)
+            rhr = ap.data.get("restingHeartRateInBeatsPerMinute")
+            if isinstance(rhr, (int, float)):
+                rhr_list.append(rhr)
+        if steps_list:
+            avg_steps = sum(steps_list) / len(steps_list)
+            parts.append(f"- Pasos promedio: {int(avg_steps)}/dia")
+        if rhr_list:
+            avg_rhr = sum(rhr_list) / len(rhr_list)
+            parts.append(f"- FC en reposo promedio: {int(avg_rhr)} bpm")
+
+    stress_points = [p for p in points if p.data_type == "stress"]
+    if stress_points:
+        stress_levels = []
+        for stp in stress_points:
+            level = stp.data.get("averageStressLevel")
+            if isinstance(level, (int, float)):
+                stress_levels.append(level)
+        if stress_levels:
+            avg_stress = sum(stress_levels) / len(stress_levels)
+            parts.append(f"- Nivel de estres promedio: {int(avg_stress)}/100")
+
+    return "\n".join(parts) if len(parts) > 1 else None
+
+
+def format_labs(summaries: Sequence[Row[Any]], latest: Sequence[Row[Any]]) -> str | None:
+    """Result summaries, newest first, with the trend of out-of-range biomarkers.
+
+    The summaries already name every flagged and borderline value, so next to
+    them only those with an earlier value get a line, for the change a single
+    result cannot show. Until a result has a summary, every biomarker gets a
+    line instead, flagged and borderline first, so truncation to the lab
+    budget cuts normal values before them. ``summaries`` are rows of
+    (created_at, ai_summary); ``latest`` rows come from ``latest_biomarkers``.
+    """
+    if summaries:
+        heading = "### Tendencia fuera de rango"
+        rows = [r for r in latest if r.status in STATUS_ORDER and r.previous_value is not None]
+    else:
+        heading = "### Ultimo valor por biomarcador"
+        rows = list(latest)
+    sections = []
+    if rows:
+        lines = []
+        for row in sorted(rows, key=lambda r: STATUS_ORDER.get(r.status, len(STATUS_ORDER))):
+            line = f"{biomarker_line(row)} ({row.date})"
+            if row.previous_value is not None:
+                line += f"; antes {row.previous_value} ({row.previous_date}), {row.delta:+g}"
+            lines.append(line)
+        sections.append(f"{heading}\n" + "\n".join(lines))
+    for r in summaries:
+        sections.append(f"### Resumen del {r.created_at.date().isoformat()}\n{r.ai_summary}")
+    return "\n\n".join(sections) or None
+
+
+async def build_wearable_context(
+    db: AsyncSession, user_id: uuid.UUID, days: int = WEARABLE_DAYS
+) -> str | None:
+    """Build a wearable data summary over the last ``days`` if Garmin is connected."""
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days)
+
+    # Joining on the connection keeps "is Garmin connected" in the same round-trip
+    result = await db.execute(
+        select(GarminDataPoint)
+        .join(GarminConnection, GarminConnection.user_id == GarminDataPoint.user_id)
+        .where(
+            GarminDataPoint.user_id == user_id,
+            GarminDataPoint.date >= start_date,
+            GarminDataPoint.date <= end_date,
+        )
+        .order_by(GarminDataPoint.date.desc())
+    )
+    return format_wearable(result.scalars().all(), days)
+
+
+async def build_lab_context(db: AsyncSession, user_id: uuid.UUID) -> str | None:
+    """Summarize the user's lab history for the system context.
+
+    The precomputed summaries of the most recent results, with the trend of
+    out-of-range biomarkers; see format_labs.
+    """
+    return format_labs(await _lab_summaries(db, user_id), await _latest_labs(db, user_id))
+
+
+async def _lab_summaries(db: AsyncSession, user_id: uuid.UUID) -> Sequence[Row[Any]]:
+    result = await db.execute(
+        select(LabResult.created_at, LabResult.ai_summary)
+        .where(LabResult.user_id == user_id, LabResult.ai_summary.is_not(None))
+        .order_by(LabResult.created_at.desc())
+        .limit(MAX_LAB_SUMMARIES)
+    )
+    return result.all()
+
+
+async def _latest_labs(db: AsyncSession, user_id: uuid.UUID) -> Sequence[Row[Any]]:
+    return (await db.execute(latest_biomarkers([user_id]))).all()
+
+
+async def wearable_section(
+    db: AsyncSession, user_id: uuid.UUID, days: int = WEARABLE_DAYS
+) -> str | None:
+    """The wearable section, from the context cache for the default window."""
+    if days != WEARABLE_DAYS:
+        return await build_wearable_context(db, user_id, days)
+    return await context_cache.get_or_build(
+        user_id, "wearable", lambda: build_wearable_context(db, user_id)
+    )
+
+
+async def lab_section(db: AsyncSession, user_id: uuid.UUID) -> str | None:
+    """The lab section, from the context cache."""
+    return await context_cache.get_or_build(
+        user_id, "labs", lambda: build_lab_context(db, user_id)
+    )
+
+
+def truncate_lines(text: str, budget: int) -> str | None:
+    """The longest prefix of whole lines within ``budget`` tokens, or None."""
+    if estimate_tokens(text) <= budget:
+        return text
+    kept: list[str] = []
+    used = 0
+    for line in text.splitlines():
+        used += len(line) + 1
+        if estimate_tokens(text[: used - 1]) > budget:
+            break
+        kept.append(line)
+    return "\n".join(kept) or None
+
+
+def fit_sections(
+    texts: dict[str, str | None], fixed_tokens: int
+) -> tuple[dict[str, str | None], dict[str, int]]:
+    """Cap each section at its budget, then cut sections in ``TRIM_ORDER`` to fit the prompt.
+
+    ``fixed_tokens`` is what the prompt spends outside these sections (system
+    prompt and history). Returns the fitted texts and their token estimates.
+    """
+    budgets = {
+        "profile": settings.coach_profile_token_budget,
+        "user_memory": settings.coach_user_memory_token_budget,
+        "labs": settings.coach_lab_token_budget,
+        "wearable": settings.coach_wearable_token_budget,
+        "summary": settings.coach_summary_token_budget,
+        "memory": settings.coach_memory_token_budget,
+    }
+    fitted: dict[str, str | None] = {}
+    tokens: dict[str, int] = {}
+    for name, text in texts.items():
+        capped = truncate_lines(text, budgets[name]) if text else None
+        if capped != text:
+            metrics.incr("coach_context_trimmed", section=name, reason="section_budget")
+        fitted[name] = capped
+        tokens[name] = estimate_tokens(capped) if capped else 0
+
+    over = fixed_tokens + sum(tokens.values()) - settings.coach_context_token_budget
+    for name in TRIM_ORDER:
+        if over <= 0:
+            break
+        text = fitted[name]
+        if not text:
+            continue
+        cut = truncate_lines(text, tokens[name] - over)
+        fitted[name] = cut
+        trimmed = estimate_tokens(cut) if cut else 0
+        over -= tokens[name] - trimmed
+        tokens[name] = trimmed
+        metrics.incr("coach_context_trimmed", section=name, reason="context_budget")
+    return fitted, tokens
+
+
+def text_block(text: str, cache: bool = False) -> dict[str, Any]:
+    block: dict[str, Any] = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
@@ -0,0 +1,162 @@
+# ABOUTME: Per-user cache of coach context sections with versioned write-through invalidation.
+# ABOUTME: Writers bump a (user, section) version; readers rebuild only when the version moved.
+
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+from nove import metrics
+
+SECTIONS = ("profile", "user_memory", "wearable", "labs")
+
+MAX_ENTRIES = 20_000
+MAX_CONVERSATIONS = 5_000
+# Safety net: versions are per-process, so bound staleness from writes made elsewhere
+TTL_SECONDS = 300
+
+
+@dataclass
+class _Entry:
+    version: int
+    value: str | None
+    day: date
+    stored_at: float
+
+
+_versions: dict[tuple[uuid.UUID, str], int] = {}
+_entries: OrderedDict[tuple[uuid.UUID, str], _Entry] = OrderedDict()
+# conversation -> (stored_at, summary, window of {role, content, tokens})
+_histories: OrderedDict[uuid.UUID, tuple[float, str | None, list[dict[str, Any]]]] = OrderedDict()
+# conversation -> count of writes, so a window read before a write is never stored after it
+_history_versions: OrderedDict[uuid.UUID, int] = OrderedDict()
+
+
+def _record(section: str, outcome: str) -> None:
+    metrics.incr("coach_context_cache", section=section, outcome=outcome)
+    hits = metrics.counter("coach_context_cache", section=section, outcome="hit")
+    misses = metrics.counter("coach_context_cache", section=section, outcome="miss")
+    metrics.set_gauge("coach_context_cache_hit_rate", hits / (hits + misses), section=section)
+
+
+def invalidate(user_id: uuid.UUID, *sections: str) -> None:
+    """Bump the version of the given sections (all sections if none given)."""
+    for section in sections or SECTIONS:
+        key = (user_id, section)
+        _versions[key] = _versions.get(key, 0) + 1
+
+
+async def get_or_build(
+    user_id: uuid.UUID,
+    section: str,
+    build: Callable[[], Awaitable[str | None]],
+) -> str | None:
+    """Return the cached section text, rebuilding it if its version has moved."""
+    key = (user_id, section)
+    version = _versions.get(key, 0)
+    entry = _entries.get(key)
+    if (
+        entry is not None
+        and entry.version == version
+        and entry.day == date.today()
+        and time.monotonic() - entry.stored_at < TTL_SECONDS
+    ):
+        _entries.move_to_end(key)
+        _record(section, "hit")
+        return entry.value
+
+    _record(section, "miss")
+    # Capture the version before building so a concurrent write forces a rebuild next time
+    value = await build()
+    _entries[key] = _Entry(version, value, date.today(), time.monotonic())
+    _entries.move_to_end(key)
+    while len(_entries) > MAX_ENTRIES:
+        _entries.popitem(last=False)
+    return value
+
+
+def fit_to_budget(history: list[dict[str, Any]], budget: int) -> bool:
+    """Drop the oldest messages until the window fits the token budget.
+
+    The newest message is always kept and the window always starts on a user
+    turn. Returns True if anything was dropped.
+    """
+    total = sum(m["tokens"] for m in history)
+    dropped = 0
+    while dropped < len(history) - 1 and (total > budget or history[dropped]["role"] != "user"):
+        total -= history[dropped]["tokens"]
+        dropped += 1
+    del history[:dropped]
+    return dropped > 0
+
+
+def get_history(conversation_id: uuid.UUID) -> tuple[str | None, list[dict[str, Any]]] | None:
+    """Return the cached (summary, window) for a conversation, if warm."""
+    cached = _histories.get(conversation_id)
+    if cached is None or time.monotonic() - cached[0] >= TTL_SECONDS:
+        _record("history", "miss")
+        return None
+    _histories.move_to_end(conversation_id)
+    _record("history", "hit")
+    return cached[1], list(cached[2])
+
+
+def history_version(conversation_id: uuid.UUID) -> int:
+    return _history_versions.get(conversation_id, 0)
+
+
+def _bump_history(conversation_id: uuid.UUID) -> None:
+    _history_versions[conversation_id] = _history_versions.get(conversation_id, 0) + 1
+    _history_versions.move_to_end(conversation_id)
+    while len(_history_versions) > MAX_CONVERSATIONS:
+        _history_versions.popitem(last=False)
+
+
+def store_history(
+    conversation_id: uuid.UUID,
+    summary: str | None,
+    history: list[dict[str, Any]],
+    version: int | None = None,
+) -> None:
+    """Cache a window read from the database.
+
+    ``version`` is ``history_version()`` from before the read; if a message was
+    appended or the summary refolded since, the window is stale and not stored.
+    """
+    if version is not None and version != history_version(conversation_id):
+        return
+    _histories[conversation_id] = (time.monotonic(), summary, list(history))
+    _histories.move_to_end(conversation_id)
+    while len(_histories) > MAX_CONVERSATIONS:
+        _histories.popitem(last=False)
+
+
+def append_history(
+    conversation_id: uuid.UUID, role: str, content: str, tokens: int, budget: int
+) -> bool:
+    """Write-through: extend a cached window with a just-persisted message.
+
+    Returns True if older messages had to be dropped to stay within budget.
+    """
+    _bump_history(conversation_id)
+    cached = _histories.get(conversation_id)
+    if cached is None:
+        return False
+    history = cached[2]
+    history.append({"role": role, "content": content, "tokens": tokens})
+    return fit_to_budget(history, budget)
+
+
+def drop_history(conversation_id: uuid.UUID) -> None:
+    _bump_history(conversation_id)
+    _histories.pop(conversation_id, None)
+
+
+def clear() -> None:
+    _versions.clear()
+    _entries.clear()
+    _histories.clear()
+    _history_versions.clear()
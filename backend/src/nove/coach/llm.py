@@ -0,0 +1,214 @@
+# ABOUTME: Pooled Anthropic gateway for the coach, owned by the app lifespan.
+# ABOUTME: Caps global and per-user concurrency, retries transient errors before the first token.
+
+import asyncio
+import random
+import time
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any
+
+import anthropic
+import httpx
+import structlog
+from anthropic.lib.streaming import AsyncMessageStream
+
+from nove import metrics
+from nove.config import settings
+
+logger = structlog.get_logger()
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERROR_TYPES = {"overloaded_error", "rate_limit_error", "api_error"}
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 8.0
+
+
+class LLMStream:
+    """An open Claude stream whose first content event has already arrived.
+
+    Events read ahead while waiting for the first token are replayed first.
+    """
+
+    def __init__(self, stream: AsyncMessageStream, buffered: list[Any]) -> None:
+        self._stream = stream
+        self._buffered = buffered
+
+    async def events(self) -> AsyncIterator[Any]:
+        while self._buffered:
+            yield self._buffered.pop(0)
+        async for event in self._stream:
+            yield event
+
+    async def text_stream(self) -> AsyncIterator[str]:
+        async for event in self.events():
+            if event.type == "content_block_delta" and event.delta.type == "text_delta":
+                yield event.delta.text
+
+    async def get_final_message(self) -> anthropic.types.Message:
+        return await self._stream.get_final_message()
+
+
+def usage_metadata(usage: object) -> dict[str, int]:
+    """Pull token counts off a Claude usage object, skipping absent fields."""
+    counts = {}
+    for field in (
+        "input_tokens",
+        "output_tokens",
+        "cache_read_input_tokens",
+        "cache_creation_input_tokens",
+    ):
+        value = getattr(usage, field, None)
+        if isinstance(value, int):
+            counts[field] = value
+    return counts
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, anthropic.APIConnectionError):
+        return True
+    if isinstance(exc, anthropic.APIStatusError):
+        if exc.status_code in RETRYABLE_STATUS:
+            return True
+        # Errors sent as SSE events arrive on a 200 response; classify by error type
+        body = exc.body if isinstance(exc.body, dict) else {}
+        error = body.get("error", body)
+        return isinstance(error, dict) and error.get("type") in RETRYABLE_ERROR_TYPES
+    return False
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt))
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str | None = None,
+        max_concurrency: int = 64,
+        per_user_concurrency: int = 2,
+        max_retries: int = 3,
+        timeout_seconds: float = 60.0,
+        http_client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self._http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrency, max_keepalive_connections=max_concurrency
+            ),
+        )
+        self.client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            base_url=base_url,
+            # Retries are handled here so they never happen after the first token
+            max_retries=0,
+            timeout=httpx.Timeout(timeout_seconds, connect=5.0),
+            http_client=self._http_client,
+        )
+        self.max_retries = max_retries
+        self.per_user_concurrency = per_user_concurrency
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._per_user: dict[uuid.UUID, tuple[asyncio.Semaphore, int]] = {}
+        self._inflight = 0
+
+    @classmethod
+    def from_settings(cls) -> "LLMGateway":
+        return cls(
+            api_key=settings.anthropic_api_key,
+            base_url=settings.anthropic_base_url or None,
+            max_concurrency=settings.llm_max_concurrency,
+            per_user_concurrency=settings.llm_per_user_concurrency,
+            max_retries=settings.llm_max_retries,
+            timeout_seconds=settings.llm_timeout_seconds,
+        )
+
+    async def aclose(self) -> None:
+        await self._http_client.aclose()
+
+    @asynccontextmanager
+    async def _slot(self, user_id: uuid.UUID) -> AsyncIterator[None]:
+        """Hold one per-user and one global concurrency slot, recording queue time."""
+        semaphore, refs = self._per_user.get(user_id, (None, 0))
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_user_concurrency)
+        self._per_user[user_id] = (semaphore, refs + 1)
+
+        queued_at = time.perf_counter()
+        try:
+            async with semaphore, self._global:
+                metrics.observe("llm_queue_ms", (time.perf_counter() - queued_at) * 1000)
+                self._inflight += 1
+                metrics.set_gauge("llm_inflight", self._inflight)
+                try:
+                    yield
+                finally:
+                    self._inflight -= 1
+                    metrics.set_gauge("llm_inflight", self._inflight)
+        finally:
+            semaphore, refs = self._per_user[user_id]
+            if refs == 1:
+                del self._per_user[user_id]
+            else:
+                self._per_user[user_id] = (semaphore, refs - 1)
+
+    async def _open(self, params: dict[str, Any]) -> tuple[AsyncExitStack, LLMStream]:
+        """Open a stream and wait for its first content event, retrying transient errors."""
+        attempt = 0
+        while True:
+            stack = AsyncExitStack()
+            try:
+                stream = await stack.enter_async_context(self.client.messages.stream(**params))
+                buffered: list[Any] = []
+                while not buffered or buffered[-1].type not in (
+                    "content_block_delta",
+                    "message_stop",
+                ):
+                    try:
+                        buffered.append(await stream.__anext__())
+                    except StopAsyncIteration:
+                        break
+                return stack, LLMStream(stream, buffered)
+            except Exception as exc:
+                await stack.aclose()
+                if attempt >= self.max_retries or not _is_retryable(exc):
+                    metrics.incr("llm_requests", outcome="failed")
+                    raise
+                delay = _backoff(attempt)
+                attempt += 1
+                metrics.incr("llm_retries")
+                logger.warning(
+                    "llm_retry", attempt=attempt, delay=round(delay, 3), error=type(exc).__name__
+                )
+                await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def stream(self, user_id: uuid.UUID, **params: Any) -> AsyncIterator[LLMStream]:
+        """Stream a Messages API call under the gateway's concurrency limits."""
+        async with self._slot(user_id):
+            stack, llm_stream = await self._open(params)
+            metrics.incr("llm_requests", outcome="ok")
+            async with stack:
+                yield llm_stream
+
+    async def complete(self, user_id: uuid.UUID, **params: Any) -> anthropic.types.Message:
+        """Run a Messages API call to completion under the same limits."""
+        async with self.stream(user_id, **params) as llm_stream:
+            return await llm_stream.get_final_message()
+
+
+_gateway: LLMGateway | None = None
+
+
+def get_gateway() -> LLMGateway:
+    """Return the process gateway, creating it from settings outside the app lifespan."""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway.from_settings()
+    return _gateway
+
+
+def set_gateway(gateway: LLMGateway | None) -> None:
+    global _gateway
+    _gateway = gateway
@@ -0,0 +1,311 @@
+# ABOUTME: Long-term coach memory: full-text retrieval over a user's messages, labs and wearables.
+# ABOUTME: Postgres tsvector/GIN finds candidates, BM25 reranks them, snippets fit a token budget.
+
+import math
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+from sqlalchemy import (
+    ColumnElement,
+    CompoundSelect,
+    Select,
+    Text,
+    cast,
+    func,
+    or_,
+    select,
+    text,
+    union,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSQUERY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from nove import metrics
+from nove.coach.models import MemoryDocument
+from nove.coach.summary import estimate_tokens
+from nove.labs.models import LabBiomarkerValue
+from nove.notifications.rules import Observation
+
+# Lab and wearable documents are generated from Spanish templates
+TEMPLATE_LANGUAGE = "es"
+# Newest matches ranked in SQL per scan, and how many of those BM25 reranks
+MAX_MATCHES = 1_000
+CANDIDATES = 100
+# Lexemes in a larger share of documents than this are not selective
+COMMON_LEXEME_FREQUENCY = 0.05
+STATS_TTL_SECONDS = 600
+MAX_QUERY_LEXEMES = 32
+MAX_SNIPPET_CHARS = 600
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SOURCE_LABELS = {
+    "user": "Usuario",
+    "assistant": "Coach",
+    "lab": "Laboratorio",
+    "wearable": "Wearable",
+}
+WEARABLE_LABELS = {
+    "sleep_hours": ("Sueno", "{:.1f} horas"),
+    "steps": ("Pasos", "{:.0f}"),
+    "resting_hr": ("FC en reposo", "{:.0f} bpm"),
+    "stress_level": ("Estres promedio", "{:.0f}/100"),
+}
+
+_LEXEME = re.compile(r"'((?:[^']|'')+)'(?::([\d,A-D]+))?")
+
+_frequencies: tuple[float, dict[str, float]] = (float("-inf"), {})
+
+
+@dataclass
+class Hit:
+    source: str
+    content: str
+    created_at: date
+    score: float
+
+
+async def index(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    source: str,
+    source_id: uuid.UUID,
+    content: str,
+    language: str,
+    conversation_id: uuid.UUID | None = None,
+) -> None:
+    """Add or replace the document for ``source_id`` in the caller's transaction.
+
+    ``language`` is the language ``content`` is written in ("es" or "en").
+    """
+    stmt = insert(MemoryDocument).values(
+        user_id=user_id,
+        source=source,
+        source_id=source_id,
+        conversation_id=conversation_id,
+        language=language,
+        content=content,
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[MemoryDocument.source_id],
+            set_={"content": stmt.excluded.content, "language": stmt.excluded.language},
+        )
+    )
+
+
+async def index_lab_result(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    result_id: uuid.UUID,
+    taken: date,
+    values: list[LabBiomarkerValue],
+) -> None:
+    if not values:
+        return
+    lines = [f"Resultados de laboratorio del {taken.isoformat()}:"]
+    for v in values:
+        lines.append(
+            f"- {v.biomarker_name} ({v.biomarker_code}): {v.value} {v.unit} [{v.status.upper()}]"
+        )
+    await index(db, user_id, "lab", result_id, "\n".join(lines), TEMPLATE_LANGUAGE)
+
+
+async def index_wearable_day(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    point_id: uuid.UUID,
+    day: date,
+    observations: list[Observation],
+) -> None:
+    parts = []
+    for obs in observations:
+        if obs.metric in WEARABLE_LABELS:
+            label, fmt = WEARABLE_LABELS[obs.metric]
+            parts.append(f"{label}: {fmt.format(obs.value)}")
+    if not parts:
+        return
+    content = f"Datos de Garmin del {day.isoformat()}: " + ", ".join(parts)
+    await index(db, user_id, "wearable", point_id, content, TEMPLATE_LANGUAGE)
+
+
+def _lexemes(vector: str) -> Counter[str]:
+    """Term frequencies from a tsvector's text form, e.g. ``'dorm':1,10 'sueñ':4``."""
+    counts: Counter[str] = Counter()
+    for lexeme, positions in _LEXEME.findall(vector):
+        counts[lexeme.replace("''", "'")] = positions.count(",") + 1 if positions else 1
+    return counts
+
+
+def _bm25(query_terms: set[str], documents: list[Counter[str]]) -> list[float]:
+    """Okapi BM25 with document frequencies taken from the candidate set.
+
+    Candidates all matched at least one term, so this is an approximation of
+    corpus-wide IDF that still rewards rare terms and penalizes long documents.
+    """
+    n = len(documents)
+    lengths = [sum(doc.values()) for doc in documents]
+    avg_length = sum(lengths) / n
+    idf = {}
+    for term in query_terms:
+        df = sum(1 for doc in documents if term in doc)
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    scores = []
+    for doc, length in zip(documents, lengths, strict=True):
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if tf:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                score += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+async def _query_lexemes(db: AsyncSession, query: str) -> list[str]:
+    """Stem the query in both languages; documents are stemmed in their own."""
+    stemmed = func.to_tsvector(cast("spanish", REGCONFIG), query).op("||")(
+        func.to_tsvector(cast("english", REGCONFIG), query)
+    )
+    # Plan this transaction's searches for their actual lexemes and user: a
+    # generic plan can't tell rare terms from common ones and picks the wrong index
+    custom_plans = func.set_config("plan_cache_mode", "force_custom_plan", True)
+    vector = (await db.execute(select(cast(stemmed, Text), custom_plans))).scalar_one()
+    return list(_lexemes(vector))
+
+
+async def _lexeme_frequencies(db: AsyncSession) -> dict[str, float]:
+    """Share of documents containing each common lexeme, from the planner's statistics."""
+    global _frequencies
+    fetched_at, frequencies = _frequencies
+    if time.monotonic() - fetched_at < STATS_TTL_SECONDS:
+        return frequencies
+    row = (
+        await db.execute(
+            text(
+                "SELECT most_common_elems::text::text[] AS elems, most_common_elem_freqs AS freqs"
+                " FROM pg_stats WHERE tablename = 'memory_documents' AND attname = 'search'"
+            )
+        )
+    ).first()
+    frequencies = dict(zip(row.elems, row.freqs, strict=False)) if row and row.elems else {}
+    _frequencies = (time.monotonic(), frequencies)
+    return frequencies
+
+
+def _tsquery(lexemes: list[str]) -> ColumnElement[Any]:
+    """An OR query over already-stemmed lexemes."""
+    return cast(" | ".join("'" + lexeme.replace("'", "''") + "'" for lexeme in lexemes), TSQUERY)
+
+
+async def search(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    query: str,
+    exclude_conversation_id: uuid.UUID | None = None,
+    top_k: int = 5,
+) -> list[Hit]:
+    """The user's ``top_k`` documents most relevant to ``query``, best first.
+
+    Candidates are the newest ``MAX_MATCHES`` documents matching any query
+    lexeme, plus the newest matching any selective one: lexemes in most
+    documents carry almost no BM25 weight and would otherwise crowd out older
+    documents with a rare term. Each is one index scan. Candidates are ranked by
+    cover density and the best ``CANDIDATES`` reranked with BM25.
+    """
+    lexemes = await _query_lexemes(db, query)
+    if not lexemes:
+        return []
+    frequencies = await _lexeme_frequencies(db)
+    # Long messages: keep the most selective lexemes
+    lexemes = sorted(lexemes, key=lambda lex: frequencies.get(lex, 0))[:MAX_QUERY_LEXEMES]
+    selective = [lex for lex in lexemes if frequencies.get(lex, 0) <= COMMON_LEXEME_FREQUENCY]
+
+    def newest_matches(match_lexemes: list[str]) -> Select[Any]:
+        stmt = (
+            select(
+                MemoryDocument.id,
+                MemoryDocument.source,
+                MemoryDocument.content,
+                MemoryDocument.created_at,
+                MemoryDocument.search,
+            )
+            .where(
+                MemoryDocument.user_id == user_id,
+                MemoryDocument.search.op("@@")(_tsquery(match_lexemes)),
+            )
+            .order_by(MemoryDocument.created_at.desc())
+            .limit(MAX_MATCHES)
+        )
+        if exclude_conversation_id is not None:
+            stmt = stmt.where(
+                or_(
+                    MemoryDocument.conversation_id.is_(None),
+                    MemoryDocument.conversation_id != exclude_conversation_id,
+                )
+            )
+        return stmt
+
+    matches: Select[Any] | CompoundSelect[Any] = newest_matches(lexemes)
+    if selective and len(selective) < len(lexemes):
+        matches = union(matches, newest_matches(selective))
+    candidates = matches.subquery()
+    rows = (
+        await db.execute(
+            select(candidates)
+            .order_by(func.ts_rank_cd(candidates.c.search, _tsquery(lexemes)).desc())
+            .limit(CANDIDATES)
+        )
+    ).all()
+    if not rows:
+        return []
+
+    scores = _bm25(set(lexemes), [_lexemes(row.search) for row in rows])
+    hits = [
+        Hit(row.source, row.content, row.created_at.date(), score)
+        for row, score in zip(rows, scores, strict=True)
+    ]
+    hits.sort(key=lambda h: h.score, reverse=True)
+    return hits[:top_k]
+
+
+def format_snippets(hits: list[Hit], budget: int) -> str | None:
+    """Render hits as bullet lines, stopping before the token budget is exceeded."""
+    lines = []
+    used = 0
+    for hit in hits:
+        content = " ".join(hit.content.split())
+        if len(content) > MAX_SNIPPET_CHARS:
+            content = content[:MAX_SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+        line = f"- ({SOURCE_LABELS[hit.source]}, {hit.created_at.isoformat()}) {content}"
+        tokens = estimate_tokens(line)
+        if used + tokens > budget:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines) or None
+
+
+async def recall(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    query: str,
+    exclude_conversation_id: uuid.UUID | None,
+    top_k: int,
+    budget: int,
+) -> str | None:
+    """Relevant snippets from outside the current conversation, ready for the prompt."""
+    started = time.perf_counter()
+    hits = await search(db, user_id, query, exclude_conversation_id, top_k)
+    metrics.observe("coach_memory_ms", (time.perf_counter() - started) * 1000)
+    return format_snippets(hits, budget)
+
+
+def clear() -> None:
+    global _frequencies
+    _frequencies = (float("-inf"), {})
@@ -4,24 +4,35 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, Enum, ForeignKey, String, Text, func
-from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy import Computed, DateTime, Enum, ForeignKey, Index, Integer, String, Text, func
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from nove.database import Base
 
 CONVERSATION_TYPES = ("onboarding", "general", "lab_review", "check_in")
 MESSAGE_ROLES = ("user", "assistant", "system")
+MEMORY_SOURCES = ("user", "assistant", "lab", "wearable")
+PREVIEW_CHARS = 140
 
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Keyset pagination of a user's conversations
+        Index("ix_conversations_user_created", "user_id", "created_at", "id"),
+        # The inbox: a user's conversations by latest activity
+        Index("ix_conversations_user_last_message", "user_id", "last_message_at", "id"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True
     )
     title: Mapped[str | None] = mapped_column(String(256))
+    # Rolling summary of every message up to and including summary_through
+    summary: Mapped[str | None] = mapped_column(Text)
+    summary_through: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     conversation_type: Mapped[str] = mapped_column(
         Enum(*CONVERSATION_TYPES, name="conversation_type"),
         default="general",
@@ -32,6 +43,13 @@ class Conversation(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+    # Denormalized from messages on every write so the inbox needs no join;
+    # last_message_at starts at creation time so empty conversations still sort
+    last_message_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    last_message_preview: Mapped[str | None] = mapped_column(String(PREVIEW_CHARS))
+    message_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     messages: Mapped[list["Message"]] = relationship(
         back_populates="conversation", order_by="Message.created_at"
@@ -40,6 +58,10 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # History windows and keyset pagination within a conversation
+        Index("ix_messages_conversation_created", "conversation_id", "created_at", "id"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     conversation_id: Mapped[uuid.UUID] = mapped_column(
@@ -54,3 +76,42 @@ class Message(Base):
     )
 
     conversation: Mapped[Conversation] = relationship(back_populates="messages")
+
+
+class MemoryDocument(Base):
+    """A searchable piece of a user's history: a message, a lab result or a wearable day.
+
+    ``search`` is generated by Postgres with the text search configuration of
+    the user's language at write time.
+    """
+
+    __tablename__ = "memory_documents"
+    __table_args__ = (
+        Index("ix_memory_documents_search", "search", postgresql_using="gin"),
+        # Newest matches first, stopping early when a query term is common
+        Index("ix_memory_documents_user_created", "user_id", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE")
+    )
+    source: Mapped[str] = mapped_column(Enum(*MEMORY_SOURCES, name="memory_source"))
+    # Id of the message, lab result or wearable data point; re-indexing upserts on it
+    source_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), unique=True)
+    conversation_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("conversations.id", ondelete="CASCADE")
+    )
+    language: Mapped[str] = mapped_column(String(8), default="es")
+    content: Mapped[str] = mapped_column(Text)
+    search: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "CASE WHEN language = 'en' THEN to_tsvector('english'::regconfig, content)"
+            " ELSE to_tsvector('spanish'::regconfig, content) END",
+            persisted=True,
+        ),
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
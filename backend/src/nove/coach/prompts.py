@@ -24,6 +24,7 @@ Se te proporcionara:
 - Historial de conversacion actual
 - Resumen de datos de wearable (si conectado)
 - Resultados de laboratorio recientes (si disponibles)
+- Fragmentos relevantes de conversaciones, laboratorios y datos de wearable anteriores
 
 Usa este contexto para personalizar tus respuestas. Si no tienes datos suficientes, \
 pregunta al usuario.\
@@ -51,6 +52,7 @@ You will be provided with:
 - Current conversation history
 - Wearable data summary (if connected)
 - Recent lab results (if available)
+- Relevant snippets from past conversations, labs and wearable data
 
 Use this context to personalize your responses. If you don't have enough data, \
 ask the user.\
@@ -61,3 +63,93 @@ def get_system_prompt(language: str) -> str:
     if language == "es":
         return SYSTEM_PROMPT_ES
     return SYSTEM_PROMPT_EN
+
+
+# Sent only when the coach has tools, so the static prompt is the same either way
+TOOLS_PROMPT_ES = """\
+Si una pregunta depende de laboratorios o datos de wearable que no estan en el contexto, \
+consultalos con las herramientas disponibles en lugar de suponer.\
+"""
+
+TOOLS_PROMPT_EN = """\
+If a question depends on labs or wearable data that are not in the context, look them \
+up with the available tools instead of guessing.\
+"""
+
+
+def get_tools_prompt(language: str) -> str:
+    if language == "es":
+        return TOOLS_PROMPT_ES
+    return TOOLS_PROMPT_EN
+
+
+SUMMARY_PROMPT = """\
+Resumes conversaciones entre un usuario y Nove, su coach de salud. Recibiras el \
+resumen previo (si existe) y los mensajes nuevos. Devuelve un resumen actualizado \
+en el idioma de la conversacion, de no mas de 200 palabras, que conserve:
+- Datos de salud, sintomas, metas y compromisos que menciono el usuario
+- Recomendaciones que dio el coach y como respondio el usuario
+- Preguntas pendientes
+
+No agregues informacion que no este en la conversacion. Responde solo con el resumen.\
+"""
+
+
+USER_MEMORY_PROMPT_ES = """\
+Mantienes la memoria de largo plazo de Nove, un coach de salud, sobre un usuario. \
+Recibiras la memoria actual (si existe) y mensajes nuevos de sus conversaciones. \
+Devuelve la memoria actualizada, en espanol, de no mas de 250 palabras, con estas secciones:
+- Salud: condiciones, sintomas, medicamentos y resultados que menciono
+- Metas y habitos: objetivos, rutinas, compromisos y como le fue
+- Preferencias: como le gusta recibir consejos, restricciones, gustos
+- Pendientes: temas abiertos para retomar
+
+Conserva lo que sigue vigente, actualiza lo que cambio y quita lo obsoleto. \
+No agregues informacion que no este en los mensajes. Responde solo con la memoria.\
+"""
+
+USER_MEMORY_PROMPT_EN = """\
+You keep the long-term memory of Nove, a health coach, about one user. \
+You will receive the current memory (if any) and new messages from their conversations. \
+Return the updated memory, in English, in no more than 250 words, with these sections:
+- Health: conditions, symptoms, medications and results they mentioned
+- Goals and habits: objectives, routines, commitments and how they went
+- Preferences: how they like to get advice, restrictions, likes
+- Open items: topics to pick up again
+
+Keep what still holds, update what changed and drop what is obsolete. \
+Do not add information that is not in the messages. Respond with the memory only.\
+"""
+
+
+def get_user_memory_prompt(language: str) -> str:
+    if language == "es":
+        return USER_MEMORY_PROMPT_ES
+    return USER_MEMORY_PROMPT_EN
+
+
+CHECK_IN_PROMPT_ES = """\
+Escribe el check-in semanal para este usuario. Es el primer mensaje de una \
+conversacion nueva, asi que saluda por su nombre. En 2 parrafos cortos:
+- Comenta una o dos tendencias concretas de su semana (wearable o laboratorio), \
+citando valores. Si no hay datos, pregunta como le fue.
+- Propone una accion pequena y especifica para la proxima semana, ligada a sus metas.
+
+Termina con una pregunta abierta. Responde solo con el mensaje.\
+"""
+
+CHECK_IN_PROMPT_EN = """\
+Write this user's weekly check-in. It is the first message of a new conversation, \
+so greet them by name. In 2 short paragraphs:
+- Comment on one or two concrete trends from their week (wearable or labs), citing \
+values. If there is no data, ask how their week went.
+- Suggest one small, specific action for next week, tied to their goals.
+
+End with an open question. Respond with the message only.\
+"""
+
+
+def get_check_in_prompt(language: str) -> str:
+    if language == "es":
+        return CHECK_IN_PROMPT_ES
+    return CHECK_IN_PROMPT_EN
@@ -0,0 +1,147 @@
+# ABOUTME: Short-lived replay buffers for in-flight coach replies, keyed by assistant message id.
+# ABOUTME: Lets a reconnecting client resume from Last-Event-ID without another model call.
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+
+import structlog
+
+from nove import background, metrics
+
+logger = structlog.get_logger()
+
+MAX_BUFFERS = 1_000
+MAX_TOTAL_CHARS = 8_000_000
+# How long a finished reply stays replayable
+MAX_AGE_SECONDS = 120
+# How long generation keeps running with no client attached before it is cancelled
+RESUME_GRACE_SECONDS = 15.0
+
+
+@dataclass
+class StreamBuffer:
+    """Text chunks of one assistant reply, appended as the model streams them.
+
+    Positions are chunk counts, so an SSE event id names exactly how much of the
+    reply the client has already seen.
+    """
+
+    message_id: uuid.UUID
+    user_id: uuid.UUID
+    conversation_id: uuid.UUID
+    chunks: list[str] = field(default_factory=list)
+    size: int = 0
+    done: bool = False
+    failed: bool = False
+    created_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+    subscribers: int = 0
+    task: asyncio.Task[None] | None = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def append(self, text: str) -> None:
+        self.chunks.append(text)
+        self.size += len(text)
+        self._notify()
+
+    def finish(self, failed: bool = False) -> None:
+        self.done = True
+        self.failed = failed
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, position: int, timeout: float) -> bool:
+        """Wait until there is something past ``position``. False on timeout."""
+        changed = self._changed
+        if position < len(self.chunks) or self.done:
+            return True
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+
+_buffers: OrderedDict[uuid.UUID, StreamBuffer] = OrderedDict()
+
+
+def start(
+    message_id: uuid.UUID,
+    user_id: uuid.UUID,
+    conversation_id: uuid.UUID,
+    chunks: AsyncIterator[str],
+    on_done: Callable[[], None] | None = None,
+) -> StreamBuffer:
+    """Run a reply generator in the background, recording its chunks in a new buffer.
+
+    ``on_done`` runs once generation ends, however it ends.
+    """
+    buffer = StreamBuffer(message_id, user_id, conversation_id)
+
+    async def generate() -> None:
+        try:
+            async for text in chunks:
+                buffer.append(text)
+        except (asyncio.CancelledError, Exception):
+            buffer.finish(failed=True)
+            raise
+        buffer.finish()
+        _evict()
+
+    task = background.spawn(generate(), name=f"coach_reply:{message_id}")
+    if on_done is not None:
+        task.add_done_callback(lambda _: on_done())
+    buffer.task = task
+    _buffers[message_id] = buffer
+    _evict()
+    return buffer
+
+
+def get(message_id: uuid.UUID) -> StreamBuffer | None:
+    _evict()
+    return _buffers.get(message_id)
+
+
+def subscribe(buffer: StreamBuffer) -> None:
+    buffer.subscribers += 1
+
+
+def unsubscribe(buffer: StreamBuffer) -> None:
+    """Detach a client; generation stops if nobody reattaches within the grace period."""
+    buffer.subscribers -= 1
+    if buffer.subscribers == 0 and not buffer.done:
+        asyncio.get_running_loop().call_later(RESUME_GRACE_SECONDS, _cancel_if_abandoned, buffer)
+
+
+def _cancel_if_abandoned(buffer: StreamBuffer) -> None:
+    if buffer.subscribers == 0 and buffer.task is not None and not buffer.task.done():
+        metrics.incr("coach_streams_cancelled")
+        logger.info("coach_stream_abandoned", message_id=str(buffer.message_id))
+        buffer.task.cancel()
+
+
+def _evict() -> None:
+    """Drop expired finished buffers, then the oldest ones while over the size bounds."""
+    now = time.monotonic()
+    for message_id, buffer in list(_buffers.items()):
+        if buffer.finished_at is not None and now - buffer.finished_at > MAX_AGE_SECONDS:
+            del _buffers[message_id]
+
+    total = sum(b.size for b in _buffers.values())
+    while _buffers and (len(_buffers) > MAX_BUFFERS or total > MAX_TOTAL_CHARS):
+        _, oldest = _buffers.popitem(last=False)
+        total -= oldest.size
+    metrics.set_gauge("coach_replay_buffers", len(_buffers))
+    metrics.set_gauge("coach_replay_chars", total)
+
+
+def clear() -> None:
+    _buffers.clear()
@@ -2,15 +2,27 @@
 # ABOUTME: Handles conversation CRUD and SSE-streamed message responses.
 
 import uuid
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 
+from nove import metrics
+from nove.billing import quota
+from nove.coach import admission, replay, sse
 from nove.coach.models import Conversation, Message
-from nove.coach.schemas import ConversationCreate, ConversationRead, MessageCreate, MessageRead
-from nove.coach.service import stream_response
+from nove.coach.schemas import (
+    ConversationCreate,
+    ConversationInboxItem,
+    ConversationRead,
+    MessageCreate,
+    MessageRead,
+)
+from nove.coach.service import schedule_prefetch, stream_response
+from nove.database import release_connection
 from nove.deps import DB, CurrentUser
+from nove.pagination import DEFAULT_LIMIT, MAX_LIMIT, newest_first
 
 router = APIRouter(prefix="/conversations", tags=["coach"])
 
@@ -31,16 +43,56 @@ async def create_conversation(
 
 
 @router.get("", response_model=list[ConversationRead])
-async def list_conversations(user: CurrentUser, db: DB) -> list[ConversationRead]:
-    result = await db.execute(
-        select(Conversation)
-        .where(Conversation.user_id == user.id)
-        .order_by(Conversation.updated_at.desc())
+async def list_conversations(
+    user: CurrentUser,
+    db: DB,
+    response: Response,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+) -> list[ConversationRead]:
+    """Newest conversations first; follow X-Next-Cursor for older pages."""
+    conversations = await newest_first(
+        db,
+        select(Conversation).where(Conversation.user_id == user.id),
+        Conversation.created_at,
+        Conversation.id,
+        cursor,
+        limit,
+        response,
     )
-    conversations = result.scalars().all()
     return [ConversationRead.model_validate(c) for c in conversations]
 
 
+@router.get("/inbox", response_model=list[ConversationInboxItem])
+async def conversation_inbox(
+    user: CurrentUser,
+    db: DB,
+    response: Response,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+) -> list[ConversationInboxItem]:
+    """Conversations by latest activity, each with a preview of its last message.
+
+    Reads only the conversations table; follow X-Next-Cursor for older pages.
+    The cursor is on ``last_message_at``, which only moves forward, and that
+    trade-off is accepted so paging stays one index range scan. A conversation
+    that gets a message while a client is paging jumps ahead of the cursor.
+    Pages already fetched never repeat it, but later pages skip it if it had
+    not been reached yet. Clients pick it up by refetching the first page, as
+    they do on any new message.
+    """
+    conversations = await newest_first(
+        db,
+        select(Conversation).where(Conversation.user_id == user.id),
+        Conversation.last_message_at,
+        Conversation.id,
+        cursor,
+        limit,
+        response,
+    )
+    return [ConversationInboxItem.model_validate(c) for c in conversations]
+
+
 async def _get_user_conversation(
     conversation_id: uuid.UUID, user_id: uuid.UUID, db: DB
 ) -> Conversation:
@@ -57,38 +109,95 @@ async def _get_user_conversation(
 
 
 @router.get("/{conversation_id}/messages", response_model=list[MessageRead])
-async def get_messages(conversation_id: uuid.UUID, user: CurrentUser, db: DB) -> list[MessageRead]:
+async def get_messages(
+    conversation_id: uuid.UUID,
+    user: CurrentUser,
+    db: DB,
+    response: Response,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+) -> list[MessageRead]:
+    """The newest page of messages in chronological order.
+
+    X-Next-Cursor, when present, fetches the page of older messages before it.
+    The first page also starts warming the coach context in the background.
+    """
     await _get_user_conversation(conversation_id, user.id, db)
 
-    result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at)
+    messages = await newest_first(
+        db,
+        select(Message).where(Message.conversation_id == conversation_id),
+        Message.created_at,
+        Message.id,
+        cursor,
+        limit,
+        response,
     )
-    messages = result.scalars().all()
-    return [MessageRead.model_validate(m) for m in messages]
+    if cursor is None:
+        # Opening the conversation: warm the context the next message will need
+        schedule_prefetch(user, conversation_id)
+    return [MessageRead.model_validate(m) for m in reversed(messages)]
 
 
 @router.post("/{conversation_id}/messages")
 async def send_message(
     conversation_id: uuid.UUID,
     body: MessageCreate,
+    request: Request,
     user: CurrentUser,
     db: DB,
 ) -> StreamingResponse:
     conversation = await _get_user_conversation(conversation_id, user.id, db)
-
-    async def event_stream():
-        async for chunk in stream_response(db, user, conversation, body.content):
-            yield f"data: {chunk}\n\n"
-        yield "data: [DONE]\n\n"
-
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+    try:
+        await quota.check(db, user)
+    except quota.QuotaExceededError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Monthly usage limit reached",
+        ) from exc
+    # The stream persists through its own short sessions; free this one's connection
+    await release_connection(db)
+
+    controller = admission.get_controller()
+    try:
+        await controller.acquire(user.id)
+    except admission.OverloadedError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Coach is busy, try again shortly",
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+
+    message_id = uuid.uuid4()
+    buffer = replay.start(
+        message_id,
+        user.id,
+        conversation.id,
+        stream_response(user, conversation, body.content, message_id),
+        # The slot is held until generation ends, even if the client detaches earlier
+        on_done=lambda: controller.release(user.id),
     )
+    return sse.streaming_response(request, buffer)
+
+
+@router.get("/{conversation_id}/messages/{message_id}/stream")
+async def resume_message_stream(
+    conversation_id: uuid.UUID,
+    message_id: uuid.UUID,
+    request: Request,
+    user: CurrentUser,
+    db: DB,
+    last_event_id: Annotated[int, Header()] = 0,
+) -> StreamingResponse:
+    """Reattach to a reply that is streaming or just finished, after Last-Event-ID.
+
+    Buffers live in this process for a couple of minutes; once gone, the reply
+    is read from GET /messages like any other.
+    """
+    buffer = replay.get(message_id)
+    if buffer is None or buffer.user_id != user.id or buffer.conversation_id != conversation_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stream not found")
+    await release_connection(db)
+
+    metrics.incr("coach_stream_resumes")
+    return sse.streaming_response(request, buffer, last_event_id)
@@ -0,0 +1,69 @@
+# ABOUTME: Picks the model for each coach turn from cheap local heuristics and conversation state.
+# ABOUTME: Short conversational replies go to a fast model; lab interpretation stays on Sonnet.
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Any
+
+from nove.config import settings
+
+FULL_MODEL = "claude-sonnet-4-5-20250929"
+FULL_MAX_TOKENS = 1024
+FAST_MODEL = "claude-haiku-4-5-20251001"
+FAST_MAX_TOKENS = 512
+# Longer messages usually carry a real question or new information
+SHORT_TURN_WORDS = 12
+
+# fmt: off
+LAB_TERMS = {
+    "lab", "labs", "laboratorio", "laboratorios", "analisis", "examen", "examenes",
+    "resultado", "resultados", "biomarcador", "biomarcadores", "biomarker", "biomarkers",
+    "sangre", "blood", "glucosa", "glucose", "colesterol", "cholesterol", "hdl", "ldl",
+    "trigliceridos", "triglycerides", "hba1c", "hemoglobina", "hemoglobin", "ferritina",
+    "ferritin", "hierro", "iron", "tsh", "tiroides", "thyroid", "vitamina", "vitamin",
+    "creatinina", "creatinine", "insulina", "insulin", "rango", "range",
+}
+# fmt: on
+_WORD = re.compile(r"[a-z0-9]+")
+_MEASUREMENT = re.compile(r"\d+(?:[.,]\d+)?\s*(?:mg|g/dl|mmol|ng|ui|iu|%)")
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    model: str
+    max_tokens: int
+    reason: str
+
+
+def _full(reason: str) -> Route:
+    return Route("full", FULL_MODEL, FULL_MAX_TOKENS, reason)
+
+
+def _normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def choose_route(message: str, history: list[dict[str, Any]], conversation_type: str) -> Route:
+    """Route one turn. ``history`` is the context window, ending with ``message``.
+
+    Anything that might need interpretation stays on the full model; only short
+    follow-ups in a running conversation ("gracias", "si, manana") go fast.
+    """
+    if not settings.coach_model_routing:
+        return _full("routing_disabled")
+    if conversation_type == "lab_review":
+        return _full("lab_review")
+
+    text = _normalize(message)
+    words = _WORD.findall(text)
+    if LAB_TERMS.intersection(words) or _MEASUREMENT.search(text):
+        return _full("lab_terms")
+    if not any(m["role"] == "assistant" for m in history):
+        # The opening turn sets the tone of the conversation
+        return _full("first_turn")
+    if len(words) <= SHORT_TURN_WORDS:
+        return Route("fast", FAST_MODEL, FAST_MAX_TOKENS, "short_turn")
+    return _full("default")
@@ -22,6 +22,12 @@ class ConversationRead(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class ConversationInboxItem(ConversationRead):
+    last_message_at: datetime
+    last_message_preview: str | None
+    message_count: int
+
+
 class MessageCreate(BaseModel):
     content: str
 
@@ -1,239 +1,559 @@
 # ABOUTME: AI coach service handling context assembly and Claude API streaming.
 # ABOUTME: Builds conversation context from user profile + history, streams responses.
 
+import asyncio
+import time
 import uuid
 from collections.abc import AsyncGenerator
-from datetime import date, timedelta
-
-import anthropic
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from nove.coach.models import Conversation, Message
-from nove.coach.prompts import get_system_prompt
+from typing import Any
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove import background, metrics
+from nove.billing import usage as usage_ledger
+from nove.coach import context, context_cache, llm, memory, routing, summary, tools, user_memory
+from nove.coach.context import build_profile_context, fit_sections, text_block
+from nove.coach.models import PREVIEW_CHARS, Conversation, Message
+from nove.coach.prompts import get_system_prompt, get_tools_prompt
+from nove.coach.summary import estimate_tokens, message_tokens
 from nove.config import settings
-from nove.garmin.models import GarminConnection, GarminDataPoint
-from nove.labs.models import LabBiomarkerValue
+from nove.database import async_session_factory
 from nove.users.models import User, UserHealthProfile
 
-MODEL = "claude-sonnet-4-5-20250929"
+# The default model; coach turns are routed per message (see routing.py)
+MODEL = routing.FULL_MODEL
+# Hard cap on rows read per turn; the token budget usually binds first
 MAX_HISTORY_MESSAGES = 50
 
+# Model calls per turn that may end in tool use; the next one must answer in text
+MAX_TOOL_ROUNDS = 3
+# Longest a turn waits for an in-flight prefetch before building its context itself
+PREFETCH_WAIT_SECONDS = 2.0
 
-def _build_profile_context(user: User, profile: UserHealthProfile | None) -> str:
-    """Build a text summary of the user's health profile for the system context."""
-    parts = [f"Nombre: {user.full_name}"]
+# conversation -> context warm-up started when the conversation was opened
+_prefetches: dict[uuid.UUID, asyncio.Task[None]] = {}
 
-    if user.date_of_birth:
-        age = (date.today() - user.date_of_birth.date()).days // 365
-        parts.append(f"Edad: {age} anos")
-    if user.sex:
-        parts.append(f"Sexo: {user.sex}")
-    if user.weight_kg:
-        parts.append(f"Peso: {user.weight_kg} kg")
-    if user.height_cm:
-        parts.append(f"Altura: {user.height_cm} cm")
-    if user.health_goals:
-        parts.append(f"Metas: {', '.join(user.health_goals)}")
 
-    if profile:
-        if profile.medical_conditions:
-            parts.append(f"Condiciones medicas: {profile.medical_conditions}")
-        if profile.lifestyle_notes:
-            parts.append(f"Estilo de vida: {profile.lifestyle_notes}")
-
-    return "\n".join(parts)
+async def _user_memory(db: AsyncSession, user_id: uuid.UUID) -> str | None:
+    profile = await db.get(UserHealthProfile, user_id)
+    return profile.ai_summary if profile is not None else None
 
 
 async def _get_conversation_history(
     db: AsyncSession, conversation_id: uuid.UUID
-) -> list[dict[str, str]]:
-    """Fetch the last N messages for a conversation, formatted for Claude."""
-    result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at.desc())
-        .limit(MAX_HISTORY_MESSAGES)
-    )
-    messages = list(reversed(result.scalars().all()))
+) -> tuple[str | None, list[dict[str, Any]]]:
+    """Fetch the conversation summary and the newest messages that fit the token budget.
 
-    return [{"role": msg.role, "content": msg.content} for msg in messages if msg.role != "system"]
-
-
-async def _build_wearable_context(db: AsyncSession, user_id: uuid.UUID) -> str | None:
-    """Build a 7-day wearable data summary if Garmin is connected."""
-    connection = await db.get(GarminConnection, user_id)
-    if not connection:
-        return None
-
-    end_date = date.today()
-    start_date = end_date - timedelta(days=7)
+    Only messages after the summary watermark are candidates; anything older is
+    already covered by the summary. Served from the context cache when warm.
+    """
+    cached = context_cache.get_history(conversation_id)
+    if cached is not None:
+        return cached
 
+    version = context_cache.history_version(conversation_id)
+    # Outer join, so the summary is read even when every message is behind the watermark
     result = await db.execute(
-        select(GarminDataPoint)
-        .where(
-            GarminDataPoint.user_id == user_id,
-            GarminDataPoint.date >= start_date,
-            GarminDataPoint.date <= end_date,
+        select(Conversation.summary, Conversation.user_id, Message)
+        .outerjoin(
+            Message,
+            and_(
+                Message.conversation_id == Conversation.id,
+                Message.role != "system",
+                or_(
+                    Conversation.summary_through.is_(None),
+                    Message.created_at > Conversation.summary_through,
+                ),
+            ),
         )
-        .order_by(GarminDataPoint.date.desc())
+        .where(Conversation.id == conversation_id)
+        .order_by(Message.created_at.desc())
+        .limit(MAX_HISTORY_MESSAGES)
     )
-    points = result.scalars().all()
-
-    if not points:
-        return None
-
-    parts = ["Datos de wearable Garmin (ultimos 7 dias):"]
-
-    sleep_points = [p for p in points if p.data_type == "sleep"]
-    if sleep_points:
-        durations = []
-        for sp in sleep_points:
-            total = sp.data.get("durationInSeconds")
-            if isinstance(total, (int, float)):
-                durations.append(total / 3600)
-        if durations:
-            avg_sleep = sum(durations) / len(durations)
-            parts.append(f"- Sueno promedio: {avg_sleep:.1f} horas/noche")
-
-    activity_points = [p for p in points if p.data_type == "activity"]
-    if activity_points:
-        steps_list = []
-        rhr_list = []
-        for ap in activity_points:
-            steps = ap.data.get("steps")
-            if isinstance(steps, (int, float)):
-                steps_list.append(steps)
-            rhr = ap.data.get("restingHeartRateInBeatsPerMinute")
-            if isinstance(rhr, (int, float)):
-                rhr_list.append(rhr)
-        if steps_list:
-            avg_steps = sum(steps_list) / len(steps_list)
-            parts.append(f"- Pasos promedio: {int(avg_steps)}/dia")
-        if rhr_list:
-            avg_rhr = sum(rhr_list) / len(rhr_list)
-            parts.append(f"- FC en reposo promedio: {int(avg_rhr)} bpm")
-
-    stress_points = [p for p in points if p.data_type == "stress"]
-    if stress_points:
-        stress_levels = []
-        for stp in stress_points:
-            level = stp.data.get("averageStressLevel")
-            if isinstance(level, (int, float)):
-                stress_levels.append(level)
-        if stress_levels:
-            avg_stress = sum(stress_levels) / len(stress_levels)
-            parts.append(f"- Nivel de estres promedio: {int(avg_stress)}/100")
-
-    return "\n".join(parts) if len(parts) > 1 else None
-
-
-async def _build_lab_context(db: AsyncSession, user_id: uuid.UUID) -> str | None:
-    """Build a summary of recent lab biomarker values for the system context."""
-    result = await db.execute(
-        select(LabBiomarkerValue)
-        .where(LabBiomarkerValue.user_id == user_id)
-        .order_by(LabBiomarkerValue.date.desc())
-        .limit(30)
+    rows = list(reversed(result.all()))
+
+    conversation_summary = rows[0][0] if rows else None
+    history = [
+        {"role": msg.role, "content": msg.content, "tokens": message_tokens(msg)}
+        for _, _, msg in rows
+        if msg is not None
+    ]
+    if context_cache.fit_to_budget(history, settings.coach_history_token_budget):
+        # Unsummarized turns fell outside the window
+        summary.schedule_refresh(rows[0][1], conversation_id)
+    context_cache.store_history(conversation_id, conversation_summary, history, version)
+    return conversation_summary, history
+
+
+async def _gather_sections(
+    user: User,
+    conversation_id: uuid.UUID,
+    session_factory: async_sessionmaker[AsyncSession],
+    query: str | None,
+    data_sections: bool,
+) -> tuple[Any, ...]:
+    """Fetch (profile, user memory, wearable, labs, (summary, window), recall).
+
+    A cold turn holds at most three pooled connections, each for a few
+    round-trips: the profile-backed sections and wearable on one, labs then
+    the history window on a second, recall on a third. Cached sections are not
+    queried, and a session that ends up with nothing to read never checks out
+    a connection.
+    """
+
+    async def profile_and_wearable() -> tuple[str | None, ...]:
+        async with session_factory() as session:
+            profile = await context_cache.get_or_build(
+                user.id, "profile", lambda: _profile_section(session, user)
+            )
+            # Same row as the profile: when both are cold this is an identity-map hit
+            user_memory_text = await context_cache.get_or_build(
+                user.id, "user_memory", lambda: _user_memory(session, user.id)
+            )
+            wearable = None
+            if data_sections:
+                wearable = await context.wearable_section(session, user.id)
+            return profile, user_memory_text, wearable
+
+    async def labs_and_history() -> tuple[str | None, tuple[str | None, list[dict[str, Any]]]]:
+        async with session_factory() as session:
+            labs = None
+            if data_sections:
+                labs = await context.lab_section(session, user.id)
+            return labs, await _get_conversation_history(session, conversation_id)
+
+    async def recall() -> str | None:
+        if not query:
+            return None
+        async with session_factory() as session:
+            return await memory.recall(
+                session,
+                user.id,
+                query,
+                conversation_id,
+                settings.coach_memory_top_k,
+                settings.coach_memory_token_budget,
+            )
+
+    (profile, user_memory_text, wearable), (labs, window), recalled = await asyncio.gather(
+        profile_and_wearable(), labs_and_history(), recall()
     )
-    values = result.scalars().all()
-
-    if not values:
-        return None
-
-    parts = []
-    for v in values:
-        ref = ""
-        if v.reference_range_low is not None and v.reference_range_high is not None:
-            ref = f" (ref: {v.reference_range_low}-{v.reference_range_high})"
-        status_label = v.status.upper() if v.status else ""
-        parts.append(
-            f"- {v.biomarker_name} ({v.biomarker_code}): {v.value} {v.unit}{ref}"
-            f" [{status_label}] ({v.date})"
-        )
+    return profile, user_memory_text, wearable, labs, window, recalled
+
 
-    return "\n".join(parts)
+async def _profile_section(db: AsyncSession, user: User) -> str:
+    profile = await db.get(UserHealthProfile, user.id)
+    return build_profile_context(user, profile)
 
 
 async def build_context(
-    db: AsyncSession,
     user: User,
     conversation_id: uuid.UUID,
-) -> tuple[str, list[dict[str, str]]]:
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+    query: str | None = None,
+    data_sections: bool = True,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]], dict[str, int]]:
     """Assemble the full context for a Claude API call.
 
-    Returns (system_prompt, messages) ready for the API.
+    Profile, wearable and lab sections come from the per-user context cache and
+    are only rebuilt after a writer invalidates them. Whatever is not cached is
+    fetched on at most three pooled connections at once (see _gather_sections).
+
+    The system prompt is returned as ordered content blocks for prompt caching:
+    the static coach prompt, then stable user context (profile, labs), then
+    volatile context (wearable, conversation summary). The last history message
+    carries a breakpoint too, so the conversation prefix is read from cache on
+    the next turn. Nothing that depends on the new message goes before that
+    breakpoint, so the system blocks and history are byte-identical from one
+    turn to the next.
+
+    History is the newest messages that fit ``coach_history_token_budget``;
+    older turns are represented by the conversation's rolling summary, and
+    what the user shared across all conversations by their fixed-size memory
+    (``UserHealthProfile.ai_summary``, see user_memory.py). With a
+    ``query`` (the new user message), snippets recalled from the user's other
+    conversations, labs and wearable days are prepended to that final user
+    turn, within ``coach_memory_token_budget``; the breakpoint then moves to
+    the message before it.
+
+    With ``data_sections`` off the lab and wearable sections are left out; the
+    model fetches them through tools when a turn needs them. The note telling
+    it to use them is its own block after the static prompt, sent only with
+    ``coach_tools_enabled``.
+
+    Each section is capped by its own budget, and if the whole prompt is over
+    ``coach_context_token_budget`` the lowest-priority sections are cut first
+    (see ``TRIM_ORDER``).
+
+    Returns (system_blocks, messages) ready for the API, plus the estimated
+    tokens each section contributed.
     """
+
+    (
+        profile_text,
+        user_memory_text,
+        wearable_text,
+        lab_text,
+        (summary_text, window),
+        memory_text,
+    ) = await _gather_sections(user, conversation_id, session_factory, query, data_sections)
+
     system_prompt = get_system_prompt(user.language)
+    tools_prompt = get_tools_prompt(user.language) if settings.coach_tools_enabled else None
+    fixed = {
+        "system_prompt": estimate_tokens(system_prompt)
+        + (estimate_tokens(tools_prompt) if tools_prompt else 0),
+        "history": sum(m["tokens"] for m in window),
+    }
+    texts, tokens = fit_sections(
+        {
+            "profile": profile_text,
+            "user_memory": user_memory_text,
+            "labs": lab_text,
+            "wearable": wearable_text,
+            "summary": summary_text,
+            "memory": memory_text,
+        },
+        sum(fixed.values()),
+    )
 
-    # Add user profile context
-    profile = await db.get(UserHealthProfile, user.id)
-    profile_text = _build_profile_context(user, profile)
-    system_prompt += f"\n\n## Perfil del Usuario\n{profile_text}"
+    stable = f"## Perfil del Usuario\n{texts['profile']}"
+    if texts["labs"]:
+        stable += f"\n\n## Resultados de Laboratorio\n{texts['labs']}"
+    if texts["user_memory"]:
+        # Changes every few dozen turns, so it goes after the rarely-changing labs
+        stable += f"\n\n## Lo que Sabes del Usuario\n{texts['user_memory']}"
+
+    system = [text_block(system_prompt, cache=True)]
+    if tools_prompt:
+        # Fixed per deployment, so it sits inside the cached prefix
+        system.append(text_block(tools_prompt))
+    system.append(text_block(stable, cache=True))
+    if texts["wearable"]:
+        system.append(text_block(f"## Datos de Wearable\n{texts['wearable']}"))
+    if texts["summary"]:
+        system.append(text_block(f"## Resumen de la Conversacion\n{texts['summary']}"))
+
+    messages: list[dict[str, Any]] = [{"role": m["role"], "content": m["content"]} for m in window]
+    turn = None
+    if texts["memory"] and messages and messages[-1]["role"] == "user":
+        # Recall changes with every message, so it rides on the new turn, past
+        # the last breakpoint, where it cannot invalidate the cached prefix
+        turn = {
+            "role": "user",
+            "content": [
+                text_block(f"## Memoria de Largo Plazo\n{texts['memory']}"),
+                text_block(messages.pop()["content"]),
+            ],
+        }
+    if messages:
+        last = messages[-1]
+        messages[-1] = {
+            "role": last["role"],
+            "content": [text_block(last["content"], cache=True)],
+        }
+    if turn is not None:
+        messages.append(turn)
+
+    return system, messages, {**fixed, **tokens}
+
+
+def schedule_prefetch(user: User, conversation_id: uuid.UUID) -> None:
+    """Warm the context the next turn in this conversation needs, in the background.
+
+    Called when a conversation is opened, so the first message finds its
+    sections and history window cached. At most one runs per conversation.
+    """
+    if conversation_id in _prefetches:
+        return
+    task = background.spawn(
+        prefetch_context(user, conversation_id), name=f"coach_prefetch:{conversation_id}"
+    )
+    _prefetches[conversation_id] = task
+    task.add_done_callback(lambda _: _prefetches.pop(conversation_id, None))
 
-    # Add wearable data context
-    wearable_text = await _build_wearable_context(db, user.id)
-    if wearable_text:
-        system_prompt += f"\n\n## Datos de Wearable\n{wearable_text}"
 
-    # Add lab results context
-    lab_text = await _build_lab_context(db, user.id)
-    if lab_text:
-        system_prompt += f"\n\n## Resultados de Laboratorio\n{lab_text}"
+async def prefetch_context(
+    user: User,
+    conversation_id: uuid.UUID,
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> None:
+    """Fill the context cache with everything ``build_context`` reads except recall."""
+    started = time.perf_counter()
+    await _gather_sections(
+        user, conversation_id, session_factory, None, not settings.coach_tools_enabled
+    )
+    metrics.observe("coach_prefetch_ms", (time.perf_counter() - started) * 1000)
 
-    # Get conversation history
-    messages = await _get_conversation_history(db, conversation_id)
 
-    return system_prompt, messages
+async def _await_prefetch(conversation_id: uuid.UUID) -> None:
+    # A turn arriving mid-prefetch reuses it rather than racing it for the same rows
+    task = _prefetches.get(conversation_id)
+    if task is None:
+        return
+    started = time.perf_counter()
+    await asyncio.wait({task}, timeout=PREFETCH_WAIT_SECONDS)
+    metrics.observe("coach_prefetch_wait_ms", (time.perf_counter() - started) * 1000)
 
 
 async def stream_response(
-    db: AsyncSession,
     user: User,
     conversation: Conversation,
     user_message: str,
+    message_id: uuid.UUID | None = None,
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
 ) -> AsyncGenerator[str]:
     """Stream a Claude response for the given user message.
 
-    Saves both the user message and assistant response to the database.
-    Yields text chunks as they arrive.
+    Saves both the user message and assistant response to the database, each
+    in a short unit of work on its own session, so no pooled connection is
+    held while the model streams. Yields text chunks as they arrive.
+
+    If the stream is cancelled (the client disconnected), the text generated so
+    far is saved with ``truncated: true`` in its metadata. ``message_id`` is the
+    id the assistant message is saved under, so clients can refer to the reply
+    while it is still streaming.
     """
+    message_id = message_id or uuid.uuid4()
+    budget = settings.coach_history_token_budget
+    received = time.perf_counter()
+    await _await_prefetch(conversation.id)
+
     # Save user message
-    user_msg = Message(
-        conversation_id=conversation.id,
-        role="user",
-        content=user_message,
+    user_tokens = estimate_tokens(user_message)
+    async with session_factory() as db:
+        user_message_id = uuid.uuid4()
+        db.add(
+            Message(
+                id=user_message_id,
+                conversation_id=conversation.id,
+                role="user",
+                content=user_message,
+                metadata_={"tokens": user_tokens},
+            )
+        )
+        await _touch_conversation(db, conversation.id, user_message)
+        await memory.index(
+            db, user.id, "user", user_message_id, user_message, user.language, conversation.id
+        )
+        await db.commit()
+    overflow = context_cache.append_history(
+        conversation.id, "user", user_message, user_tokens, budget
     )
-    db.add(user_msg)
-    await db.commit()
 
     # Build context
-    system_prompt, history = await build_context(db, user, conversation.id)
-
-    # Call Claude with streaming
-    client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
-
-    full_response = ""
-    async with client.messages.stream(
-        model=MODEL,
-        max_tokens=1024,
-        system=system_prompt,
-        messages=history,
-    ) as stream:
-        async for text in stream.text_stream:
-            full_response += text
-            yield text
-
-    # Save assistant response
-    assistant_msg = Message(
-        conversation_id=conversation.id,
-        role="assistant",
-        content=full_response,
+    system, history, context_tokens = await build_context(
+        user,
+        conversation.id,
+        session_factory,
+        user_message,
+        data_sections=not settings.coach_tools_enabled,
     )
-    db.add(assistant_msg)
+    for section, tokens in context_tokens.items():
+        metrics.observe("coach_context_tokens", tokens, section=section)
+    route = routing.choose_route(user_message, history, conversation.conversation_type)
+    metrics.incr("coach_routes", route=route.name, reason=route.reason)
+    turn = {"model": route.model, "route": route.name, "max_tokens": route.max_tokens}
+    # Everything before the model call; the user waits for it on top of ttft_ms
+    timing: dict[str, float] = {"context_ms": round((time.perf_counter() - received) * 1000, 1)}
+
+    # Call Claude with streaming through the pooled gateway. With tools on, each
+    # round that ends in tool calls runs them and streams the continuation.
+    full_response = round_text = ""
+    usage: dict[str, int] = {}
+    tool_calls: list[dict[str, Any]] = []
+    messages = history
+    started = time.perf_counter()
+    try:
+        for round_ in range(MAX_TOOL_ROUNDS + 1):
+            params: dict[str, Any] = {}
+            if settings.coach_tools_enabled:
+                params["tools"] = tools.TOOLS
+                if round_ == MAX_TOOL_ROUNDS:
+                    params["tool_choice"] = {"type": "none"}
+            round_text = ""
+            async with llm.get_gateway().stream(
+                user.id,
+                model=route.model,
+                max_tokens=route.max_tokens,
+                system=system,
+                messages=messages,
+                **params,
+            ) as stream:
+                async for text in stream.text_stream():
+                    if not full_response:
+                        timing["ttft_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    elif not round_text and not full_response[-1].isspace():
+                        text = "\n\n" + text
+                    round_text += text
+                    full_response += text
+                    yield text
+                final_message = await stream.get_final_message()
+            for field, value in llm.usage_metadata(final_message.usage).items():
+                usage[field] = usage.get(field, 0) + value
+
+            calls = [b for b in final_message.content if b.type == "tool_use"]
+            if final_message.stop_reason != "tool_use" or not calls:
+                break
+            results = await _run_tools(calls, user.id, session_factory)
+            tool_calls += [
+                {"name": call.name, "input": call.input, **meta}
+                for call, (_, meta) in zip(calls, results, strict=True)
+            ]
+            messages = [
+                *messages,
+                {
+                    "role": "assistant",
+                    "content": [b.model_dump(exclude_none=True) for b in final_message.content],
+                },
+                {"role": "user", "content": [block for block, _ in results]},
+            ]
+        timing["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    except (asyncio.CancelledError, GeneratorExit):
+        # The client went away mid-stream. The cut round's usage never arrives;
+        # meter its output from the text, so cancelling is not free
+        if usage or round_text:
+            usage["output_tokens"] = usage.get("output_tokens", 0) + estimate_tokens(round_text)
+            usage_ledger.record(user.id, "coach", "anthropic", route.model, **usage)
+        # Keep what was already generated
+        if full_response:
+            await asyncio.shield(
+                _save_assistant_message(
+                    session_factory,
+                    message_id,
+                    user,
+                    conversation,
+                    user_message,
+                    full_response,
+                    {
+                        **turn,
+                        "tokens": estimate_tokens(full_response),
+                        "context_tokens": context_tokens,
+                        **timing,
+                        "truncated": True,
+                    },
+                )
+            )
+        raise
+
+    for field, count in usage.items():
+        metrics.incr("coach_tokens", count, kind=field)
+    usage_ledger.record(user.id, "coach", "anthropic", route.model, **usage)
+    for name, ms in timing.items():
+        metrics.observe(f"coach_{name}", ms, route=route.name)
+
+    assistant_tokens = usage.get("output_tokens") or estimate_tokens(full_response)
+    overflow |= await _save_assistant_message(
+        session_factory,
+        message_id,
+        user,
+        conversation,
+        user_message,
+        full_response,
+        {
+            **turn,
+            "usage": usage,
+            "tokens": assistant_tokens,
+            "context_tokens": context_tokens,
+            **timing,
+            **({"tool_calls": tool_calls} if tool_calls else {}),
+        },
+    )
+
+    # The window outgrew its budget: fold the oldest turns into the summary
+    if overflow:
+        summary.schedule_refresh(user.id, conversation.id)
+    user_memory.note_turn(user.id, user_tokens + assistant_tokens)
 
-    # Update conversation title from first exchange if not set
-    if conversation.title is None and full_response:
-        conversation.title = user_message[:100]
 
-    await db.commit()
+async def _run_tools(
+    calls: list[Any], user_id: uuid.UUID, session_factory: async_sessionmaker[AsyncSession]
+) -> list[tuple[dict[str, Any], dict[str, Any]]]:
+    """Run a round's tool calls concurrently.
+
+    Returns a tool_result block for the model and a metadata entry per call.
+    """
+
+    async def run_one(call: Any) -> tuple[dict[str, Any], dict[str, Any]]:
+        started = time.perf_counter()
+        result = await tools.run(call.name, call.input, user_id, session_factory)
+        block = {
+            "type": "tool_result",
+            "tool_use_id": call.id,
+            "content": result.content,
+            "is_error": result.is_error,
+        }
+        meta = {
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+            "tokens": estimate_tokens(result.content),
+            "is_error": result.is_error,
+        }
+        return block, meta
+
+    started = time.perf_counter()
+    results = list(await asyncio.gather(*(run_one(call) for call in calls)))
+    metrics.observe("coach_tool_round_ms", (time.perf_counter() - started) * 1000)
+    return results
+
+
+async def _save_assistant_message(
+    session_factory: async_sessionmaker[AsyncSession],
+    message_id: uuid.UUID,
+    user: User,
+    conversation: Conversation,
+    user_message: str,
+    content: str,
+    metadata: dict[str, Any],
+) -> bool:
+    """Persist an assistant reply and extend the cached history window.
+
+    Returns True if the history window overflowed its token budget.
+    """
+    async with session_factory() as db:
+        db.add(
+            Message(
+                id=message_id,
+                conversation_id=conversation.id,
+                role="assistant",
+                content=content,
+                metadata_=metadata,
+            )
+        )
+        await _touch_conversation(db, conversation.id, content)
+        await memory.index(
+            db, user.id, "assistant", message_id, content, user.language, conversation.id
+        )
+
+        # Update conversation title from first exchange if not set
+        if conversation.title is None and content:
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation.id, Conversation.title.is_(None))
+                .values(title=user_message[:100])
+            )
+
+        await db.commit()
+    return context_cache.append_history(
+        conversation.id,
+        "assistant",
+        content,
+        metadata["tokens"],
+        settings.coach_history_token_budget,
+    )
+
+
+async def _touch_conversation(db: AsyncSession, conversation_id: uuid.UUID, content: str) -> None:
+    """Bump the conversation's inbox columns for a message saved in the same transaction.
+
+    The count is incremented in SQL, so concurrent writers never lose an update.
+    """
+    await db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(
+            last_message_at=func.now(),
+            last_message_preview=" ".join(content.split())[:PREVIEW_CHARS],
+            message_count=Conversation.message_count + 1,
+        )
+    )
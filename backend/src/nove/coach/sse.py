@@ -0,0 +1,85 @@
+# ABOUTME: Server-Sent Events framing for coach streams: JSON events, ids, and heartbeats.
+# ABOUTME: Relays a reply's replay buffer from any position, coalescing token deltas.
+
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from nove.coach import replay
+
+HEARTBEAT_SECONDS = 15.0
+# Deltas arriving within this window are sent as one event
+COALESCE_SECONDS = 0.05
+
+
+def encode(event: str, data: dict[str, Any], event_id: int | str | None = None) -> str:
+    """Frame one SSE event. JSON data keeps newlines in text from breaking the framing."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def heartbeat() -> str:
+    """An SSE comment line: ignored by clients, keeps proxies from timing out the stream."""
+    return ": ping\n\n"
+
+
+async def event_stream(
+    request: Request, buffer: replay.StreamBuffer, position: int = 0
+) -> AsyncIterator[str]:
+    """Relay a reply buffer as SSE, starting after ``position`` chunks.
+
+    Sends ``start`` (with the message id to resume by), then ``delta`` events,
+    then ``done`` or ``error``. Event ids are buffer positions, so a client that
+    reconnects with Last-Event-ID picks up exactly where it left off.
+    Generation runs independently of this stream; detaching only starts the
+    buffer's grace period.
+    """
+    position = max(0, min(position, len(buffer.chunks)))
+    replay.subscribe(buffer)
+    try:
+        yield encode("start", {"message_id": str(buffer.message_id)}, position)
+        while True:
+            if not await buffer.wait(position, HEARTBEAT_SECONDS):
+                if await request.is_disconnected():
+                    return
+                yield heartbeat()
+                continue
+
+            # Let deltas that arrive close together go out as one write
+            if not buffer.done:
+                await asyncio.sleep(COALESCE_SECONDS)
+            text = "".join(buffer.chunks[position:])
+            position = len(buffer.chunks)
+            if text:
+                yield encode("delta", {"text": text}, position)
+
+            if buffer.done and position == len(buffer.chunks):
+                if buffer.failed:
+                    yield encode("error", {"message": "No pudimos generar una respuesta"})
+                else:
+                    yield encode("done", {"message_id": str(buffer.message_id)})
+                return
+    finally:
+        replay.unsubscribe(buffer)
+
+
+def streaming_response(
+    request: Request, buffer: replay.StreamBuffer, position: int = 0
+) -> StreamingResponse:
+    return StreamingResponse(
+        event_stream(request, buffer, position),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,156 @@
+# ABOUTME: Rolling conversation summaries that stand in for turns outside the history window.
+# ABOUTME: Refreshed in the background once a conversation outgrows its history token budget.
+
+import uuid
+
+import structlog
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove import background, metrics
+from nove.billing import usage
+from nove.coach import context_cache, llm
+from nove.coach.models import Conversation, Message
+from nove.coach.prompts import SUMMARY_PROMPT
+from nove.config import settings
+from nove.database import async_session_factory
+
+logger = structlog.get_logger()
+
+SUMMARY_MODEL = "claude-haiku-4-5-20251001"
+ROLE_LABELS = {"user": "Usuario", "assistant": "Coach"}
+# Most conversation read per fold; a longer backlog is caught up over several
+MAX_FOLD_MESSAGES = 200
+MAX_FOLD_TOKENS = 12_000
+
+_refreshing: set[uuid.UUID] = set()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) used for budgeting."""
+    return max(1, len(text) // 4)
+
+
+def message_tokens(message: Message) -> int:
+    """Token count recorded when the message was saved, estimated for older rows."""
+    tokens = (message.metadata_ or {}).get("tokens")
+    return tokens if isinstance(tokens, int) else estimate_tokens(message.content)
+
+
+def schedule_refresh(user_id: uuid.UUID, conversation_id: uuid.UUID) -> None:
+    """Refresh the conversation summary in the background, at most once at a time."""
+    if conversation_id in _refreshing:
+        return
+    _refreshing.add(conversation_id)
+    task = background.spawn(
+        _catch_up(user_id, conversation_id), name=f"coach_summary:{conversation_id}"
+    )
+    task.add_done_callback(lambda _: _refreshing.discard(conversation_id))
+
+
+async def _catch_up(user_id: uuid.UUID, conversation_id: uuid.UUID) -> None:
+    # Each refresh folds one capped chunk; a long backlog takes several
+    while await refresh_summary(user_id, conversation_id):
+        pass
+
+
+def take_fold(messages: list[Message]) -> list[Message]:
+    """The oldest of ``messages`` that fit MAX_FOLD_TOKENS, at least one."""
+    fold: list[Message] = []
+    tokens = 0
+    for message in messages:
+        size = message_tokens(message)
+        if fold and tokens + size > MAX_FOLD_TOKENS:
+            break
+        fold.append(message)
+        tokens += size
+    return fold
+
+
+async def refresh_summary(
+    user_id: uuid.UUID,
+    conversation_id: uuid.UUID,
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> bool:
+    """Fold the oldest unsummarized turns into the conversation summary.
+
+    The newest half of the history budget stays verbatim, so after a refresh
+    the window has room to grow before the next one. At most MAX_FOLD_MESSAGES
+    and MAX_FOLD_TOKENS are folded per call, oldest first, so the prompt stays
+    bounded however far behind the summary is. Returns True if the summary
+    moved forward.
+    """
+    async with session_factory() as db:
+        conversation = await db.get(Conversation, conversation_id)
+        if conversation is None:
+            return False
+        previous, watermark = conversation.summary, conversation.summary_through
+        unsummarized = select(Message).where(
+            Message.conversation_id == conversation_id, Message.role != "system"
+        )
+        if watermark is not None:
+            unsummarized = unsummarized.where(Message.created_at > watermark)
+        newest = list(
+            await db.scalars(
+                unsummarized.order_by(Message.created_at.desc()).limit(MAX_FOLD_MESSAGES)
+            )
+        )
+        newest.reverse()
+        kept = [{"role": m.role, "tokens": message_tokens(m)} for m in newest]
+        context_cache.fit_to_budget(kept, settings.coach_history_token_budget // 2)
+        if len(kept) == len(newest) and len(newest) < MAX_FOLD_MESSAGES:
+            # Everything unsummarized fits in the verbatim half
+            return False
+        keep_from = newest[len(newest) - len(kept)].created_at
+        fold = take_fold(
+            list(
+                await db.scalars(
+                    unsummarized.where(Message.created_at < keep_from)
+                    .order_by(Message.created_at)
+                    .limit(MAX_FOLD_MESSAGES)
+                )
+            )
+        )
+    if not fold:
+        return False
+
+    transcript = "\n\n".join(f"{ROLE_LABELS[m.role]}: {m.content}" for m in fold)
+    prompt = f"Mensajes nuevos:\n{transcript}"
+    if previous:
+        prompt = f"Resumen previo:\n{previous}\n\n{prompt}"
+
+    reply = await llm.get_gateway().complete(
+        user_id,
+        model=SUMMARY_MODEL,
+        max_tokens=512,
+        system=SUMMARY_PROMPT,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    usage.record_message(user_id, "coach_summary", reply)
+    text = "".join(block.text for block in reply.content if block.type == "text").strip()
+    if not text:
+        return False
+
+    async with session_factory() as db:
+        # Only advance from the watermark we summarized from; a concurrent refresh wins
+        advanced = await db.scalar(
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.summary_through.is_not_distinct_from(watermark),
+            )
+            .values(
+                summary=text,
+                summary_through=fold[-1].created_at,
+                updated_at=Conversation.updated_at,
+            )
+            .returning(Conversation.id)
+        )
+        await db.commit()
+    if advanced is None:
+        return False
+
+    context_cache.drop_history(conversation_id)
+    metrics.incr("coach_summary_refreshes")
+    logger.info("coach_summary_refreshed", conversation_id=str(conversation_id), folded=len(fold))
+    return True
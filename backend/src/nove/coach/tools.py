@@ -0,0 +1,145 @@
+# ABOUTME: Tools the coach model calls to fetch lab and wearable data only when a turn needs it.
+# ABOUTME: Each tool runs on its own session; lab and wearable sections go through context_cache.
+
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove import metrics
+from nove.coach import context
+from nove.coach.context import WEARABLE_DAYS
+from nove.labs.models import LabBiomarkerValue
+from nove.labs.summary import biomarker_line
+
+logger = structlog.get_logger()
+
+MAX_WEARABLE_DAYS = 90
+MAX_HISTORY_POINTS = 20
+
+TOOLS: list[dict[str, Any]] = [
+    {
+        "name": "get_lab_overview",
+        "description": (
+            "Latest value of every biomarker the user has measured, with the previous value "
+            "and the change, plus summaries of their most recent lab results. Call this before "
+            "discussing the user's labs in general."
+        ),
+        "input_schema": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "get_biomarker_history",
+        "description": (
+            "Every measurement of one biomarker, newest first, with status and reference range. "
+            "Use it for trends of a specific marker."
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "biomarker_code": {
+                    "type": "string",
+                    "description": "Standard short code, e.g. GLU, HBA1C, LDL, TSH, FERR, VIT_D",
+                },
+            },
+            "required": ["biomarker_code"],
+        },
+    },
+    {
+        "name": "get_wearable_summary",
+        "description": (
+            "Average sleep, steps, resting heart rate and stress from the user's Garmin over "
+            "the last N days. Returns a notice if no wearable is connected."
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "days": {"type": "integer", "minimum": 1, "maximum": MAX_WEARABLE_DAYS},
+            },
+            "required": ["days"],
+        },
+    },
+]
+
+
+@dataclass
+class ToolResult:
+    content: str
+    is_error: bool = False
+
+
+async def _lab_overview(db: AsyncSession, user_id: uuid.UUID, _: dict[str, Any]) -> ToolResult:
+    text = await context.lab_section(db, user_id)
+    return ToolResult(text or "El usuario no tiene resultados de laboratorio.")
+
+
+async def _biomarker_history(
+    db: AsyncSession, user_id: uuid.UUID, args: dict[str, Any]
+) -> ToolResult:
+    code = str(args.get("biomarker_code", "")).strip().upper()
+    values = list(
+        await db.scalars(
+            select(LabBiomarkerValue)
+            .where(LabBiomarkerValue.user_id == user_id, LabBiomarkerValue.biomarker_code == code)
+            .order_by(LabBiomarkerValue.date.desc())
+            .limit(MAX_HISTORY_POINTS)
+        )
+    )
+    if values:
+        return ToolResult("\n".join(f"{biomarker_line(v)} ({v.date})" for v in values))
+
+    codes = list(
+        await db.scalars(
+            select(LabBiomarkerValue.biomarker_code)
+            .where(LabBiomarkerValue.user_id == user_id)
+            .distinct()
+            .order_by(LabBiomarkerValue.biomarker_code)
+        )
+    )
+    available = ", ".join(codes) if codes else "ninguno"
+    return ToolResult(f"No hay valores de {code}. Codigos disponibles: {available}.")
+
+
+async def _wearable_summary(
+    db: AsyncSession, user_id: uuid.UUID, args: dict[str, Any]
+) -> ToolResult:
+    try:
+        days = int(args.get("days", WEARABLE_DAYS))
+    except (TypeError, ValueError):
+        return ToolResult("days debe ser un entero.", is_error=True)
+    days = max(1, min(days, MAX_WEARABLE_DAYS))
+    text = await context.wearable_section(db, user_id, days)
+    return ToolResult(text or "No hay datos de wearable para ese periodo o no esta conectado.")
+
+
+_HANDLERS = {
+    "get_lab_overview": _lab_overview,
+    "get_biomarker_history": _biomarker_history,
+    "get_wearable_summary": _wearable_summary,
+}
+
+
+async def run(
+    name: str,
+    args: dict[str, Any],
+    user_id: uuid.UUID,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> ToolResult:
+    """Run one tool call for ``user_id``. Failures are returned to the model, not raised."""
+    handler = _HANDLERS.get(name)
+    if handler is None:
+        return ToolResult(f"Herramienta desconocida: {name}", is_error=True)
+
+    started = time.perf_counter()
+    try:
+        async with session_factory() as db:
+            result = await handler(db, user_id, args)
+    except Exception:
+        logger.exception("coach_tool_failed", tool=name)
+        result = ToolResult("No se pudo obtener el dato.", is_error=True)
+    metrics.observe("coach_tool_ms", (time.perf_counter() - started) * 1000, tool=name)
+    metrics.incr("coach_tool_calls", tool=name, outcome="error" if result.is_error else "ok")
+    return result
@@ -0,0 +1,146 @@
+# ABOUTME: Long-term per-user memory folded from all conversations into the profile's ai_summary.
+# ABOUTME: Refreshed in the background once enough new conversation has built up since the last.
+
+import uuid
+
+import structlog
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove import background, metrics
+from nove.billing import usage
+from nove.coach import context_cache, llm
+from nove.coach.context import truncate_lines
+from nove.coach.models import Conversation, Message
+from nove.coach.prompts import get_user_memory_prompt
+from nove.coach.summary import (
+    MAX_FOLD_MESSAGES,
+    ROLE_LABELS,
+    SUMMARY_MODEL,
+    message_tokens,
+    take_fold,
+)
+from nove.config import settings
+from nove.database import async_session_factory
+from nove.users.models import User, UserHealthProfile
+
+logger = structlog.get_logger()
+
+# Room over the memory budget so the model finishes its last section; what it
+# writes is then trimmed back to the budget at a line boundary
+MAX_TOKENS_HEADROOM = 256
+# Transcript headings, in the language the memory is written in
+HEADINGS = {
+    "es": ("Memoria actual", "Mensajes nuevos"),
+    "en": ("Current memory", "New messages"),
+}
+
+# user -> conversation tokens saved in this process since the last fold was scheduled
+_pending: dict[uuid.UUID, int] = {}
+_folding: set[uuid.UUID] = set()
+
+
+def note_turn(user_id: uuid.UUID, tokens: int) -> None:
+    """Count newly saved conversation tokens, folding them in once enough built up.
+
+    The count is only a cheap trigger; the fold itself re-reads everything
+    after the watermark, so turns counted by another process are not lost.
+    """
+    pending = _pending.get(user_id, 0) + tokens
+    if pending < settings.coach_user_memory_trigger_tokens:
+        _pending[user_id] = pending
+        return
+    _pending.pop(user_id, None)
+    schedule_fold(user_id)
+
+
+def schedule_fold(user_id: uuid.UUID) -> None:
+    """Fold new turns into the user's memory in the background, at most once at a time."""
+    if user_id in _folding:
+        return
+    _folding.add(user_id)
+    task = background.spawn(fold_memory(user_id), name=f"coach_user_memory:{user_id}")
+    task.add_done_callback(lambda _: _folding.discard(user_id))
+
+
+async def fold_memory(
+    user_id: uuid.UUID,
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> bool:
+    """Fold turns newer than the watermark into the user's memory document.
+
+    Does nothing until ``coach_user_memory_trigger_tokens`` of new conversation
+    exist. The memory is written in the user's language and stored within
+    ``coach_user_memory_token_budget``, cut at a line boundary. Returns True if
+    the memory moved forward.
+    """
+    async with session_factory() as db:
+        user = await db.get(User, user_id)
+        profile = await db.get(UserHealthProfile, user_id)
+        previous = profile.ai_summary if profile else None
+        watermark = profile.ai_summary_through if profile else None
+        query = (
+            select(Message)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(Conversation.user_id == user_id, Message.role != "system")
+            .order_by(Message.created_at)
+            .limit(MAX_FOLD_MESSAGES)
+        )
+        if watermark is not None:
+            query = query.where(Message.created_at > watermark)
+        messages = (await db.execute(query)).scalars().all()
+
+    fold = take_fold(list(messages))
+    if sum(message_tokens(m) for m in fold) < settings.coach_user_memory_trigger_tokens:
+        return False
+
+    language = user.language if user is not None else "es"
+    current_heading, new_heading = HEADINGS.get(language, HEADINGS["en"])
+    transcript = "\n\n".join(f"{ROLE_LABELS[m.role]}: {m.content}" for m in fold)
+    prompt = f"{new_heading}:\n{transcript}"
+    if previous:
+        prompt = f"{current_heading}:\n{previous}\n\n{prompt}"
+
+    reply = await llm.get_gateway().complete(
+        user_id,
+        model=SUMMARY_MODEL,
+        max_tokens=settings.coach_user_memory_token_budget + MAX_TOKENS_HEADROOM,
+        system=get_user_memory_prompt(language),
+        messages=[{"role": "user", "content": prompt}],
+    )
+    usage.record_message(user_id, "user_memory", reply)
+    text = "".join(block.text for block in reply.content if block.type == "text").strip()
+    if reply.stop_reason == "max_tokens":
+        # Drop the line the model was cut off in
+        text = text.rpartition("\n")[0].rstrip()
+    memory_text = truncate_lines(text, settings.coach_user_memory_token_budget) if text else None
+    if not memory_text:
+        return False
+
+    async with session_factory() as db:
+        await db.execute(
+            insert(UserHealthProfile).values(user_id=user_id).on_conflict_do_nothing()
+        )
+        # Only advance from the watermark we folded from; a concurrent fold wins
+        advanced = await db.scalar(
+            update(UserHealthProfile)
+            .where(
+                UserHealthProfile.user_id == user_id,
+                UserHealthProfile.ai_summary_through.is_not_distinct_from(watermark),
+            )
+            .values(
+                ai_summary=memory_text,
+                ai_summary_through=fold[-1].created_at,
+                updated_at=UserHealthProfile.updated_at,
+            )
+            .returning(UserHealthProfile.user_id)
+        )
+        await db.commit()
+    if advanced is None:
+        return False
+
+    context_cache.invalidate(user_id, "user_memory")
+    metrics.incr("coach_user_memory_folds")
+    logger.info("coach_user_memory_folded", user_id=str(user_id), folded=len(fold))
+    return True
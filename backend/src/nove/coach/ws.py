@@ -0,0 +1,313 @@
+# ABOUTME: WebSocket coach channel: one authenticated socket carrying many conversations' replies.
+# ABOUTME: Auth and verified conversations are kept per socket; the user is reloaded each turn.
+
+import asyncio
+import contextlib
+import json
+import time
+import uuid
+from collections.abc import Coroutine
+from typing import Any
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from nove import metrics
+from nove.auth.service import verify_access_token
+from nove.billing import quota
+from nove.coach import admission, replay
+from nove.coach.models import Conversation
+from nove.coach.schemas import MessageCreate
+from nove.coach.service import schedule_prefetch, stream_response
+from nove.coach.sse import COALESCE_SECONDS, HEARTBEAT_SECONDS
+from nove.database import async_session_factory
+from nove.users.models import User
+
+router = APIRouter(prefix="/conversations", tags=["coach"])
+
+AUTH_TIMEOUT_SECONDS = 10.0
+# Conversations whose ownership check is remembered per socket
+MAX_CONVERSATIONS = 16
+# Replies relayed at once per socket
+MAX_STREAMS = 4
+CLOSE_UNAUTHORIZED = 4401
+
+_sockets: set["CoachSocket"] = set()
+
+
+async def _authenticate(frame: object) -> tuple[User, float] | None:
+    if not isinstance(frame, dict) or frame.get("type") != "auth":
+        return None
+    payload = verify_access_token(str(frame.get("token", "")))
+    user_id = _uuid(payload["sub"]) if payload else None
+    if payload is None or user_id is None:
+        return None
+    async with async_session_factory() as db:
+        user = await db.get(User, user_id)
+    return (user, float(payload["exp"])) if user is not None else None
+
+
+class CoachSocket:
+    """State of one authenticated socket.
+
+    Most sockets sit idle between turns, so this holds little: the user as of
+    the last frame that loaded it and the conversations already checked to be
+    theirs. ``send`` and ``open`` reload the user by primary key, since its
+    profile, tier and language may have changed since the socket
+    authenticated. The frames it relays carry a ``message_id`` and
+    ``conversation_id``, so several replies can stream at once.
+    """
+
+    __slots__ = ("websocket", "user", "expires_at", "conversations", "relays", "send_lock")
+
+    def __init__(self, websocket: WebSocket, user: User, expires_at: float) -> None:
+        self.websocket = websocket
+        self.user = user
+        self.expires_at = expires_at
+        self.conversations: dict[uuid.UUID, Conversation] = {}
+        self.relays: dict[uuid.UUID, asyncio.Task[None]] = {}
+        self.send_lock = asyncio.Lock()
+
+    async def send(self, frame: dict[str, Any]) -> None:
+        async with self.send_lock:
+            await self.websocket.send_text(json.dumps(frame, ensure_ascii=False))
+
+    async def error(self, detail: str, **fields: object) -> None:
+        await self.send({"type": "error", "detail": detail, **fields})
+
+    async def _reload_user(self, db: AsyncSession) -> User | None:
+        user = await db.get(User, self.user.id)
+        if user is not None:
+            self.user = user
+        return user
+
+    async def conversation(self, raw_id: object) -> Conversation | None:
+        conversation_id = _uuid(raw_id)
+        if conversation_id is None:
+            return None
+        conversation = self.conversations.get(conversation_id)
+        if conversation is not None:
+            return conversation
+        async with async_session_factory() as db:
+            conversation = (
+                await db.scalars(
+                    select(Conversation).where(
+                        Conversation.id == conversation_id, Conversation.user_id == self.user.id
+                    )
+                )
+            ).first()
+        if conversation is None:
+            return None
+        if len(self.conversations) >= MAX_CONVERSATIONS:
+            self.conversations.pop(next(iter(self.conversations)))
+        self.conversations[conversation_id] = conversation
+        return conversation
+
+    async def handle(self, frame: dict[str, Any]) -> None:
+        kind = frame.get("type")
+        if kind == "auth":
+            auth = await _authenticate(frame)
+            if auth is None or auth[0].id != self.user.id:
+                await self.error("Invalid token")
+                return
+            self.user, self.expires_at = auth
+            await self.send({"type": "ready"})
+            return
+        if time.time() >= self.expires_at:
+            await self.error("Token expired", code="token_expired")
+            return
+
+        if kind == "open":
+            conversation = await self.conversation(frame.get("conversation_id"))
+            if conversation is None:
+                await self.error("Conversation not found")
+                return
+            async with async_session_factory() as db:
+                user = await self._reload_user(db)
+            if user is None:
+                await self.error("User not found")
+                return
+            schedule_prefetch(user, conversation.id)
+            await self.send({"type": "opened", "conversation_id": str(conversation.id)})
+        elif kind == "send":
+            await self._send_message(frame)
+        elif kind == "resume":
+            await self._resume(frame)
+        elif kind == "cancel":
+            message_id = _uuid(frame.get("message_id"))
+            task = self.relays.get(message_id) if message_id is not None else None
+            if task is not None:
+                task.cancel()
+        else:
+            await self.error("Unknown frame type")
+
+    async def _send_message(self, frame: dict[str, Any]) -> None:
+        conversation = await self.conversation(frame.get("conversation_id"))
+        if conversation is None:
+            await self.error("Conversation not found")
+            return
+        try:
+            body = MessageCreate.model_validate({"content": frame.get("content")})
+        except ValidationError:
+            await self.error("Invalid message")
+            return
+        if len(self.relays) >= MAX_STREAMS:
+            await self.error("Too many streams")
+            return
+        try:
+            async with async_session_factory() as db:
+                user = await self._reload_user(db)
+                if user is not None:
+                    await quota.check(db, user)
+        except quota.QuotaExceededError:
+            await self.error("Monthly usage limit reached", code="quota_exceeded")
+            return
+        if user is None:
+            await self.error("User not found")
+            return
+
+        message_id = uuid.uuid4()
+        self._spawn(message_id, self._admit(user, conversation, body.content, message_id))
+
+    async def _admit(
+        self, user: User, conversation: Conversation, content: str, message_id: uuid.UUID
+    ) -> None:
+        """Wait for a stream slot, then generate and relay the reply.
+
+        Runs as the reply's relay task, so a turn queued for admission never
+        holds up the frames that follow it on the socket.
+        """
+        controller = admission.get_controller()
+        try:
+            await controller.acquire(user.id)
+        except admission.OverloadedError as exc:
+            # The socket may be gone by the time a queued turn is shed
+            with contextlib.suppress(WebSocketDisconnect, RuntimeError, OSError):
+                await self.error(
+                    "Coach is busy, try again shortly",
+                    conversation_id=str(conversation.id),
+                    retry_after=exc.retry_after,
+                )
+            return
+
+        buffer = replay.start(
+            message_id,
+            user.id,
+            conversation.id,
+            stream_response(user, conversation, content, message_id),
+            on_done=lambda: controller.release(user.id),
+        )
+        await self._relay(buffer, 0)
+
+    async def _resume(self, frame: dict[str, Any]) -> None:
+        message_id = _uuid(frame.get("message_id"))
+        buffer = replay.get(message_id) if message_id is not None else None
+        if buffer is None or buffer.user_id != self.user.id:
+            await self.error("Stream not found")
+            return
+        if buffer.message_id in self.relays or len(self.relays) >= MAX_STREAMS:
+            await self.error("Too many streams")
+            return
+        position = frame.get("position", 0)
+        self._spawn(
+            buffer.message_id, self._relay(buffer, position if isinstance(position, int) else 0)
+        )
+        metrics.incr("coach_stream_resumes")
+
+    def _spawn(self, message_id: uuid.UUID, relay: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(relay, name=f"coach_ws:{message_id}")
+        self.relays[message_id] = task
+        task.add_done_callback(lambda _: self.relays.pop(message_id, None))
+
+    async def _relay(self, buffer: replay.StreamBuffer, position: int) -> None:
+        """Relay a reply buffer after ``position`` chunks, like sse.event_stream does."""
+        ids = {
+            "message_id": str(buffer.message_id),
+            "conversation_id": str(buffer.conversation_id),
+        }
+        position = max(0, min(position, len(buffer.chunks)))
+        replay.subscribe(buffer)
+        try:
+            await self.send({"type": "start", **ids, "position": position})
+            while True:
+                if not await buffer.wait(position, HEARTBEAT_SECONDS):
+                    continue
+                if not buffer.done:
+                    await asyncio.sleep(COALESCE_SECONDS)
+                text = "".join(buffer.chunks[position:])
+                position = len(buffer.chunks)
+                if text:
+                    await self.send({"type": "delta", **ids, "text": text, "position": position})
+
+                if buffer.done and position == len(buffer.chunks):
+                    if buffer.failed:
+                        await self.send(
+                            {"type": "error", **ids, "detail": "No pudimos generar una respuesta"}
+                        )
+                    else:
+                        await self.send({"type": "done", **ids})
+                    return
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            # The socket went away; the reply keeps generating within its grace period
+            return
+        finally:
+            replay.unsubscribe(buffer)
+
+    def close(self) -> None:
+        for task in list(self.relays.values()):
+            task.cancel()
+
+
+def _uuid(raw: object) -> uuid.UUID | None:
+    try:
+        return uuid.UUID(str(raw))
+    except ValueError:
+        return None
+
+
+@router.websocket("/ws")
+async def coach_socket(websocket: WebSocket) -> None:
+    """Coach chat over one WebSocket.
+
+    The first frame must be ``{"type": "auth", "token": <access token>}``;
+    send another before the token expires to keep the socket. Then:
+    ``open`` (warms a conversation's context), ``send`` (a message; its reply
+    streams as ``start``/``delta``/``done`` frames tagged with message and
+    conversation ids), ``resume`` (a reply by message id from ``position``)
+    and ``cancel`` (stop relaying one reply). Problems come back as ``error``
+    frames; the socket stays open.
+    """
+    await websocket.accept()
+    try:
+        raw = await asyncio.wait_for(websocket.receive_text(), AUTH_TIMEOUT_SECONDS)
+        auth = await _authenticate(json.loads(raw))
+    except (TimeoutError, ValueError, WebSocketDisconnect):
+        auth = None
+    if auth is None:
+        await websocket.close(CLOSE_UNAUTHORIZED)
+        return
+
+    socket = CoachSocket(websocket, *auth)
+    _sockets.add(socket)
+    metrics.incr("coach_ws_sockets_opened")
+    metrics.set_gauge("coach_ws_sockets", len(_sockets))
+    try:
+        await socket.send({"type": "ready"})
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                frame = json.loads(raw)
+            except ValueError:
+                frame = None
+            if not isinstance(frame, dict):
+                await socket.error("Frames must be JSON objects")
+                continue
+            await socket.handle(frame)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        socket.close()
+        _sockets.discard(socket)
+        metrics.set_gauge("coach_ws_sockets", len(_sockets))
@@ -8,7 +8,12 @@ from sqlalchemy.orm import DeclarativeBase
 
 from nove.config import settings
 
-engine = create_async_engine(settings.database_url, echo=settings.debug)
+engine = create_async_engine(
+    settings.database_url,
+    echo=settings.debug,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+)
 async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
 
@@ -19,3 +24,14 @@ class Base(DeclarativeBase):
 async def get_db() -> AsyncGenerator[AsyncSession]:
     async with async_session_factory() as session:
         yield session
+
+
+async def release_connection(session: AsyncSession) -> None:
+    """Commit the session's open transaction so its connection returns to the pool.
+
+    Call before slow external I/O (LLM streams, OCR, third-party APIs). Loaded
+    objects stay usable since commits don't expire them; the next query checks
+    a connection out again.
+    """
+    if session.in_transaction():
+        await session.commit()
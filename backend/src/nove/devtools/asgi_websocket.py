@@ -0,0 +1,80 @@
+# ABOUTME: In-process WebSocket client for an ASGI app, running on the caller's event loop.
+# ABOUTME: Lets async tests drive WebSocket endpoints next to the shared database engine.
+
+import asyncio
+import json
+from types import TracebackType
+from typing import Any
+
+from starlette.types import ASGIApp, Message
+
+
+class WebSocketClosedError(Exception):
+    def __init__(self, code: int) -> None:
+        super().__init__(f"WebSocket closed with code {code}")
+        self.code = code
+
+
+class ASGIWebSocket:
+    """``async with ASGIWebSocket(app, "/path") as ws`` connects; leaving disconnects."""
+
+    def __init__(self, app: ASGIApp, path: str) -> None:
+        self._app = app
+        self._path = path
+        self._to_app: asyncio.Queue[Message] = asyncio.Queue()
+        self._from_app: asyncio.Queue[Message] = asyncio.Queue()
+        self._task: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> "ASGIWebSocket":
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": self._path,
+            "raw_path": self._path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"test")],
+            "client": ("testclient", 50000),
+            "server": ("test", 80),
+            "subprotocols": [],
+            "state": {},
+        }
+        self._to_app.put_nowait({"type": "websocket.connect"})
+        self._task = asyncio.create_task(
+            self._app(scope, self._to_app.get, self._from_app.put)  # type: ignore[arg-type]
+        )
+        message = await self._receive()
+        if message["type"] != "websocket.accept":
+            raise WebSocketClosedError(message.get("code", 1000))
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def _receive(self, timeout: float = 5.0) -> Message:
+        return await asyncio.wait_for(self._from_app.get(), timeout)
+
+    async def send_json(self, data: object) -> None:
+        await self._to_app.put({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def send_text(self, text: str) -> None:
+        await self._to_app.put({"type": "websocket.receive", "text": text})
+
+    async def receive_json(self, timeout: float = 5.0) -> dict[str, Any]:
+        message = await self._receive(timeout)
+        if message["type"] == "websocket.close":
+            raise WebSocketClosedError(message.get("code", 1000))
+        frame: dict[str, Any] = json.loads(message["text"])
+        return frame
+
+    async def close(self) -> None:
+        if self._task is None or self._task.done():
+            return
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self._task, 5.0)
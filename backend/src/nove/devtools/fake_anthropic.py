@@ -0,0 +1,235 @@
+# ABOUTME: Local fake of the Anthropic Messages streaming API for tests and load tests.
+# ABOUTME: Emits the real SSE event sequence with configurable reply, tool calls, delays, errors.
+"""Usage: uv run python -m nove.devtools.fake_anthropic [--port 8090] [--ttft 0.5]
+    [--tokens-per-second 40] [--reply-words 120] [--error-rate 0.01]
+
+Serves POST /v1/messages so the app can run without real Claude calls: start
+it, then run the API with ANTHROPIC_BASE_URL=http://127.0.0.1:8090.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass, field
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class FakeLLMConfig:
+    reply: str = "Hola, soy Nove."
+    # Delay before the first content event, in seconds
+    ttft: float = 0.0
+    # Delay between content deltas, in seconds
+    delta_interval: float = 0.0
+    # Overrides delta_interval; each delta is one word, about one token
+    tokens_per_second: float = 0.0
+    # Fail this many upcoming requests with error_status before streaming
+    fail_next: int = 0
+    error_status: int = 529
+    # Fraction of requests failed with error_status before streaming, and of
+    # streams cut by an overloaded error event after their first delta
+    error_rate: float = 0.0
+    stream_error_rate: float = 0.0
+    # Extra usage fields reported in message_start, e.g. cache_read_input_tokens
+    usage: dict[str, Any] = field(default_factory=dict)
+    # Set to hold every stream open after its first delta until released
+    gate: asyncio.Event | None = None
+    # Upcoming requests each answer with one of these tool calls, e.g.
+    # {"name": "get_lab_overview", "input": {}}, instead of the text reply
+    tool_calls: list[dict[str, Any]] = field(default_factory=list)
+    requests: list[dict[str, Any]] = field(default_factory=list)
+    # Off for long-running servers, where keeping every request body would grow forever
+    record_requests: bool = True
+    # Streams the client abandoned before message_stop
+    cancelled: int = 0
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _chunks(text: str) -> list[str]:
+    words = text.split(" ")
+    return [w + " " for w in words[:-1]] + [words[-1]]
+
+
+async def _tool_use_events(call: dict[str, Any]) -> AsyncGenerator[str]:
+    yield _sse(
+        "content_block_start",
+        {
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {
+                "type": "tool_use",
+                "id": f"toolu_{uuid.uuid4().hex[:24]}",
+                "name": call["name"],
+                "input": {},
+            },
+        },
+    )
+    yield _sse(
+        "content_block_delta",
+        {
+            "type": "content_block_delta",
+            "index": 0,
+            "delta": {"type": "input_json_delta", "partial_json": json.dumps(call["input"])},
+        },
+    )
+    yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+    yield _sse(
+        "message_delta",
+        {
+            "type": "message_delta",
+            "delta": {"stop_reason": "tool_use", "stop_sequence": None},
+            "usage": {"output_tokens": 20},
+        },
+    )
+    yield _sse("message_stop", {"type": "message_stop"})
+
+
+def create_fake_anthropic_app(config: FakeLLMConfig | None = None) -> FastAPI:
+    """Build an ASGI app that answers POST /v1/messages like Anthropic's streaming API."""
+    config = config or FakeLLMConfig()
+    app = FastAPI()
+    app.state.config = config
+
+    @app.post("/v1/messages", response_model=None)
+    async def messages(request: Request) -> StreamingResponse | JSONResponse:
+        body = await request.json()
+        if config.record_requests:
+            config.requests.append(body)
+
+        if config.fail_next > 0 or random.random() < config.error_rate:
+            config.fail_next = max(0, config.fail_next - 1)
+            return JSONResponse(
+                status_code=config.error_status,
+                content={
+                    "type": "error",
+                    "error": {"type": "overloaded_error", "message": "Overloaded"},
+                },
+            )
+
+        async def events() -> AsyncGenerator[str]:
+            try:
+                async for event in _events():
+                    yield event
+            except asyncio.CancelledError:
+                config.cancelled += 1
+                raise
+
+        tool_call = config.tool_calls.pop(0) if config.tool_calls else None
+        stream_error = random.random() < config.stream_error_rate
+        interval = (
+            1 / config.tokens_per_second if config.tokens_per_second else config.delta_interval
+        )
+
+        async def _events() -> AsyncGenerator[str]:
+            message_id = f"msg_{uuid.uuid4().hex[:24]}"
+            chunks = _chunks(config.reply)
+            yield _sse(
+                "message_start",
+                {
+                    "type": "message_start",
+                    "message": {
+                        "id": message_id,
+                        "type": "message",
+                        "role": "assistant",
+                        "model": body.get("model", "fake"),
+                        "content": [],
+                        "stop_reason": None,
+                        "stop_sequence": None,
+                        "usage": {
+                            "input_tokens": len(json.dumps(body)) // 4,
+                            "output_tokens": 1,
+                            "cache_creation_input_tokens": 0,
+                            "cache_read_input_tokens": 0,
+                            **config.usage,
+                        },
+                    },
+                },
+            )
+            if tool_call is not None:
+                async for event in _tool_use_events(tool_call):
+                    yield event
+                return
+            yield _sse(
+                "content_block_start",
+                {
+                    "type": "content_block_start",
+                    "index": 0,
+                    "content_block": {"type": "text", "text": ""},
+                },
+            )
+            if config.ttft:
+                await asyncio.sleep(config.ttft)
+            for i, chunk in enumerate(chunks):
+                if i and interval:
+                    await asyncio.sleep(interval)
+                yield _sse(
+                    "content_block_delta",
+                    {
+                        "type": "content_block_delta",
+                        "index": 0,
+                        "delta": {"type": "text_delta", "text": chunk},
+                    },
+                )
+                if i == 0 and config.gate is not None:
+                    await config.gate.wait()
+                if i == 0 and stream_error:
+                    yield _sse(
+                        "error",
+                        {
+                            "type": "error",
+                            "error": {"type": "overloaded_error", "message": "Overloaded"},
+                        },
+                    )
+                    return
+            yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+            yield _sse(
+                "message_delta",
+                {
+                    "type": "message_delta",
+                    "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                    "usage": {"output_tokens": len(chunks)},
+                },
+            )
+            yield _sse("message_stop", {"type": "message_stop"})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--ttft", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--reply-words", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        reply=" ".join(["palabra"] * args.reply_words),
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        stream_error_rate=args.stream_error_rate,
+        record_requests=False,
+    )
+    app = create_fake_anthropic_app(config)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# ABOUTME: In-process fake of the Message Batches API for tests and local check-in runs.
+# ABOUTME: Records submitted requests and answers each with a canned reply after N polls.
+
+import uuid
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+
+from nove.worker.checkins import BatchRequest, BatchResult
+
+
+@dataclass
+class FakeBatchProvider:
+    reply: Callable[[BatchRequest], str] = lambda request: "Hola, soy Nove. Como va tu semana?"
+    # Polls answered "still processing" before each batch ends
+    polls_before_done: int = 0
+    # custom_ids that come back errored instead of succeeded
+    fail_ids: set[str] = field(default_factory=set)
+    batches: dict[str, list[BatchRequest]] = field(default_factory=dict)
+    polls: dict[str, int] = field(default_factory=dict)
+
+    async def submit(self, requests: list[BatchRequest]) -> str:
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        self.batches[batch_id] = list(requests)
+        self.polls[batch_id] = 0
+        return batch_id
+
+    async def is_done(self, batch_id: str) -> bool:
+        self.polls[batch_id] += 1
+        return self.polls[batch_id] > self.polls_before_done
+
+    async def results(self, batch_id: str) -> AsyncIterator[BatchResult]:
+        for request in self.batches[batch_id]:
+            if request.custom_id in self.fail_ids:
+                yield BatchResult(request.custom_id, None, error="errored")
+            else:
+                usage = {"input_tokens": 1_000, "output_tokens": 80}
+                yield BatchResult(request.custom_id, self.reply(request), usage)
@@ -0,0 +1,88 @@
+# ABOUTME: httpx transport that streams an in-process ASGI app's response as it is produced.
+# ABOUTME: Unlike httpx.ASGITransport it doesn't buffer the body, so TTFT and cancels are real.
+
+import asyncio
+from collections.abc import AsyncIterator
+
+import httpx
+from starlette.types import ASGIApp, Message
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    def __init__(
+        self, chunks: asyncio.Queue[bytes | None], task: asyncio.Task[None], closed: asyncio.Event
+    ) -> None:
+        self._chunks = chunks
+        self._task = task
+        self._closed = closed
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while (chunk := await self._chunks.get()) is not None:
+            yield chunk
+
+    async def aclose(self) -> None:
+        # Closing early is a client disconnect: tell the app and stop it
+        self._closed.set()
+        if not self._task.done():
+            self._task.cancel()
+
+
+class StreamingASGITransport(httpx.AsyncBaseTransport):
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "headers": [(k.lower(), v) for k, v in request.headers.raw],
+            "scheme": request.url.scheme,
+            "path": request.url.path,
+            "raw_path": request.url.raw_path.split(b"?")[0],
+            "query_string": request.url.query,
+            "server": (request.url.host, request.url.port or 80),
+            "client": ("127.0.0.1", 0),
+            "root_path": "",
+        }
+
+        request_sent = False
+        closed = asyncio.Event()
+        started: asyncio.Future[Message] = asyncio.get_running_loop().create_future()
+        chunks: asyncio.Queue[bytes | None] = asyncio.Queue()
+
+        async def receive() -> Message:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await closed.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                started.set_result(message)
+            elif message["type"] == "http.response.body":
+                if message.get("body"):
+                    chunks.put_nowait(message["body"])
+                if not message.get("more_body", False):
+                    chunks.put_nowait(None)
+
+        async def run() -> None:
+            try:
+                await self.app(scope, receive, send)
+            except Exception as exc:
+                if not started.done():
+                    started.set_exception(exc)
+            finally:
+                chunks.put_nowait(None)
+
+        task = asyncio.create_task(run())
+        message = await started
+        return httpx.Response(
+            status_code=message["status"],
+            headers=message.get("headers", []),
+            stream=_ResponseStream(chunks, task, closed),
+        )
@@ -6,6 +6,8 @@ from datetime import UTC, date, datetime, timedelta
 from fastapi import APIRouter, HTTPException, Request, status
 from sqlalchemy import select
 
+from nove.coach import context_cache
+from nove.database import release_connection
 from nove.deps import DB, CurrentUser
 from nove.garmin.models import GarminConnection, GarminDataPoint
 from nove.garmin.schemas import (
@@ -38,6 +40,9 @@ async def handle_callback(
     db: DB,
 ) -> ConnectionRead:
     """Exchange authorization code for tokens and store the connection."""
+    # Don't hold the auth lookup's connection across the Garmin round-trips
+    await release_connection(db)
+
     try:
         tokens = await exchange_code(body.code, body.state)
     except ValueError as e:
@@ -81,6 +86,7 @@ async def handle_callback(
         db.add(connection)
 
     await db.commit()
+    context_cache.invalidate(user.id, "wearable")
     await db.refresh(connection)
 
     return ConnectionRead(
@@ -115,6 +121,7 @@ async def disconnect(user: CurrentUser, db: DB) -> None:
 
     await db.delete(connection)
     await db.commit()
+    context_cache.invalidate(user.id, "wearable")
 
 
 @router.get("/data", response_model=list[DataPointRead])
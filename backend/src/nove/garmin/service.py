@@ -4,6 +4,7 @@
 import hashlib
 import os
 import secrets
+import uuid
 from base64 import urlsafe_b64encode
 from datetime import UTC, datetime, timedelta
 
@@ -12,8 +13,10 @@ import structlog
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from nove.coach import context_cache, memory
 from nove.config import settings
 from nove.garmin.models import GarminConnection, GarminDataPoint
+from nove.notifications.engine import evaluate_on_ingest, garmin_observations
 
 logger = structlog.get_logger()
 
@@ -171,12 +174,13 @@ async def fetch_data(
 
 async def store_data_points(
     db: AsyncSession,
-    user_id: str,
+    user_id: uuid.UUID,
     data_type: str,
     points: list[dict],
 ) -> int:
     """Store fetched Garmin data points, upserting on (user_id, data_type, date)."""
     stored = 0
+    observations = []
     for point in points:
         # Extract date from the data point
         calendar_date = point.get("calendarDate")
@@ -204,15 +208,23 @@ async def store_data_points(
         if row:
             row.data = point
         else:
-            db.add(GarminDataPoint(
+            row = GarminDataPoint(
+                id=uuid.uuid4(),
                 user_id=user_id,
                 data_type=data_type,
                 date=point_date,
                 data=point,
-            ))
+            )
+            db.add(row)
         stored += 1
+        point_observations = garmin_observations(data_type, point_date, point)
+        await memory.index_wearable_day(db, user_id, row.id, point_date, point_observations)
+        observations.extend(point_observations)
 
     await db.commit()
+    if stored:
+        context_cache.invalidate(user_id, "wearable")
+    await evaluate_on_ingest(user_id, observations)
     return stored
 
 
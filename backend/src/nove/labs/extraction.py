@@ -9,11 +9,13 @@ import uuid
 import structlog
 from pydantic import BaseModel
 
+from nove.billing import usage
 from nove.config import settings
 
 logger = structlog.get_logger()
 
 GEMINI_MODEL = "gemini-2.5-flash"
+OCR_MODEL = "mistral-ocr-latest"
 
 EXTRACTION_PROMPT = """\
 You are a medical lab result extraction system. Extract all biomarker values from \
@@ -48,32 +50,42 @@ class ExtractionResult(BaseModel):
     biomarkers: list[ExtractedBiomarker]
 
 
-def _ocr_pdf_sync(pdf_bytes: bytes) -> str:
-    """Send PDF bytes to Mistral OCR, return extracted markdown text. Sync."""
+def _ocr_pdf_sync(pdf_bytes: bytes) -> tuple[str, int]:
+    """Send PDF bytes to Mistral OCR, return extracted markdown text and pages. Sync."""
     from mistralai import Mistral
 
     client = Mistral(api_key=settings.mistral_api_key)
     b64 = base64.b64encode(pdf_bytes).decode("utf-8")
 
     response = client.ocr.process(
-        model="mistral-ocr-latest",
+        model=OCR_MODEL,
         document={
             "type": "document_url",
             "document_url": f"data:application/pdf;base64,{b64}",
         },
     )
 
-    return "\n\n".join(page.markdown for page in response.pages)
+    text = "\n\n".join(page.markdown for page in response.pages)
+    return text, response.usage_info.pages_processed or len(response.pages)
 
 
-async def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    """Extract text from PDF via Mistral OCR. Runs sync SDK in executor."""
+async def extract_text_from_pdf(pdf_bytes: bytes, user_id: uuid.UUID | None = None) -> str:
+    """Extract text from PDF via Mistral OCR. Runs sync SDK in executor.
+
+    Pages are metered to ``user_id`` when given.
+    """
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, _ocr_pdf_sync, pdf_bytes)
+    text, pages = await loop.run_in_executor(None, _ocr_pdf_sync, pdf_bytes)
+    if user_id is not None:
+        usage.record(user_id, "lab_ocr", "mistral", OCR_MODEL, pages=pages)
+    return text
+
 
+async def extract_biomarkers(text: str, user_id: uuid.UUID | None = None) -> list[dict]:
+    """Use Gemini to extract structured biomarker data from lab report text.
 
-async def extract_biomarkers(text: str) -> list[dict]:
-    """Use Gemini to extract structured biomarker data from lab report text."""
+    Tokens are metered to ``user_id`` when given.
+    """
     if not text.strip():
         return []
 
@@ -91,6 +103,15 @@ async def extract_biomarkers(text: str) -> list[dict]:
             temperature=0.1,
         ),
     )
+    if user_id is not None and response.usage_metadata is not None:
+        usage.record(
+            user_id,
+            "lab_extraction",
+            "google",
+            GEMINI_MODEL,
+            input_tokens=response.usage_metadata.prompt_token_count,
+            output_tokens=response.usage_metadata.candidates_token_count,
+        )
 
     try:
         result = response.parsed
@@ -175,13 +196,16 @@ def route_by_confidence(overall_confidence: float) -> str:
 async def process_pdf(
     pdf_bytes: bytes,
     result_id: uuid.UUID | None = None,
+    user_id: uuid.UUID | None = None,
 ) -> tuple[list[dict], float, str]:
     """Full PDF processing pipeline: Mistral OCR -> Gemini structuring -> validate.
 
+    Both model calls are metered to ``user_id`` when given.
+
     Returns (biomarkers, confidence, processing_status).
     """
     # Step 1: OCR via Mistral
-    text = await extract_text_from_pdf(pdf_bytes)
+    text = await extract_text_from_pdf(pdf_bytes, user_id)
 
     if not text.strip():
         logger.warning("no_text_extracted", result_id=str(result_id))
@@ -190,7 +214,7 @@ async def process_pdf(
     logger.info("ocr_complete", result_id=str(result_id), text_length=len(text))
 
     # Step 2: Structured extraction via Gemini
-    biomarkers = await extract_biomarkers(text)
+    biomarkers = await extract_biomarkers(text, user_id)
 
     # Step 3: Validate
     validated, confidence = validate_extraction(biomarkers)
@@ -2,12 +2,16 @@
 # ABOUTME: Uses stored Google OAuth tokens to search user's email for lab attachments.
 
 import base64
+import uuid
+from pathlib import PurePath
 
 import httpx
 import structlog
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from nove.config import settings
+from nove.database import release_connection
+from nove.labs import processing, storage
 from nove.labs.models import LabResult
 from nove.users.models import User
 
@@ -169,10 +173,15 @@ async def download_attachment(
 async def import_lab_pdfs_from_gmail(
     user: User, db: AsyncSession
 ) -> list[LabResult]:
-    """Search Gmail for lab PDFs, download and create LabResult entries.
+    """Search Gmail for lab PDFs, store them and create LabResult entries.
 
-    Returns created LabResult objects (in pending status for processing).
+    Returns created LabResult objects, pending; each is processed in the
+    background once stored, like a direct upload.
+
+    Every DB write is its own short transaction; the connection is released
+    before each Gmail fetch and storage upload.
     """
+    await release_connection(db)
     messages = await search_gmail_for_lab_pdfs(user, db)
     created = []
 
@@ -183,66 +192,27 @@ async def import_lab_pdfs_from_gmail(
             )
             if not pdf_bytes:
                 continue
+            await release_connection(db)
+
+            result_id = uuid.uuid4()
+            key = f"gmail-import/{user.id}/{result_id}/{PurePath(att['filename']).name}"
+            try:
+                await storage.store(key, pdf_bytes)
+            except Exception:
+                logger.exception("gmail_pdf_store_failed", key=key)
+                continue
 
             lab_result = LabResult(
+                id=result_id,
                 user_id=user.id,
-                pdf_storage_key=f"gmail-import/{user.id}/{att['filename']}",
+                pdf_storage_key=key,
                 processing_status="pending",
             )
             db.add(lab_result)
             await db.commit()
             await db.refresh(lab_result)
-
-            from nove.labs.storage import upload_pdf
-            upload_pdf(lab_result.pdf_storage_key, pdf_bytes)
-
-            # Process the PDF
-            try:
-                from nove.labs.extraction import process_pdf
-
-                biomarkers, confidence, proc_status = await process_pdf(
-                    pdf_bytes, lab_result.id
-                )
-                lab_result.processing_status = proc_status
-                lab_result.confidence_score = confidence
-
-                from nove.labs.models import LabBiomarkerValue
-
-                for bm in biomarkers:
-                    value = float(bm["value"])
-                    low = bm.get("reference_range_low")
-                    high = bm.get("reference_range_high")
-                    bm_status = "normal"
-                    if (
-                        low is not None
-                        and high is not None
-                        and not (float(low) <= value <= float(high))
-                    ):
-                        bm_status = "flagged"
-
-                    db.add(LabBiomarkerValue(
-                        result_id=lab_result.id,
-                        user_id=user.id,
-                        biomarker_code=bm["biomarker_code"],
-                        biomarker_name=bm.get("biomarker_name", ""),
-                        value=str(bm["value"]),
-                        unit=bm["unit"],
-                        reference_range_low=bm.get("reference_range_low"),
-                        reference_range_high=bm.get("reference_range_high"),
-                        status=bm_status,
-                        confidence=bm.get("confidence", 0.5),
-                        date=lab_result.created_at,
-                    ))
-
-                await db.commit()
-                await db.refresh(lab_result)
-            except Exception:
-                logger.exception(
-                    "gmail_pdf_processing_failed", result_id=str(lab_result.id)
-                )
-                lab_result.processing_status = "failed"
-                await db.commit()
-
+            await release_connection(db)
+            processing.enqueue(lab_result.id, "user")
             created.append(lab_result)
 
     logger.info(
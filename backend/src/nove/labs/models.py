@@ -111,7 +111,14 @@ class LabResult(Base):
         Enum(*PROCESSING_STATUSES, name="processing_status"), default="pending"
     )
     ai_summary: Mapped[str | None] = mapped_column(Text)
+    # LAB_SUMMARY_VERSION of the prompt that wrote ai_summary
+    ai_summary_version: Mapped[int | None] = mapped_column(Integer)
     confidence_score: Mapped[float | None] = mapped_column(Float)
+    # When processing was picked up, when its biomarkers were extracted and
+    # when it reached a final status (see labs/processing.py)
+    processing_started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    extracted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     reviewed_by: Mapped[str | None] = mapped_column(String(256))
     reviewed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     created_at: Mapped[datetime] = mapped_column(
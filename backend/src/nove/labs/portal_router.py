@@ -3,9 +3,11 @@
 
 import uuid
 from datetime import UTC, datetime, timedelta
+from pathlib import PurePath
 from typing import Annotated
 
 import bcrypt
+import structlog
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
@@ -13,11 +15,20 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from nove.config import settings
-from nove.database import get_db
+from nove.database import get_db, release_connection
+from nove.labs import processing, storage
 from nove.labs.models import LabOrder, LabPanel, LabPartner, LabResult
-from nove.labs.schemas import PortalLoginRequest, PortalOrderRead, PortalTokenResponse
+from nove.labs.schemas import (
+    PortalLoginRequest,
+    PortalOrderRead,
+    PortalTokenResponse,
+    ResultStatusRead,
+)
+from nove.labs.service import result_status
 from nove.users.models import User
 
+logger = structlog.get_logger()
+
 router = APIRouter(prefix="/portal", tags=["portal"])
 portal_security = HTTPBearer()
 
@@ -117,7 +128,7 @@ async def lookup_orders(
 
 @router.post(
     "/orders/{order_id}/results",
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def upload_result(
     order_id: uuid.UUID,
@@ -125,6 +136,11 @@ async def upload_result(
     partner: PortalPartner,
     db: PortalDB,
 ) -> dict:
+    """Upload an order's result PDF.
+
+    Answers once the PDF is stored; it is processed in the background ahead
+    of user uploads. Poll GET /results/{id}/status for progress.
+    """
     result = await db.execute(
         select(LabOrder).where(
             LabOrder.id == order_id,
@@ -141,11 +157,24 @@ async def upload_result(
             detail="Only PDF files accepted",
         )
 
-    pdf_key = f"results/{order.order_code}/{file.filename}"
-
     pdf_bytes = await file.read()
+    if len(pdf_bytes) == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty file")
+
+    await release_connection(db)
+    result_id = uuid.uuid4()
+    pdf_key = f"results/{order.order_code}/{result_id}/{PurePath(file.filename).name}"
+    try:
+        await storage.store(pdf_key, pdf_bytes)
+    except Exception as exc:
+        logger.exception("pdf_store_failed", key=pdf_key)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not store the file, try again",
+        ) from exc
 
     lab_result = LabResult(
+        id=result_id,
         user_id=order.user_id,
         order_id=order.id,
         pdf_storage_key=pdf_key,
@@ -155,9 +184,24 @@ async def upload_result(
 
     order.status = "completed"
     await db.commit()
-    await db.refresh(lab_result)
-
-    from nove.labs.storage import upload_pdf
-    upload_pdf(pdf_key, pdf_bytes)
+    processing.enqueue(lab_result.id, "portal")
 
     return {"result_id": str(lab_result.id), "status": "pending"}
+
+
+@router.get("/results/{result_id}/status", response_model=ResultStatusRead)
+async def get_result_status(
+    result_id: uuid.UUID,
+    partner: PortalPartner,
+    db: PortalDB,
+) -> ResultStatusRead:
+    row = (
+        await db.execute(
+            result_status()
+            .join(LabOrder, LabOrder.id == LabResult.order_id)
+            .where(LabResult.id == result_id, LabOrder.lab_partner_id == partner.id)
+        )
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Result not found")
+    return ResultStatusRead.model_validate(row)
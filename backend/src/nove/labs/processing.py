@@ -0,0 +1,276 @@
+# ABOUTME: Lab PDF processing off the request path: OCR, biomarker extraction, then saved values.
+# ABOUTME: Results move pending -> processing -> extracted -> verified/review_needed, or failed.
+
+import asyncio
+import itertools
+import time
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove import background, metrics
+from nove.coach import context_cache, memory
+from nove.config import settings
+from nove.database import async_session_factory
+from nove.labs import extraction, storage
+from nove.labs import summary as lab_summary
+from nove.labs.models import LabBiomarkerValue, LabResult
+
+logger = structlog.get_logger()
+
+# A result still processing after this long was cut off by a restart
+STALE_AFTER = timedelta(minutes=15)
+
+# Lanes share one pool of processing slots, and a freed slot goes to the
+# lowest-numbered lane waiting. Portal results are awaited by a lab partner,
+# so they go ahead of user uploads ("user"), which also hold at most
+# lab_processing_concurrency slots, leaving lab_portal_concurrency for the portal
+PRIORITY = {"portal": 0, "user": 1}
+# lane -> slots it holds
+_in_use: dict[str, int] = {}
+# (priority, arrival, lane, handoff) for work waiting on a slot
+_waiting: list[tuple[int, int, str, asyncio.Future[None]]] = []
+_arrivals = itertools.count()
+# Results queued or processing in this process
+_queued: set[uuid.UUID] = set()
+
+
+def classify_biomarker(bm: dict[str, Any]) -> str:
+    """Classify a biomarker as normal, borderline, or flagged based on reference range."""
+    value = float(bm["value"])
+    low = bm.get("reference_range_low")
+    high = bm.get("reference_range_high")
+
+    if low is not None and high is not None:
+        low_f, high_f = float(low), float(high)
+        if low_f <= value <= high_f:
+            return "normal"
+        margin = (high_f - low_f) * 0.1
+        if (low_f - margin) <= value <= (high_f + margin):
+            return "borderline"
+        return "flagged"
+    return "normal"
+
+
+def _can_start(lane: str) -> bool:
+    if sum(_in_use.values()) >= (
+        settings.lab_processing_concurrency + settings.lab_portal_concurrency
+    ):
+        return False
+    return lane == "portal" or _in_use.get(lane, 0) < settings.lab_processing_concurrency
+
+
+def _take(lane: str) -> None:
+    _in_use[lane] = _in_use.get(lane, 0) + 1
+
+
+def _release(lane: str) -> None:
+    _in_use[lane] -= 1
+    # Hand freed slots out by priority, then arrival
+    for entry in sorted(_waiting, key=lambda w: w[:2]):
+        _, _, waiting_lane, handoff = entry
+        if _can_start(waiting_lane):
+            _waiting.remove(entry)
+            _take(waiting_lane)
+            handoff.set_result(None)
+
+
+@asynccontextmanager
+async def _slot(lane: str) -> AsyncIterator[None]:
+    """Hold one processing slot, waiting behind any work of equal or higher priority."""
+    priority = PRIORITY.get(lane, len(PRIORITY))
+    if _can_start(lane) and not any(w[0] <= priority for w in _waiting):
+        _take(lane)
+    else:
+        entry = (priority, next(_arrivals), lane, asyncio.get_running_loop().create_future())
+        _waiting.append(entry)
+        try:
+            await entry[3]
+        except asyncio.CancelledError:
+            if entry[3].cancelled():
+                _waiting.remove(entry)
+            else:
+                # The slot was handed over just as we were cancelled
+                _release(lane)
+            raise
+    try:
+        yield
+    finally:
+        _release(lane)
+
+
+def enqueue(result_id: uuid.UUID, lane: str = "user") -> None:
+    """Process a stored result in the background, in ``lane``, at most once at a time."""
+    if result_id in _queued:
+        return
+    _queued.add(result_id)
+    metrics.incr("lab_processing_enqueued", lane=lane)
+    task = background.spawn(_run(result_id, lane), name=f"lab_processing:{result_id}")
+    task.add_done_callback(lambda _: _queued.discard(result_id))
+
+
+async def _run(result_id: uuid.UUID, lane: str) -> None:
+    queued_at = time.perf_counter()
+    async with _slot(lane):
+        waited = (time.perf_counter() - queued_at) * 1000
+        metrics.observe("lab_processing_wait_ms", waited, lane=lane)
+        await process_result(result_id)
+
+
+async def _set_stage(
+    session_factory: async_sessionmaker[AsyncSession], result_id: uuid.UUID, **values: object
+) -> None:
+    async with session_factory() as db:
+        await db.execute(update(LabResult).where(LabResult.id == result_id).values(**values))
+        await db.commit()
+
+
+async def process_result(
+    result_id: uuid.UUID,
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> str | None:
+    """Run a pending result through OCR and extraction and save its biomarkers.
+
+    Every stage is committed with its timestamp as it is reached, so status
+    polls see progress. Returns the final status, or None if the result was
+    not pending (another worker has it, or it is done).
+    """
+    async with session_factory() as db:
+        # Claim it: only one worker moves a result out of pending
+        claimed = (
+            await db.execute(
+                update(LabResult)
+                .where(LabResult.id == result_id, LabResult.processing_status == "pending")
+                .values(processing_status="processing", processing_started_at=func.now())
+                .returning(LabResult.user_id, LabResult.pdf_storage_key, LabResult.created_at)
+            )
+        ).one_or_none()
+        await db.commit()
+    if claimed is None or claimed.pdf_storage_key is None:
+        return None
+    user_id, taken = claimed.user_id, claimed.created_at
+
+    started = time.perf_counter()
+    try:
+        pdf_bytes = await storage.fetch(claimed.pdf_storage_key)
+        biomarkers, confidence, final_status = await extraction.process_pdf(
+            pdf_bytes, result_id, user_id
+        )
+        if final_status == "failed":
+            await _set_stage(
+                session_factory, result_id, processing_status="failed", processed_at=func.now()
+            )
+            metrics.incr("lab_processing", outcome="failed")
+            return "failed"
+        await _set_stage(
+            session_factory,
+            result_id,
+            processing_status="extracted",
+            extracted_at=func.now(),
+            confidence_score=confidence,
+        )
+
+        from nove.notifications.engine import evaluate_on_ingest, lab_observation
+
+        observations = []
+        values = []
+        for bm in biomarkers:
+            bm_status = classify_biomarker(bm)
+            values.append(
+                LabBiomarkerValue(
+                    result_id=result_id,
+                    user_id=user_id,
+                    biomarker_code=bm["biomarker_code"],
+                    biomarker_name=bm.get("biomarker_name", ""),
+                    value=float(bm["value"]),
+                    unit=bm["unit"],
+                    reference_range_low=bm.get("reference_range_low"),
+                    reference_range_high=bm.get("reference_range_high"),
+                    status=bm_status,
+                    confidence=bm.get("confidence", 0.5),
+                    date=taken,
+                )
+            )
+            observations.append(
+                lab_observation(bm["biomarker_code"], taken.date(), bm["value"], bm_status)
+            )
+        async with session_factory() as db:
+            db.add_all(values)
+            await memory.index_lab_result(db, user_id, result_id, taken.date(), values)
+            await db.execute(
+                update(LabResult)
+                .where(LabResult.id == result_id)
+                .values(processing_status=final_status, processed_at=func.now())
+            )
+            await db.commit()
+    except Exception:
+        logger.exception("pdf_processing_failed", result_id=str(result_id))
+        await _set_stage(
+            session_factory, result_id, processing_status="failed", processed_at=func.now()
+        )
+        metrics.incr("lab_processing", outcome="failed")
+        return "failed"
+
+    metrics.incr("lab_processing", outcome=final_status)
+    metrics.observe("lab_processing_ms", (time.perf_counter() - started) * 1000)
+    logger.info(
+        "lab_result_processed",
+        result_id=str(result_id),
+        status=final_status,
+        biomarkers=len(values),
+    )
+    context_cache.invalidate(user_id, "labs")
+    if values:
+        lab_summary.schedule_summary(user_id, result_id)
+    await evaluate_on_ingest(user_id, observations)
+    return final_status
+
+
+async def resume_pending(
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> int:
+    """Queue results left pending, or stalled mid-processing, by a restart. Returns the count.
+
+    Safe to run from every process at startup: the claim in process_result
+    lets only one of them process each result.
+    """
+    stale = datetime.now(UTC) - STALE_AFTER
+    async with session_factory() as db:
+        await db.execute(
+            update(LabResult)
+            .where(
+                LabResult.processing_status.in_(("processing", "extracted")),
+                or_(
+                    LabResult.processing_started_at.is_(None),
+                    LabResult.processing_started_at < stale,
+                ),
+            )
+            .values(processing_status="pending")
+        )
+        rows = (
+            await db.execute(
+                select(LabResult.id, LabResult.order_id).where(
+                    LabResult.processing_status == "pending",
+                    LabResult.pdf_storage_key.is_not(None),
+                )
+            )
+        ).all()
+        await db.commit()
+    for row in rows:
+        enqueue(row.id, "portal" if row.order_id is not None else "user")
+    if rows:
+        logger.info("lab_processing_resumed", results=len(rows))
+    return len(rows)
+
+
+def clear() -> None:
+    """Forget held slots, waiting work and queued results. Tests use this for isolation."""
+    _in_use.clear()
+    _waiting.clear()
+    _queued.clear()
@@ -2,6 +2,7 @@
 # ABOUTME: Handles lab ordering flow and result retrieval with biomarker history.
 
 import uuid
+from pathlib import PurePath
 
 import structlog
 from fastapi import APIRouter, HTTPException, UploadFile, status
@@ -9,7 +10,9 @@ from fastapi.responses import RedirectResponse
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
+from nove.database import release_connection
 from nove.deps import DB, CurrentUser
+from nove.labs import processing, storage
 from nove.labs.models import LabBiomarkerValue, LabOrder, LabPanel, LabResult
 from nove.labs.schemas import (
     BiomarkerHistoryPoint,
@@ -17,9 +20,10 @@ from nove.labs.schemas import (
     OrderRead,
     PanelRead,
     ResultRead,
+    ResultStatusRead,
     ResultSummaryRead,
 )
-from nove.labs.service import create_order
+from nove.labs.service import create_order, result_status
 
 logger = structlog.get_logger()
 
@@ -75,10 +79,14 @@ async def get_result(result_id: uuid.UUID, user: CurrentUser, db: DB) -> ResultR
 
 
 @router.post(
-    "/results/upload", response_model=ResultSummaryRead, status_code=status.HTTP_201_CREATED
+    "/results/upload", response_model=ResultSummaryRead, status_code=status.HTTP_202_ACCEPTED
 )
 async def upload_result_pdf(file: UploadFile, user: CurrentUser, db: DB) -> ResultSummaryRead:
-    """Upload a lab result PDF directly. Triggers OCR + extraction pipeline."""
+    """Upload a lab result PDF directly.
+
+    Answers as soon as the PDF is stored; OCR and extraction run in the
+    background. Poll GET /results/{id}/status for progress.
+    """
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Solo se aceptan archivos PDF"
@@ -90,68 +98,44 @@ async def upload_result_pdf(file: UploadFile, user: CurrentUser, db: DB) -> Resu
             status_code=status.HTTP_400_BAD_REQUEST, detail="Archivo vacio"
         )
 
-    # Create result record
+    # Storing is slow; return the connection until the result is recorded
+    await release_connection(db)
+    result_id = uuid.uuid4()
+    key = f"user-uploads/{user.id}/{result_id}/{PurePath(file.filename).name}"
+    try:
+        await storage.store(key, pdf_bytes)
+    except Exception as exc:
+        logger.exception("pdf_store_failed", key=key)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No pudimos guardar el archivo, intenta de nuevo",
+        ) from exc
+
+    # Only a stored PDF gets a result, so the worker always finds its file
     lab_result = LabResult(
+        id=result_id,
         user_id=user.id,
-        pdf_storage_key=f"user-uploads/{user.id}/{file.filename}",
+        pdf_storage_key=key,
         processing_status="pending",
     )
     db.add(lab_result)
     await db.commit()
     await db.refresh(lab_result)
-
-    from nove.labs.storage import upload_pdf
-    upload_pdf(lab_result.pdf_storage_key, pdf_bytes)
-
-    # Process in background (for now, inline — move to Inngest later)
-    try:
-        from nove.labs.extraction import process_pdf
-
-        biomarkers, confidence, proc_status = await process_pdf(pdf_bytes, lab_result.id)
-        lab_result.processing_status = proc_status
-        lab_result.confidence_score = confidence
-
-        for bm in biomarkers:
-            db.add(LabBiomarkerValue(
-                result_id=lab_result.id,
-                user_id=user.id,
-                biomarker_code=bm["biomarker_code"],
-                biomarker_name=bm.get("biomarker_name", ""),
-                value=str(bm["value"]),
-                unit=bm["unit"],
-                reference_range_low=bm.get("reference_range_low"),
-                reference_range_high=bm.get("reference_range_high"),
-                status=_classify_biomarker(bm),
-                confidence=bm.get("confidence", 0.5),
-                date=lab_result.created_at,
-            ))
-
-        await db.commit()
-        await db.refresh(lab_result)
-    except Exception:
-        logger.exception("pdf_processing_failed", result_id=str(lab_result.id))
-        lab_result.processing_status = "failed"
-        await db.commit()
-        await db.refresh(lab_result)
-
+    processing.enqueue(lab_result.id, "user")
     return ResultSummaryRead.model_validate(lab_result)
 
 
-def _classify_biomarker(bm: dict) -> str:
-    """Classify a biomarker as normal, borderline, or flagged based on reference range."""
-    value = float(bm["value"])
-    low = bm.get("reference_range_low")
-    high = bm.get("reference_range_high")
-
-    if low is not None and high is not None:
-        low_f, high_f = float(low), float(high)
-        if low_f <= value <= high_f:
-            return "normal"
-        margin = (high_f - low_f) * 0.1
-        if (low_f - margin) <= value <= (high_f + margin):
-            return "borderline"
-        return "flagged"
-    return "normal"
+@router.get("/results/{result_id}/status", response_model=ResultStatusRead)
+async def get_result_status(result_id: uuid.UUID, user: CurrentUser, db: DB) -> ResultStatusRead:
+    """Processing progress of a result; cheap enough to poll."""
+    row = (
+        await db.execute(
+            result_status().where(LabResult.id == result_id, LabResult.user_id == user.id)
+        )
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Result not found")
+    return ResultStatusRead.model_validate(row)
 
 
 @router.post("/gmail-import", response_model=list[ResultSummaryRead])
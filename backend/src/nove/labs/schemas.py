@@ -76,6 +76,17 @@ class ResultSummaryRead(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class ResultStatusRead(BaseModel):
+    id: uuid.UUID
+    processing_status: str
+    created_at: datetime
+    processing_started_at: datetime | None
+    extracted_at: datetime | None
+    processed_at: datetime | None
+
+    model_config = {"from_attributes": True}
+
+
 # Biomarker history
 class BiomarkerHistoryPoint(BaseModel):
     value: float
@@ -1,13 +1,15 @@
-# ABOUTME: Lab business logic: order code generation, result creation.
+# ABOUTME: Lab business logic: order codes, result creation and status, latest biomarker values.
 # ABOUTME: Shared by user-facing and portal-facing endpoints.
 
 import secrets
 import string
 import uuid
+from typing import Any
 
+from sqlalchemy import Select, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from nove.labs.models import LabOrder, LabPartner, LabResult
+from nove.labs.models import LabBiomarkerValue, LabOrder, LabPartner, LabResult
 
 
 def generate_order_code(prefix: str = "NOV") -> str:
@@ -58,3 +60,46 @@ async def create_result_for_upload(
     await db.commit()
     await db.refresh(result)
     return result
+
+
+def result_status() -> Select[Any]:
+    """A result's processing status and stage timestamps, without its values."""
+    return select(
+        LabResult.id,
+        LabResult.processing_status,
+        LabResult.created_at,
+        LabResult.processing_started_at,
+        LabResult.extracted_at,
+        LabResult.processed_at,
+    )
+
+
+def latest_biomarkers(user_ids: list[uuid.UUID]) -> Select[Any]:
+    """Each user's latest value per biomarker, with the value before it and the change.
+
+    One pass over ``ix_biomarker_user_code_date``: lag() reads each code's
+    history in date order and DISTINCT ON keeps its newest row. Rows are
+    ordered by user, then biomarker code.
+    """
+    v = LabBiomarkerValue
+    partition = (v.user_id, v.biomarker_code)
+    previous_value = func.lag(v.value).over(partition_by=partition, order_by=v.date)
+    return (
+        select(
+            v.user_id,
+            v.biomarker_code,
+            v.biomarker_name,
+            v.value,
+            v.unit,
+            v.reference_range_low,
+            v.reference_range_high,
+            v.status,
+            v.date,
+            previous_value.label("previous_value"),
+            func.lag(v.date).over(partition_by=partition, order_by=v.date).label("previous_date"),
+            (v.value - previous_value).label("delta"),
+        )
+        .where(v.user_id.in_(user_ids))
+        .distinct(v.user_id, v.biomarker_code)
+        .order_by(v.user_id, v.biomarker_code, v.date.desc())
+    )
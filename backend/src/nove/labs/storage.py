@@ -1,7 +1,10 @@
-# ABOUTME: S3 storage helpers for lab result PDFs.
-# ABOUTME: Upload PDFs and generate presigned download URLs.
+# ABOUTME: Storage helpers for lab result PDFs: S3, or a local directory when S3 is not configured.
+# ABOUTME: Upload and read back PDFs, and generate presigned download URLs.
+
+import asyncio
+from pathlib import Path
+from typing import Any
 
-import boto3
 import structlog
 
 from nove.config import settings
@@ -9,7 +12,9 @@ from nove.config import settings
 logger = structlog.get_logger()
 
 
-def _get_s3_client():
+def _get_s3_client() -> Any:
+    import boto3
+
     return boto3.client(
         "s3",
         aws_access_key_id=settings.aws_access_key_id,
@@ -18,10 +23,21 @@ def _get_s3_client():
     )
 
 
+def _local_path(key: str) -> Path:
+    root = Path(settings.lab_storage_dir).resolve()
+    path = (root / key).resolve()
+    if not path.is_relative_to(root):
+        raise ValueError(f"Storage key escapes the storage directory: {key}")
+    return path
+
+
 def upload_pdf(key: str, data: bytes) -> None:
-    """Upload a PDF to S3. Skips if AWS credentials are not configured."""
+    """Upload a PDF to S3, or to the local storage directory without AWS credentials."""
     if not settings.aws_access_key_id:
-        logger.warning("s3_upload_skipped", reason="no_aws_credentials", key=key)
+        path = _local_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        logger.info("local_upload_ok", key=key)
         return
 
     client = _get_s3_client()
@@ -34,6 +50,27 @@ def upload_pdf(key: str, data: bytes) -> None:
     logger.info("s3_upload_ok", key=key)
 
 
+def download_pdf(key: str) -> bytes:
+    """Read a stored PDF back, from wherever upload_pdf put it."""
+    if not settings.aws_access_key_id:
+        return _local_path(key).read_bytes()
+
+    client = _get_s3_client()
+    response = client.get_object(Bucket=settings.s3_bucket_name, Key=key)
+    body: bytes = response["Body"].read()
+    return body
+
+
+async def store(key: str, data: bytes) -> None:
+    """upload_pdf off the event loop. Once it returns the PDF is durable."""
+    await asyncio.to_thread(upload_pdf, key, data)
+
+
+async def fetch(key: str) -> bytes:
+    """download_pdf off the event loop."""
+    return await asyncio.to_thread(download_pdf, key)
+
+
 def generate_download_url(key: str, expires_in: int = 3600) -> str:
     """Generate a presigned S3 URL for downloading a PDF."""
     client = _get_s3_client()
@@ -0,0 +1,152 @@
+# ABOUTME: Concise AI summaries of extracted lab results, stored on LabResult.ai_summary.
+# ABOUTME: Generated once after extraction and versioned so a prompt change can regenerate them.
+"""Usage: uv run python -m nove.labs.summary
+
+Regenerates every summary missing or written by an older LAB_SUMMARY_VERSION.
+"""
+
+import asyncio
+import uuid
+from typing import Any
+
+import structlog
+from sqlalchemy import Row, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove import background, metrics
+from nove.billing import usage
+from nove.coach import context_cache, llm
+from nove.coach.summary import SUMMARY_MODEL
+from nove.database import async_session_factory
+from nove.labs.models import LabBiomarkerValue, LabResult
+
+logger = structlog.get_logger()
+
+# Bump whenever LAB_SUMMARY_PROMPT changes; older summaries are then stale
+LAB_SUMMARY_VERSION = 1
+BACKFILL_PAGE = 100
+
+LAB_SUMMARY_PROMPT = """\
+Resume estos resultados de laboratorio para el contexto de un coach de salud. \
+En espanol, en no mas de 80 palabras:
+- Nombra primero los biomarcadores fuera de rango o limitrofes, con su valor y unidad.
+- Agrupa los normales por sistema (metabolico, lipidos, tiroides, etc.) sin listar valores.
+- No des diagnosticos ni recomendaciones.
+
+Responde solo con el resumen.\
+"""
+
+
+def biomarker_line(v: LabBiomarkerValue | Row[Any]) -> str:
+    ref = ""
+    if v.reference_range_low is not None and v.reference_range_high is not None:
+        ref = f" (ref: {v.reference_range_low}-{v.reference_range_high})"
+    status_label = v.status.upper() if v.status else ""
+    return f"- {v.biomarker_name} ({v.biomarker_code}): {v.value} {v.unit}{ref} [{status_label}]"
+
+
+def schedule_summary(user_id: uuid.UUID, result_id: uuid.UUID) -> None:
+    background.spawn(summarize_result(user_id, result_id), name=f"lab_summary:{result_id}")
+
+
+async def summarize_result(
+    user_id: uuid.UUID,
+    result_id: uuid.UUID,
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> bool:
+    """Write the current-version summary for one result. Returns True if one was stored."""
+    async with session_factory() as db:
+        values = list(
+            await db.scalars(
+                select(LabBiomarkerValue)
+                .where(LabBiomarkerValue.result_id == result_id)
+                .order_by(LabBiomarkerValue.biomarker_code)
+            )
+        )
+    if not values:
+        return False
+
+    reply = await llm.get_gateway().complete(
+        user_id,
+        model=SUMMARY_MODEL,
+        max_tokens=256,
+        system=LAB_SUMMARY_PROMPT,
+        messages=[{"role": "user", "content": "\n".join(biomarker_line(v) for v in values)}],
+    )
+    usage.record_message(user_id, "lab_summary", reply)
+    text = "".join(block.text for block in reply.content if block.type == "text").strip()
+    if not text:
+        return False
+
+    async with session_factory() as db:
+        # Never overwrite a summary from a newer prompt (say, mid-deploy)
+        stored = await db.scalar(
+            update(LabResult)
+            .where(
+                LabResult.id == result_id,
+                or_(
+                    LabResult.ai_summary_version.is_(None),
+                    LabResult.ai_summary_version <= LAB_SUMMARY_VERSION,
+                ),
+            )
+            .values(ai_summary=text, ai_summary_version=LAB_SUMMARY_VERSION)
+            .returning(LabResult.id)
+        )
+        await db.commit()
+    if stored is None:
+        return False
+
+    context_cache.invalidate(user_id, "labs")
+    metrics.incr("lab_summaries_written")
+    logger.info("lab_summary_written", result_id=str(result_id), version=LAB_SUMMARY_VERSION)
+    return True
+
+
+async def backfill(
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> int:
+    """Summarize every result with values whose summary is missing or stale."""
+    written = 0
+    after = None
+    while True:
+        query = (
+            select(LabResult.id, LabResult.user_id)
+            .where(
+                LabResult.biomarker_values.any(),
+                or_(
+                    LabResult.ai_summary_version.is_(None),
+                    LabResult.ai_summary_version < LAB_SUMMARY_VERSION,
+                ),
+            )
+            .order_by(LabResult.id)
+            .limit(BACKFILL_PAGE)
+        )
+        if after is not None:
+            query = query.where(LabResult.id > after)
+        async with session_factory() as db:
+            rows = (await db.execute(query)).all()
+        if not rows:
+            return written
+        # The gateway caps how many of these run at once; one failure skips one result
+        done = await asyncio.gather(
+            *(summarize_result(row.user_id, row.id, session_factory) for row in rows),
+            return_exceptions=True,
+        )
+        written += sum(1 for ok in done if ok is True)
+        after = rows[-1].id
+
+
+async def main() -> None:
+    from nove.database import engine
+
+    try:
+        print(f"summarized {await backfill()} lab results")
+    finally:
+        # Usage ledger writes still queued
+        await background.drain()
+        await llm.get_gateway().aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,10 @@
 # ABOUTME: FastAPI application factory and entrypoint.
 # ABOUTME: Registers routers, middleware, and startup/shutdown events.
 
+import asyncio
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from typing import Any
 
 import structlog
 from fastapi import FastAPI
@@ -16,9 +18,30 @@ logger = structlog.get_logger()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
+    from nove import background, runtime
+    from nove.billing import usage
+    from nove.coach import llm
+    from nove.labs import processing
+
     logger.info("starting", app=settings.app_name)
+    app.state.llm = llm.LLMGateway.from_settings()
+    llm.set_gateway(app.state.llm)
+    sampler = (
+        asyncio.create_task(runtime.sample(settings.runtime_sample_seconds))
+        if settings.runtime_sample_seconds > 0
+        else None
+    )
+    # Pick up lab PDFs stored but not processed before the last shutdown
+    background.spawn(processing.resume_pending(), name="lab_processing_resume")
     yield
     logger.info("shutting_down")
+    if sampler is not None:
+        sampler.cancel()
+    await background.drain()
+    # Usage recorded by the last tasks, or left queued if the flusher was cancelled
+    await usage.drain()
+    llm.set_gateway(None)
+    await app.state.llm.aclose()
 
 
 def create_app() -> FastAPI:
@@ -40,10 +63,13 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
     from nove.auth.router import router as auth_router
+    from nove.billing.router import router as billing_router
     from nove.coach.router import router as coach_router
+    from nove.coach.ws import router as coach_ws_router
     from nove.garmin.router import router as garmin_router
     from nove.labs.portal_router import router as portal_router
     from nove.labs.router import router as lab_router
@@ -51,7 +77,9 @@ def create_app() -> FastAPI:
 
     app.include_router(auth_router, prefix=settings.api_v1_prefix)
     app.include_router(users_router, prefix=settings.api_v1_prefix)
+    app.include_router(billing_router, prefix=settings.api_v1_prefix)
     app.include_router(coach_router, prefix=settings.api_v1_prefix)
+    app.include_router(coach_ws_router, prefix=settings.api_v1_prefix)
     app.include_router(garmin_router, prefix=settings.api_v1_prefix)
     app.include_router(lab_router, prefix=settings.api_v1_prefix)
     app.include_router(portal_router, prefix=settings.api_v1_prefix)
@@ -63,6 +91,12 @@ def create_app() -> FastAPI:
         await db.execute(text("SELECT 1"))
         return {"status": "ok"}
 
+    @app.get("/metrics")
+    async def get_metrics() -> dict[str, dict[str, Any]]:
+        from nove import metrics
+
+        return metrics.snapshot()
+
     return app
 
 
@@ -0,0 +1,68 @@
+# ABOUTME: In-process metrics registry for counters, gauges, and latency summaries.
+# ABOUTME: Snapshotted by the /metrics endpoint; no external exporter required.
+
+from collections import defaultdict, deque
+from typing import Any
+
+# Samples kept per timing series for percentile estimates
+RESERVOIR_SIZE = 1024
+
+_counters: dict[str, float] = defaultdict(float)
+_gauges: dict[str, float] = {}
+_timings: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=RESERVOIR_SIZE))
+_timing_totals: dict[str, tuple[int, float]] = defaultdict(lambda: (0, 0.0))
+
+
+def _key(name: str, labels: dict[str, object]) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+
+def incr(name: str, value: float = 1, **labels: object) -> None:
+    _counters[_key(name, labels)] += value
+
+
+def set_gauge(name: str, value: float, **labels: object) -> None:
+    _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels: object) -> None:
+    """Record one sample (e.g. a latency in ms) for a timing series."""
+    key = _key(name, labels)
+    _timings[key].append(value)
+    count, total = _timing_totals[key]
+    _timing_totals[key] = (count + 1, total + value)
+
+
+def counter(name: str, **labels: object) -> float:
+    return _counters.get(_key(name, labels), 0)
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def snapshot() -> dict[str, dict[str, Any]]:
+    timings = {}
+    for key, reservoir in _timings.items():
+        samples = sorted(reservoir)
+        count, total = _timing_totals[key]
+        timings[key] = {
+            "count": count,
+            "mean": total / count,
+            "p50": _percentile(samples, 50),
+            "p95": _percentile(samples, 95),
+            "p99": _percentile(samples, 99),
+            "max": samples[-1],
+        }
+    return {"counters": dict(_counters), "gauges": dict(_gauges), "timings": timings}
+
+
+def reset() -> None:
+    _counters.clear()
+    _gauges.clear()
+    _timings.clear()
+    _timing_totals.clear()
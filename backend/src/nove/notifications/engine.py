@@ -0,0 +1,195 @@
+# ABOUTME: Incremental nudge evaluation triggered by wearable and lab ingest.
+# ABOUTME: Re-runs only affected rules against cached per-user state, queues nudges in the outbox.
+
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from nove.database import async_session_factory
+from nove.garmin.models import GarminDataPoint
+from nove.labs.models import LabBiomarkerValue
+from nove.notifications.models import Notification
+from nove.notifications.rules import (
+    GARMIN_METRICS,
+    LAB_PREFIX,
+    STATE_WINDOW,
+    Nudge,
+    Observation,
+    UserMetricState,
+    affected_rules,
+)
+
+logger = structlog.get_logger()
+
+MAX_CACHED_USERS = 10_000
+# Rehydrate from the DB periodically so writes from other processes are picked up
+STATE_TTL_SECONDS = 3600
+
+_state_cache: OrderedDict[uuid.UUID, tuple[float, UserMetricState]] = OrderedDict()
+
+
+def garmin_observations(
+    data_type: str, point_date: date, data: dict[str, Any]
+) -> list[Observation]:
+    """Derive rule metrics from a single Garmin data point."""
+    fields: dict[str, list[tuple[str, str, float]]] = {
+        "sleep": [("sleep_hours", "durationInSeconds", 1 / 3600)],
+        "activity": [
+            ("steps", "steps", 1),
+            ("resting_hr", "restingHeartRateInBeatsPerMinute", 1),
+        ],
+        "stress": [("stress_level", "averageStressLevel", 1)],
+    }
+    observations = []
+    for metric, key, scale in fields.get(data_type, []):
+        raw = data.get(key)
+        if isinstance(raw, (int, float)):
+            observations.append(Observation(metric, point_date, raw * scale))
+    return observations
+
+
+def lab_observation(
+    biomarker_code: str, value_date: date, value: float, status: str | None
+) -> Observation:
+    return Observation(f"{LAB_PREFIX}{biomarker_code}", value_date, float(value), status)
+
+
+def _get_state(user_id: uuid.UUID) -> UserMetricState:
+    cached = _state_cache.get(user_id)
+    if cached is not None and time.monotonic() - cached[0] < STATE_TTL_SECONDS:
+        _state_cache.move_to_end(user_id)
+        return cached[1]
+
+    state = UserMetricState()
+    _state_cache[user_id] = (time.monotonic(), state)
+    _state_cache.move_to_end(user_id)
+    while len(_state_cache) > MAX_CACHED_USERS:
+        _state_cache.popitem(last=False)
+    return state
+
+
+def clear_state_cache() -> None:
+    _state_cache.clear()
+
+
+async def _hydrate(
+    db: AsyncSession, user_id: uuid.UUID, state: UserMetricState, metrics: set[str]
+) -> None:
+    """Load history for metrics the cached state has not seen yet."""
+    missing = {m for m in metrics if m not in state.loaded and not m.endswith("*")}
+    if not missing:
+        return
+
+    data_types = {GARMIN_METRICS[m] for m in missing if m in GARMIN_METRICS}
+    if data_types:
+        points = await db.scalars(
+            select(GarminDataPoint).where(
+                GarminDataPoint.user_id == user_id,
+                GarminDataPoint.data_type.in_(data_types),
+                GarminDataPoint.date >= date.today() - timedelta(days=STATE_WINDOW),
+            )
+        )
+        state.apply(
+            [obs for p in points for obs in garmin_observations(p.data_type, p.date, p.data)]
+        )
+
+    codes = [m.removeprefix(LAB_PREFIX) for m in missing if m.startswith(LAB_PREFIX)]
+    if codes:
+        # The newest STATE_WINDOW values of each code: a shared limit would let a
+        # frequently tested marker crowd out the history of the others
+        recent = (
+            select(
+                LabBiomarkerValue.id,
+                func.row_number()
+                .over(
+                    partition_by=LabBiomarkerValue.biomarker_code,
+                    order_by=LabBiomarkerValue.date.desc(),
+                )
+                .label("rank"),
+            )
+            .where(
+                LabBiomarkerValue.user_id == user_id,
+                LabBiomarkerValue.biomarker_code.in_(codes),
+            )
+            .subquery()
+        )
+        values = await db.scalars(
+            select(LabBiomarkerValue)
+            .join(recent, LabBiomarkerValue.id == recent.c.id)
+            .where(recent.c.rank <= STATE_WINDOW)
+        )
+        state.apply([lab_observation(v.biomarker_code, v.date, v.value, v.status) for v in values])
+
+    state.loaded |= missing
+
+
+async def _write_outbox(db: AsyncSession, user_id: uuid.UUID, nudges: list[Nudge]) -> None:
+    stmt = (
+        insert(Notification)
+        .values(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "user_id": user_id,
+                    "kind": "nudge",
+                    "rule_id": n.rule_id,
+                    "dedupe_key": n.dedupe_key,
+                    "title": n.title,
+                    "body": n.body,
+                    "payload": n.payload,
+                    "status": "pending",
+                }
+                for n in nudges
+            ]
+        )
+        .on_conflict_do_nothing(constraint="uq_notification_rule_dedupe")
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def evaluate_on_ingest(
+    user_id: uuid.UUID,
+    observations: list[Observation],
+) -> list[Nudge]:
+    """Re-evaluate the rules affected by freshly written observations.
+
+    Call after the observations are committed. Runs in its own session and never
+    raises: a failed evaluation is logged and must not break the ingest path.
+    """
+    if not observations:
+        return []
+
+    rules = affected_rules({o.metric for o in observations})
+    if not rules:
+        return []
+
+    try:
+        async with async_session_factory() as db:
+            state = _get_state(user_id)
+            await _hydrate(db, user_id, state, set().union(*(r.metrics for r in rules)))
+            state.apply(observations)
+
+            nudges = []
+            for r in rules:
+                nudge = r.evaluate(state, [o for o in observations if r.matches(o.metric)])
+                if nudge is not None:
+                    nudges.append(nudge)
+
+            if nudges:
+                await _write_outbox(db, user_id, nudges)
+                logger.info(
+                    "nudges_fired", user_id=str(user_id), rules=[n.rule_id for n in nudges]
+                )
+            return nudges
+    except Exception:
+        logger.exception("nudge_evaluation_failed", user_id=str(user_id))
+        _state_cache.pop(user_id, None)
+        return []
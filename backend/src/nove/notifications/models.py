@@ -0,0 +1,44 @@
+# ABOUTME: SQLAlchemy model for the notifications outbox.
+# ABOUTME: Nudges and other notifications are queued here before delivery.
+
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import DateTime, Enum, ForeignKey, Index, String, Text, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from nove.database import Base
+
+NOTIFICATION_KINDS = ("nudge",)
+NOTIFICATION_STATUSES = ("pending", "sent", "failed")
+
+
+class Notification(Base):
+    __tablename__ = "notifications"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    kind: Mapped[str] = mapped_column(
+        Enum(*NOTIFICATION_KINDS, name="notification_kind"), default="nudge"
+    )
+    rule_id: Mapped[str] = mapped_column(String(64))
+    dedupe_key: Mapped[str] = mapped_column(String(128))
+    title: Mapped[str] = mapped_column(String(256))
+    body: Mapped[str] = mapped_column(Text)
+    payload: Mapped[dict[str, Any] | None] = mapped_column(JSONB)
+    status: Mapped[str] = mapped_column(
+        Enum(*NOTIFICATION_STATUSES, name="notification_status"), default="pending"
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "rule_id", "dedupe_key", name="uq_notification_rule_dedupe"),
+        Index("ix_notifications_status_created", "status", "created_at"),
+    )
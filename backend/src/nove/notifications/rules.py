@@ -0,0 +1,208 @@
+# ABOUTME: Declarative nudge rules and the per-user metric state they evaluate against.
+# ABOUTME: Each rule names the metrics it depends on so only affected rules run on ingest.
+
+import hashlib
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any
+
+# How many observations per metric the cached state keeps
+STATE_WINDOW = 14
+
+# Metric names derived from Garmin data points, keyed by the data_type they come from
+GARMIN_METRICS = {
+    "sleep_hours": "sleep",
+    "steps": "activity",
+    "resting_hr": "activity",
+    "stress_level": "stress",
+}
+
+LAB_PREFIX = "lab:"
+ANY_LAB = "lab:*"
+
+
+@dataclass(frozen=True)
+class Observation:
+    metric: str
+    date: date
+    value: float
+    status: str | None = None
+
+
+@dataclass(frozen=True)
+class Nudge:
+    rule_id: str
+    dedupe_key: str
+    title: str
+    body: str
+    payload: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class UserMetricState:
+    """Recent observations per metric for one user, newest last."""
+
+    series: dict[str, dict[date, Observation]] = field(default_factory=dict)
+    loaded: set[str] = field(default_factory=set)
+
+    def apply(self, observations: list[Observation]) -> None:
+        for obs in observations:
+            points = self.series.setdefault(obs.metric, {})
+            points[obs.date] = obs
+            if len(points) > STATE_WINDOW:
+                for stale in sorted(points)[: len(points) - STATE_WINDOW]:
+                    del points[stale]
+
+    def values(self, metric: str) -> list[float]:
+        points = self.series.get(metric, {})
+        return [points[d].value for d in sorted(points)]
+
+    def window_key(self, metric: str) -> str:
+        """Dedupe key for windowed rules: the newest date seen for the metric.
+
+        Re-delivered older points land in the same window and map to the same key.
+        """
+        return max(self.series[metric]).isoformat()
+
+
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    metrics: frozenset[str]
+    evaluate: Callable[[UserMetricState, list[Observation]], Nudge | None]
+
+    def matches(self, metric: str) -> bool:
+        if metric in self.metrics:
+            return True
+        return metric.startswith(LAB_PREFIX) and ANY_LAB in self.metrics
+
+
+RULES: list[Rule] = []
+
+
+def rule(
+    rule_id: str, metrics: tuple[str, ...]
+) -> Callable[
+    [Callable[[UserMetricState, list[Observation]], Nudge | None]],
+    Callable[[UserMetricState, list[Observation]], Nudge | None],
+]:
+    """Register a nudge rule that depends on the given metrics."""
+
+    def decorator(
+        fn: Callable[[UserMetricState, list[Observation]], Nudge | None],
+    ) -> Callable[[UserMetricState, list[Observation]], Nudge | None]:
+        RULES.append(Rule(id=rule_id, metrics=frozenset(metrics), evaluate=fn))
+        return fn
+
+    return decorator
+
+
+def affected_rules(metrics: set[str]) -> list[Rule]:
+    """Return the rules that depend on any of the given metrics."""
+    return [r for r in RULES if any(r.matches(m) for m in metrics)]
+
+
+def _latest_date(changed: list[Observation]) -> str:
+    return max(o.date for o in changed).isoformat()
+
+
+def _codes_digest(codes: list[str]) -> str:
+    """A fixed-length stand-in for a code list, so keys fit the column however many are flagged."""
+    return hashlib.sha1(",".join(codes).encode()).hexdigest()[:16]
+
+
+def _mean(values: list[float]) -> float:
+    return sum(values) / len(values)
+
+
+@rule("low_sleep", metrics=("sleep_hours",))
+def low_sleep(state: UserMetricState, changed: list[Observation]) -> Nudge | None:
+    recent = state.values("sleep_hours")[-3:]
+    if len(recent) < 3 or _mean(recent) >= 6:
+        return None
+    avg = _mean(recent)
+    return Nudge(
+        rule_id="low_sleep",
+        dedupe_key=state.window_key("sleep_hours"),
+        title="Tu sueno ha estado corto",
+        body=f"Promediaste {avg:.1f} horas de sueno en las ultimas 3 noches.",
+        payload={"avg_sleep_hours": round(avg, 2)},
+    )
+
+
+@rule("steps_drop", metrics=("steps",))
+def steps_drop(state: UserMetricState, changed: list[Observation]) -> Nudge | None:
+    steps = state.values("steps")
+    if len(steps) < 7:
+        return None
+    recent, baseline = _mean(steps[-3:]), _mean(steps[:-3])
+    if baseline <= 0 or recent >= baseline * 0.6:
+        return None
+    return Nudge(
+        rule_id="steps_drop",
+        dedupe_key=state.window_key("steps"),
+        title="Tu actividad bajo esta semana",
+        body=f"Vas en {int(recent)} pasos diarios, frente a {int(baseline)} antes.",
+        payload={"recent_steps": int(recent), "baseline_steps": int(baseline)},
+    )
+
+
+@rule("resting_hr_up", metrics=("resting_hr",))
+def resting_hr_up(state: UserMetricState, changed: list[Observation]) -> Nudge | None:
+    rhr = state.values("resting_hr")
+    if len(rhr) < 4:
+        return None
+    latest, baseline = rhr[-1], _mean(rhr[:-1])
+    if latest < baseline + 7:
+        return None
+    return Nudge(
+        rule_id="resting_hr_up",
+        dedupe_key=state.window_key("resting_hr"),
+        title="Tu frecuencia cardiaca en reposo subio",
+        body=f"Hoy marcaste {int(latest)} bpm, tu promedio reciente es {int(baseline)} bpm.",
+        payload={"resting_hr": latest, "baseline_resting_hr": round(baseline, 1)},
+    )
+
+
+@rule("high_stress", metrics=("stress_level",))
+def high_stress(state: UserMetricState, changed: list[Observation]) -> Nudge | None:
+    recent = state.values("stress_level")[-3:]
+    if len(recent) < 3 or _mean(recent) < 60:
+        return None
+    avg = _mean(recent)
+    return Nudge(
+        rule_id="high_stress",
+        dedupe_key=state.window_key("stress_level"),
+        title="Tu estres ha estado alto",
+        body=f"Tu nivel de estres promedio fue {int(avg)}/100 en los ultimos 3 dias.",
+        payload={"avg_stress_level": round(avg, 1)},
+    )
+
+
+@rule("flagged_biomarker", metrics=(ANY_LAB,))
+def flagged_biomarker(state: UserMetricState, changed: list[Observation]) -> Nudge | None:
+    flagged = sorted(o.metric.removeprefix(LAB_PREFIX) for o in changed if o.status == "flagged")
+    if not flagged:
+        return None
+    return Nudge(
+        rule_id="flagged_biomarker",
+        dedupe_key=f"{_latest_date(changed)}:{_codes_digest(flagged)}",
+        title="Tienes resultados fuera de rango",
+        body=f"Revisa con tu coach: {', '.join(flagged)}.",
+        payload={"biomarker_codes": flagged},
+    )
+
+
+@rule("hba1c_rising", metrics=("lab:HBA1C",))
+def hba1c_rising(state: UserMetricState, changed: list[Observation]) -> Nudge | None:
+    values = state.values("lab:HBA1C")
+    if len(values) < 2 or values[-1] < values[-2] + 0.3:
+        return None
+    return Nudge(
+        rule_id="hba1c_rising",
+        dedupe_key=state.window_key("lab:HBA1C"),
+        title="Tu HbA1c va en aumento",
+        body=f"Paso de {values[-2]} a {values[-1]} desde tu resultado anterior.",
+        payload={"previous": values[-2], "latest": values[-1]},
+    )
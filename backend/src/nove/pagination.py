@@ -0,0 +1,63 @@
+# ABOUTME: Keyset (cursor) pagination over (created_at, id) for list endpoints.
+# ABOUTME: Cursors are opaque tokens; the next one is returned in the X-Next-Cursor header.
+
+import base64
+import uuid
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor invalido"
+        ) from None
+
+
+async def newest_first(
+    db: AsyncSession,
+    query: Select[Any],
+    created_at: InstrumentedAttribute[Any],
+    row_id: InstrumentedAttribute[Any],
+    cursor: str | None,
+    limit: int,
+    response: Response,
+) -> list[Any]:
+    """Fetch one page of rows, newest first, strictly older than ``cursor``.
+
+    Seeks with a row-value comparison on (created_at, id), which Postgres serves
+    as a single range scan on a matching composite index. Sets the cursor for
+    the following page on ``response`` when more rows remain.
+    """
+    if cursor is not None:
+        before_at, before_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(created_at, row_id) < tuple_(literal(before_at), literal(before_id))
+        )
+    result = await db.execute(query.order_by(created_at.desc(), row_id.desc()).limit(limit + 1))
+    rows = list(result.scalars().all())
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(last, created_at.key), getattr(last, row_id.key)
+        )
+    return rows
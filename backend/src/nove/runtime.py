@@ -0,0 +1,28 @@
+# ABOUTME: Samples event-loop lag and database pool usage into the metrics registry.
+# ABOUTME: Runs for the app's lifetime so /metrics shows saturation under load.
+
+import asyncio
+import time
+
+from sqlalchemy.pool import QueuePool
+
+from nove import metrics
+from nove.database import engine
+
+
+async def sample(interval: float) -> None:
+    """Record loop lag and pooled connections in use every ``interval`` seconds.
+
+    Lag is how late the sampler's own sleep wakes up: time the loop spent
+    running other callbacks, which every request waiting on it also pays.
+    """
+    pool = engine.pool
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag_ms = (time.perf_counter() - started - interval) * 1000
+        metrics.observe("event_loop_lag_ms", max(0.0, lag_ms))
+        if isinstance(pool, QueuePool):
+            metrics.observe("db_pool_checked_out", pool.checkedout())
+            metrics.set_gauge("db_pool_checked_out", pool.checkedout())
+            metrics.set_gauge("db_pool_size", pool.size())
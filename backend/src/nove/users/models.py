@@ -28,6 +28,8 @@ class User(Base):
     health_goals: Mapped[list[str] | None] = mapped_column(ARRAY(Text))
     language: Mapped[str] = mapped_column(String(8), default="es")
     onboarding_completed: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Subscription tier; sets the monthly usage quota (see billing/quota.py)
+    tier: Mapped[str] = mapped_column(String(16), default="free", server_default="free")
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
@@ -50,7 +52,10 @@ class UserHealthProfile(Base):
     )
     medical_conditions: Mapped[dict | None] = mapped_column(JSONB)
     lifestyle_notes: Mapped[dict | None] = mapped_column(JSONB)
+    # Long-term memory folded from the user's conversations, and the newest
+    # message it covers (see coach/user_memory.py)
     ai_summary: Mapped[str | None] = mapped_column(Text)
+    ai_summary_through: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
@@ -3,6 +3,7 @@
 
 from fastapi import APIRouter
 
+from nove.coach import context_cache
 from nove.deps import DB, CurrentUser
 from nove.users.models import UserHealthProfile
 from nove.users.schemas import HealthProfileRead, HealthProfileUpdate, UserRead, UserUpdate
@@ -21,6 +22,7 @@ async def update_me(body: UserUpdate, user: CurrentUser, db: DB) -> UserRead:
     for field, value in update_data.items():
         setattr(user, field, value)
     await db.commit()
+    context_cache.invalidate(user.id, "profile")
     await db.refresh(user)
     return UserRead.model_validate(user)
 
@@ -39,5 +41,6 @@ async def upsert_health_profile(
         setattr(profile, field, value)
 
     await db.commit()
+    context_cache.invalidate(user.id, "profile")
     await db.refresh(profile)
     return HealthProfileRead.model_validate(profile)
@@ -18,6 +18,7 @@ class UserRead(BaseModel):
     health_goals: list[str] | None = None
     language: str
     onboarding_completed: bool
+    tier: str
     created_at: datetime
 
     model_config = {"from_attributes": True}
@@ -0,0 +1,426 @@
+# ABOUTME: Weekly coach check-ins for every eligible user, generated as batched model requests.
+# ABOUTME: Contexts come from set-based queries; replies are bulk-written as check_in chats.
+"""Usage: uv run python -m nove.worker.checkins [--poll-seconds 60] [--dry-run]
+
+Users who finished onboarding and have had no check-in for a week are paged by
+id, ``BATCH_MAX_REQUESTS`` at a time. Each page's contexts are built with a
+handful of queries (profiles, wearable days, latest biomarkers and lab summaries) and submitted as
+one Message Batch, which costs half the interactive price and is not bound by
+the coach's concurrency limits. Finished batches are written back in one
+transaction each.
+
+Submitted batches are recorded in ``check_in_batches``; a run first resumes
+polling any a previous run left unwritten, and their users are not submitted
+again meanwhile.
+"""
+
+import argparse
+import asyncio
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime, timedelta
+from typing import Any, Protocol, cast
+
+import anthropic
+import structlog
+from sqlalchemy import Row, String, exists, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove import metrics
+from nove.billing import usage
+from nove.coach.context import (
+    MAX_LAB_SUMMARIES,
+    WEARABLE_DAYS,
+    build_profile_context,
+    fit_sections,
+    format_labs,
+    format_wearable,
+    text_block,
+)
+from nove.coach.llm import usage_metadata
+from nove.coach.models import PREVIEW_CHARS, Conversation, MemoryDocument, Message
+from nove.coach.prompts import get_check_in_prompt, get_system_prompt
+from nove.coach.service import MODEL
+from nove.coach.summary import ROLE_LABELS, estimate_tokens
+from nove.database import async_session_factory
+from nove.garmin.models import GarminConnection, GarminDataPoint
+from nove.labs.models import LabResult
+from nove.labs.service import latest_biomarkers
+from nove.users.models import User, UserHealthProfile
+from nove.worker.models import CheckInBatch
+
+logger = structlog.get_logger()
+
+CHECK_IN_INTERVAL = timedelta(days=7)
+# Anthropic accepts up to 100k requests per batch; smaller pages bound memory
+BATCH_MAX_REQUESTS = 10_000
+MAX_TOKENS = 600
+POLL_SECONDS = 60.0
+TITLES = {"es": "Check-in semanal", "en": "Weekly check-in"}
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    params: dict[str, Any]
+
+
+@dataclass
+class BatchResult:
+    custom_id: str
+    text: str | None
+    usage: dict[str, int] = field(default_factory=dict)
+    error: str | None = None
+
+
+class BatchProvider(Protocol):
+    async def submit(self, requests: list[BatchRequest]) -> str: ...
+
+    async def is_done(self, batch_id: str) -> bool: ...
+
+    def results(self, batch_id: str) -> AsyncIterator[BatchResult]: ...
+
+
+class AnthropicBatchProvider:
+    """The Message Batches API: results arrive within 24 hours, usually much sooner."""
+
+    def __init__(self, client: anthropic.AsyncAnthropic) -> None:
+        self.client = client
+
+    async def submit(self, requests: list[BatchRequest]) -> str:
+        # params are built as plain dicts; the SDK types them as a TypedDict
+        entries = [{"custom_id": r.custom_id, "params": r.params} for r in requests]
+        batch = await self.client.messages.batches.create(requests=cast("Any", entries))
+        return batch.id
+
+    async def is_done(self, batch_id: str) -> bool:
+        batch = await self.client.messages.batches.retrieve(batch_id)
+        return batch.processing_status == "ended"
+
+    async def results(self, batch_id: str) -> AsyncIterator[BatchResult]:
+        async for entry in await self.client.messages.batches.results(batch_id):
+            if entry.result.type != "succeeded":
+                yield BatchResult(entry.custom_id, None, error=entry.result.type)
+                continue
+            message = entry.result.message
+            text = "".join(block.text for block in message.content if block.type == "text")
+            yield BatchResult(entry.custom_id, text.strip(), usage_metadata(message.usage))
+
+
+@dataclass
+class CheckInReport:
+    eligible: int = 0
+    batches: int = 0
+    written: int = 0
+    failed: int = 0
+    resumed: int = 0
+
+
+def _eligible_users(now: datetime, after: uuid.UUID | None, limit: int) -> Any:
+    recent_check_in = exists().where(
+        Conversation.user_id == User.id,
+        Conversation.conversation_type == "check_in",
+        Conversation.created_at > now - CHECK_IN_INTERVAL,
+    )
+    in_unwritten_batch = exists().where(
+        CheckInBatch.status == "submitted",
+        CheckInBatch.languages.has_key(User.id.cast(String)),
+    )
+    query = (
+        select(User, UserHealthProfile)
+        .outerjoin(UserHealthProfile, UserHealthProfile.user_id == User.id)
+        .where(User.onboarding_completed.is_(True), ~recent_check_in, ~in_unwritten_batch)
+        .order_by(User.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(User.id > after)
+    return query
+
+
+async def _wearable_contexts(
+    db: AsyncSession, user_ids: list[uuid.UUID], today: date
+) -> dict[uuid.UUID, str | None]:
+    result = await db.execute(
+        select(GarminDataPoint)
+        .join(GarminConnection, GarminConnection.user_id == GarminDataPoint.user_id)
+        .where(
+            GarminDataPoint.user_id.in_(user_ids),
+            GarminDataPoint.date >= today - timedelta(days=WEARABLE_DAYS),
+            GarminDataPoint.date <= today,
+        )
+        .order_by(GarminDataPoint.user_id, GarminDataPoint.date.desc())
+    )
+    points: dict[uuid.UUID, list[GarminDataPoint]] = defaultdict(list)
+    for point in result.scalars():
+        points[point.user_id].append(point)
+    return {user_id: format_wearable(user_points) for user_id, user_points in points.items()}
+
+
+async def _lab_contexts(
+    db: AsyncSession, user_ids: list[uuid.UUID]
+) -> dict[uuid.UUID, str | None]:
+    """Latest biomarkers and newest result summaries for the whole page, two queries."""
+    ranked = (
+        select(
+            LabResult.user_id,
+            LabResult.created_at,
+            LabResult.ai_summary,
+            func.row_number()
+            .over(partition_by=LabResult.user_id, order_by=LabResult.created_at.desc())
+            .label("rank"),
+        )
+        .where(LabResult.user_id.in_(user_ids), LabResult.ai_summary.is_not(None))
+        .subquery()
+    )
+    summaries = await db.execute(
+        select(ranked).where(ranked.c.rank <= MAX_LAB_SUMMARIES).order_by(ranked.c.rank)
+    )
+    summaries_by_user: dict[uuid.UUID, list[Row[Any]]] = defaultdict(list)
+    for row in summaries:
+        summaries_by_user[row.user_id].append(row)
+
+    latest_by_user: dict[uuid.UUID, list[Row[Any]]] = defaultdict(list)
+    for row in await db.execute(latest_biomarkers(user_ids)):
+        latest_by_user[row.user_id].append(row)
+
+    return {
+        user_id: format_labs(summaries_by_user[user_id], latest_by_user[user_id])
+        for user_id in summaries_by_user.keys() | latest_by_user.keys()
+    }
+
+
+def _request(
+    user: User,
+    profile: UserHealthProfile | None,
+    wearable_text: str | None,
+    lab_text: str | None,
+) -> BatchRequest:
+    system_prompt = get_system_prompt(user.language)
+    texts, _ = fit_sections(
+        {
+            "profile": build_profile_context(user, profile),
+            "labs": lab_text,
+            "wearable": wearable_text,
+        },
+        estimate_tokens(system_prompt),
+    )
+    stable = f"## Perfil del Usuario\n{texts['profile']}"
+    if texts["labs"]:
+        stable += f"\n\n## Resultados de Laboratorio\n{texts['labs']}"
+    system = [text_block(system_prompt, cache=True), text_block(stable)]
+    if texts["wearable"]:
+        system.append(text_block(f"## Datos de Wearable\n{texts['wearable']}"))
+    return BatchRequest(
+        custom_id=str(user.id),
+        params={
+            "model": MODEL,
+            "max_tokens": MAX_TOKENS,
+            "system": system,
+            "messages": [{"role": "user", "content": get_check_in_prompt(user.language)}],
+        },
+    )
+
+
+async def build_requests(
+    db: AsyncSession, now: datetime, after: uuid.UUID | None, limit: int
+) -> tuple[list[BatchRequest], dict[uuid.UUID, str]]:
+    """One page of check-in requests, plus each user's language for the write-back."""
+    rows = (await db.execute(_eligible_users(now, after, limit))).all()
+    if not rows:
+        return [], {}
+    user_ids = [user.id for user, _ in rows]
+    wearable = await _wearable_contexts(db, user_ids, now.date())
+    labs = await _lab_contexts(db, user_ids)
+    requests = [
+        _request(user, profile, wearable.get(user.id), labs.get(user.id)) for user, profile in rows
+    ]
+    return requests, {user.id: user.language for user, _ in rows}
+
+
+async def write_results(
+    db: AsyncSession, results: list[BatchResult], languages: dict[uuid.UUID, str], now: datetime
+) -> int:
+    """Bulk-insert a check_in conversation with the coach's message per result.
+
+    The message also seeds the conversation summary, with the watermark on it:
+    the history window always starts on a user turn, so without this the
+    user's reply would reach the model without the check-in it answers.
+
+    Users who got a check-in since the batch was built (say, from an
+    overlapping run) are skipped. The caller commits. Returns the number
+    written.
+    """
+    # user -> (reply text, token usage); errored results have no text
+    replies = {uuid.UUID(r.custom_id): (r.text, r.usage) for r in results if r.text}
+    if not replies:
+        return 0
+    already = await db.execute(
+        select(Conversation.user_id).where(
+            Conversation.user_id.in_(list(replies)),
+            Conversation.conversation_type == "check_in",
+            Conversation.created_at > now - CHECK_IN_INTERVAL,
+        )
+    )
+    for user_id in already.scalars():
+        replies.pop(user_id, None)
+    if not replies:
+        return 0
+
+    conversations, messages, documents, usage_events = [], [], [], []
+    written_at = datetime.now(UTC)
+    for user_id, (text, reply_usage) in replies.items():
+        language = languages.get(user_id, "es")
+        conversation_id, message_id = uuid.uuid4(), uuid.uuid4()
+        conversations.append(
+            {
+                "id": conversation_id,
+                "user_id": user_id,
+                "title": TITLES.get(language, TITLES["en"]),
+                "conversation_type": "check_in",
+                "last_message_preview": " ".join(text.split())[:PREVIEW_CHARS],
+                "message_count": 1,
+                "summary": f"{ROLE_LABELS['assistant']}: {text}",
+                "summary_through": written_at,
+            }
+        )
+        messages.append(
+            {
+                "id": message_id,
+                "conversation_id": conversation_id,
+                "role": "assistant",
+                "content": text,
+                "metadata_": {"model": MODEL, "usage": reply_usage, "batch": True},
+                "created_at": written_at,
+            }
+        )
+        documents.append(
+            {
+                "user_id": user_id,
+                "source": "assistant",
+                "source_id": message_id,
+                "conversation_id": conversation_id,
+                "language": language,
+                "content": text,
+            }
+        )
+        usage_events.append(
+            usage.event(user_id, "checkin", "anthropic", MODEL, None, **reply_usage)
+        )
+    await db.execute(insert(Conversation), conversations)
+    await db.execute(insert(Message), messages)
+    await db.execute(insert(MemoryDocument), documents)
+    # Metered in the same transaction, so a retried batch is not counted twice
+    await usage.write(db, usage_events)
+    return len(conversations)
+
+
+async def run_weekly_checkins(
+    provider: BatchProvider,
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+    now: datetime | None = None,
+    poll_seconds: float = POLL_SECONDS,
+    page_size: int = BATCH_MAX_REQUESTS,
+) -> CheckInReport:
+    """Submit a batch per page of eligible users, then write each back as it finishes.
+
+    Batches a previous run submitted but never wrote back are polled too.
+    """
+    now = now or datetime.now(UTC)
+    report = CheckInReport()
+    # batch id -> (run clock, user -> language)
+    pending: dict[str, tuple[datetime, dict[uuid.UUID, str]]] = {}
+
+    async with session_factory() as db:
+        for batch in await db.scalars(
+            select(CheckInBatch).where(CheckInBatch.status == "submitted")
+        ):
+            languages = {uuid.UUID(k): v for k, v in batch.languages.items()}
+            pending[batch.id] = (batch.run_at, languages)
+    report.resumed = len(pending)
+    if pending:
+        logger.info("checkin_batches_resumed", batches=len(pending))
+
+    after = None
+    while True:
+        async with session_factory() as db:
+            requests, languages = await build_requests(db, now, after, page_size)
+        if not requests:
+            break
+        batch_id = await provider.submit(requests)
+        async with session_factory() as db:
+            db.add(
+                CheckInBatch(
+                    id=batch_id,
+                    run_at=now,
+                    languages={str(user_id): lang for user_id, lang in languages.items()},
+                )
+            )
+            await db.commit()
+        pending[batch_id] = (now, languages)
+        report.eligible += len(requests)
+        report.batches += 1
+        after = uuid.UUID(requests[-1].custom_id)
+        logger.info("checkin_batch_submitted", batch_id=batch_id, requests=len(requests))
+
+    while pending:
+        for batch_id in list(pending):
+            if not await provider.is_done(batch_id):
+                continue
+            results = [r async for r in provider.results(batch_id)]
+            failed = sum(1 for r in results if not r.text)
+            run_at, languages = pending.pop(batch_id)
+            async with session_factory() as db:
+                written = await write_results(db, results, languages, run_at)
+                await db.execute(
+                    update(CheckInBatch)
+                    .where(CheckInBatch.id == batch_id)
+                    .values(
+                        status="written", written=written, failed=failed, finished_at=func.now()
+                    )
+                )
+                await db.commit()
+            report.written += written
+            report.failed += failed
+            metrics.incr("checkins_written", written)
+            metrics.incr("checkins_failed", failed)
+            logger.info("checkin_batch_written", batch_id=batch_id, written=written, failed=failed)
+        if pending:
+            await asyncio.sleep(poll_seconds)
+
+    return report
+
+
+async def main(poll_seconds: float, dry_run: bool) -> None:
+    from nove.coach.llm import LLMGateway
+    from nove.database import engine
+
+    try:
+        if dry_run:
+            async with async_session_factory() as db:
+                requests, _ = await build_requests(db, datetime.now(UTC), None, 1_000_000)
+            print(f"{len(requests)} users are due a check-in")
+            return
+        gateway = LLMGateway.from_settings()
+        try:
+            report = await run_weekly_checkins(
+                AnthropicBatchProvider(gateway.client), poll_seconds=poll_seconds
+            )
+        finally:
+            await gateway.aclose()
+        print(
+            f"eligible={report.eligible} batches={report.batches} "
+            f"written={report.written} failed={report.failed} resumed={report.resumed}"
+        )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--poll-seconds", type=float, default=POLL_SECONDS)
+    parser.add_argument("--dry-run", action="store_true", help="Only count eligible users")
+    args = parser.parse_args()
+    asyncio.run(main(args.poll_seconds, args.dry_run))
@@ -0,0 +1,34 @@
+# ABOUTME: SQLAlchemy model for check-in batches submitted to the Message Batches API.
+# ABOUTME: A batch is recorded as soon as it is submitted, so a restarted worker resumes polling.
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Enum, Integer, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from nove.database import Base
+
+CHECK_IN_BATCH_STATUSES = ("submitted", "written")
+
+
+class CheckInBatch(Base):
+    __tablename__ = "check_in_batches"
+
+    # The provider's batch id
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # The run's clock: the write-back skips users checked in within a week of it
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    # str(user_id) -> language, for every user in the batch
+    languages: Mapped[dict[str, str]] = mapped_column(JSONB)
+    status: Mapped[str] = mapped_column(
+        Enum(*CHECK_IN_BATCH_STATUSES, name="check_in_batch_status"),
+        default="submitted",
+        index=True,
+    )
+    written: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
@@ -4,15 +4,36 @@
 import uuid
 from collections.abc import AsyncGenerator
 
+import httpx
 import pytest
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from nove import background, database, metrics
+from nove.billing import usage
+from nove.coach import admission, context_cache, llm, memory, replay
 from nove.config import settings
 from nove.database import Base, get_db
+from nove.devtools.fake_anthropic import FakeLLMConfig, create_fake_anthropic_app
+from nove.devtools.streaming_transport import StreamingASGITransport
+from nove.labs import processing
 from nove.main import create_app
 
 
+@pytest.fixture(autouse=True)
+def _reset_process_state():
+    context_cache.clear()
+    replay.clear()
+    memory.clear()
+    metrics.reset()
+    admission.set_controller(None)
+    usage.clear()
+    processing.clear()
+    yield
+    context_cache.clear()
+    replay.clear()
+
+
 @pytest.fixture
 async def db() -> AsyncGenerator[AsyncSession]:
     engine = create_async_engine(settings.database_url)
@@ -24,6 +45,11 @@ async def db() -> AsyncGenerator[AsyncSession]:
     async with session_factory() as session:
         yield session
 
+    # Code paths that open their own sessions use the app engine; drop its
+    # connections so they are not reused on the next test's event loop.
+    await background.drain()
+    await database.engine.dispose()
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
 
@@ -54,3 +80,22 @@ def make_auth_header() -> callable:
         return {"Authorization": f"Bearer {token}"}
 
     return _make
+
+
+@pytest.fixture
+async def fake_llm() -> AsyncGenerator[FakeLLMConfig]:
+    """Route the coach's LLM gateway to an in-process fake Anthropic streaming server."""
+    config = FakeLLMConfig()
+    http_client = httpx.AsyncClient(
+        transport=StreamingASGITransport(create_fake_anthropic_app(config))
+    )
+    gateway = llm.LLMGateway(
+        api_key="test-key",
+        base_url="http://fake-anthropic",
+        max_concurrency=200,
+        http_client=http_client,
+    )
+    llm.set_gateway(gateway)
+    yield config
+    llm.set_gateway(None)
+    await gateway.aclose()
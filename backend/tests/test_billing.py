@@ -0,0 +1,187 @@
+# ABOUTME: Tests for LLM usage metering and tier quotas.
+# ABOUTME: Covers the ledger written off the request path, monthly rollups and the quota check.
+
+import uuid
+from datetime import UTC, datetime
+
+from httpx import AsyncClient
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from nove import background, metrics
+from nove.billing import quota, usage
+from nove.billing.models import UsageEvent, UsagePeriodTotal
+from nove.coach.routing import FULL_MODEL
+from nove.config import settings
+from nove.devtools.fake_anthropic import FakeLLMConfig
+from nove.users.models import User
+
+PREFIX = "/api/v1"
+
+
+async def _register(client: AsyncClient, email: str = "billing@example.com") -> dict[str, str]:
+    resp = await client.post(
+        f"{PREFIX}/auth/register",
+        json={"email": email, "password": "pass1234", "full_name": "Billing User"},
+    )
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+async def test_coach_turns_are_metered_and_the_quota_is_one_key_read(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig, monkeypatch
+):
+    headers = await _register(client)
+    resp = await client.post(f"{PREFIX}/conversations", json={"title": "Q"}, headers=headers)
+    conv_id = resp.json()["id"]
+    fake_llm.reply = "Respuesta medida"
+
+    resp = await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages", json={"content": "Hola"}, headers=headers
+    )
+    assert resp.status_code == 200
+    await background.drain()
+
+    (row,) = (await db.execute(select(UsageEvent))).scalars().all()
+    assert (row.feature, row.provider, row.model) == ("coach", "anthropic", FULL_MODEL)
+    assert row.input_tokens > 0 and row.output_tokens > 0
+    resp = await client.get(f"{PREFIX}/billing/usage", headers=headers)
+    data = resp.json()
+    assert data["tier"] == "free"
+    assert data["tokens"] == row.input_tokens + row.output_tokens
+    assert data["coach_turns"] == 1
+    assert data["limit"] == settings.billing_free_monthly_tokens
+
+    # At the limit the next turn is refused before any model call
+    monkeypatch.setattr(settings, "billing_free_monthly_tokens", data["tokens"])
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.bind.sync_engine, "before_cursor_execute", _count)
+    try:
+        resp = await client.post(
+            f"{PREFIX}/conversations/{conv_id}/messages",
+            json={"content": "Otra"},
+            headers=headers,
+        )
+    finally:
+        event.remove(db.bind.sync_engine, "before_cursor_execute", _count)
+    assert resp.status_code == 429
+    assert resp.json()["detail"] == "Monthly usage limit reached"
+    metering = [s for s in statements if "usage_" in s]
+    assert len(metering) == 1
+    assert "FROM usage_period_totals" in metering[0]
+    assert "usage_period_totals.user_id = " in metering[0]
+    assert "usage_period_totals.period = " in metering[0]
+
+    # Unlimited tiers are not checked at all
+    user = await db.scalar(select(User).where(User.email == "billing@example.com"))
+    user.tier = "pro"
+    await db.commit()
+    await quota.check(db, user)
+
+
+async def test_batched_ledger_writes_roll_up_into_monthly_totals(
+    client: AsyncClient, db: AsyncSession
+):
+    await _register(client, "a@example.com")
+    await _register(client, "b@example.com")
+    first, second = (await db.execute(select(User.id).order_by(User.email))).scalars().all()
+    september = datetime(2026, 9, 30, 23, 0, tzinfo=UTC)
+    october = datetime(2026, 10, 1, 1, 0, tzinfo=UTC)
+
+    events = [
+        usage.event(first, "coach", "anthropic", "claude", september, input_tokens=100),
+        usage.event(
+            first,
+            "coach",
+            "anthropic",
+            "claude",
+            october,
+            input_tokens=10,
+            output_tokens=5,
+            cache_read_input_tokens=1000,
+            cache_creation_input_tokens=20,
+        ),
+        usage.event(first, "lab_ocr", "mistral", "ocr", october, pages=3),
+        usage.event(second, "lab_extraction", "google", "gemini", october, input_tokens=None),
+    ]
+    await usage.write(db, events[:2])
+    await usage.write(db, events[2:])
+    await db.commit()
+
+    totals = {
+        (t.user_id, t.period): t
+        for t in (await db.execute(select(UsagePeriodTotal))).scalars().all()
+    }
+    assert set(totals) == {
+        (first, september.date().replace(day=1)),
+        (first, october.date().replace(day=1)),
+        (second, october.date().replace(day=1)),
+    }
+    current = totals[(first, october.date().replace(day=1))]
+    assert (current.tokens, current.cache_read_input_tokens) == (35, 1000)
+    assert (current.pages, current.coach_turns) == (3, 1)
+
+    # The running totals agree with summing the ledger
+    summed = (
+        await db.execute(
+            select(func.sum(UsageEvent.input_tokens), func.sum(UsageEvent.pages)).where(
+                UsageEvent.user_id == first
+            )
+        )
+    ).one()
+    assert tuple(summed) == (
+        sum(t.input_tokens for t in totals.values() if t.user_id == first),
+        sum(t.pages for t in totals.values() if t.user_id == first),
+    )
+
+
+async def test_recorded_usage_is_written_in_one_background_batch(db: AsyncSession):
+    user = User(email="q@example.com", full_name="Queue")
+    db.add(user)
+    await db.commit()
+
+    for _ in range(5):
+        usage.record(user.id, "coach_summary", "anthropic", "claude", output_tokens=2)
+    usage.record(uuid.uuid4(), "coach", "anthropic", "claude", output_tokens=1)
+    await background.drain()
+
+    # One batch; the event for a user that no longer exists is discarded
+    assert metrics.counter("usage_events_written") == 5
+    assert (await db.scalar(select(func.count()).select_from(UsageEvent))) == 5
+    total = await quota.period_total(db, user.id)
+    assert total is not None and total.tokens == 10
+
+
+async def test_a_failed_flush_is_retried_and_queued_usage_drains(db: AsyncSession, monkeypatch):
+    user = User(email="retry@example.com", full_name="Retry")
+    db.add(user)
+    await db.commit()
+    write = usage.write
+    attempts = 0
+
+    async def flaky_write(session: AsyncSession, events: list[dict]) -> None:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ConnectionError("database went away")
+        await write(session, events)
+
+    monkeypatch.setattr(usage, "write", flaky_write)
+    monkeypatch.setattr(usage, "_backoff", lambda attempt: 0)
+    for _ in range(3):
+        usage.record(user.id, "coach", "anthropic", "claude", output_tokens=2)
+    await background.drain()
+
+    # The failed batch went back on the queue and landed on the next attempt
+    assert (attempts, metrics.counter("usage_flush_failures")) == (2, 1)
+    assert metrics.counter("usage_events_dropped") == 0
+    assert (await db.scalar(select(func.count()).select_from(UsageEvent))) == 3
+
+    # On shutdown whatever is still queued is written before the process exits
+    usage.record(user.id, "coach", "anthropic", "claude", output_tokens=2)
+    await usage.drain()
+    assert (await db.scalar(select(func.count()).select_from(UsageEvent))) == 4
+    await background.drain()
@@ -0,0 +1,162 @@
+# ABOUTME: Tests for the weekly check-in worker.
+# ABOUTME: Runs the batch job against the in-process fake provider and checks the write-back.
+
+from datetime import UTC, date, datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove.coach.models import Conversation, MemoryDocument, Message
+from nove.devtools.fake_anthropic import FakeLLMConfig
+from nove.devtools.fake_batches import FakeBatchProvider
+from nove.garmin.models import GarminConnection, GarminDataPoint
+from nove.users.models import User
+from nove.worker.checkins import run_weekly_checkins
+from nove.worker.models import CheckInBatch
+
+
+async def _users(db: AsyncSession, count: int, **fields) -> list[User]:
+    users = [
+        User(email=f"checkin{i}@example.com", full_name=f"User {i}", **fields)
+        for i in range(count)
+    ]
+    db.add_all(users)
+    await db.commit()
+    return users
+
+
+async def test_weekly_checkins_are_batched_and_written_back(db: AsyncSession):
+    users = await _users(db, 5, onboarding_completed=True, language="es")
+    users[0].language = "en"
+    db.add(User(email="new@example.com", full_name="Not onboarded"))
+    db.add(
+        GarminConnection(
+            user_id=users[1].id,
+            garmin_user_id="g-1",
+            access_token="a",
+            refresh_token="r",
+            token_expires_at=datetime.now(UTC) + timedelta(days=1),
+        )
+    )
+    db.add(
+        GarminDataPoint(
+            user_id=users[1].id,
+            data_type="sleep",
+            date=date.today(),
+            data={"durationInSeconds": 27000},
+        )
+    )
+    await db.commit()
+
+    provider = FakeBatchProvider(polls_before_done=1, fail_ids={str(users[4].id)})
+    factory = async_sessionmaker(db.bind, expire_on_commit=False)
+    selects = []
+
+    def count_selects(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    event.listen(db.bind.sync_engine, "before_cursor_execute", count_selects)
+    report = await run_weekly_checkins(provider, factory, poll_seconds=0, page_size=2)
+    event.remove(db.bind.sync_engine, "before_cursor_execute", count_selects)
+
+    assert (report.eligible, report.batches, report.written, report.failed) == (5, 3, 4, 1)
+    # Contexts are built per page, not per user: four queries for each of the three
+    # pages, one for the empty page, one for unwritten batches and at most one
+    # duplicate check per finished batch
+    assert len(selects) <= 4 * 3 + 1 + 1 + 3
+
+    requests = {r.custom_id: r.params for b in provider.batches.values() for r in b}
+    wearable = requests[str(users[1].id)]["system"]
+    assert "Sueno promedio: 7.5" in wearable[-1]["text"]
+    assert "weekly check-in" in requests[str(users[0].id)]["messages"][0]["content"].lower()
+
+    conversations = (
+        (
+            await db.execute(
+                select(Conversation).where(Conversation.conversation_type == "check_in")
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert {c.user_id for c in conversations} == {u.id for u in users[:4]}
+    titles = {c.user_id: c.title for c in conversations}
+    assert titles[users[0].id] == "Weekly check-in"
+    assert titles[users[1].id] == "Check-in semanal"
+    assert all(c.message_count == 1 and c.last_message_preview for c in conversations)
+
+    messages = (await db.execute(select(Message))).scalars().all()
+    assert len(messages) == 4
+    assert all(m.role == "assistant" and m.metadata_["batch"] for m in messages)
+    documents = (await db.execute(select(MemoryDocument))).scalars().all()
+    assert {d.source_id for d in documents} == {m.id for m in messages}
+
+    # A second run the same week finds nobody due except the failed user
+    again = await run_weekly_checkins(FakeBatchProvider(), factory, poll_seconds=0)
+    assert (again.eligible, again.written) == (1, 1)
+
+
+class _CrashingProvider(FakeBatchProvider):
+    """Submits fine, then the worker dies while polling."""
+
+    async def is_done(self, batch_id: str) -> bool:
+        raise RuntimeError("worker restarted")
+
+
+async def test_unwritten_batches_are_resumed_not_resubmitted(db: AsyncSession):
+    users = await _users(db, 3, onboarding_completed=True, language="es")
+    factory = async_sessionmaker(db.bind, expire_on_commit=False)
+    crashing = _CrashingProvider()
+    with pytest.raises(RuntimeError):
+        await run_weekly_checkins(crashing, factory, poll_seconds=0)
+    (batch_id,) = crashing.batches
+
+    provider = FakeBatchProvider(batches=crashing.batches, polls={batch_id: 0})
+    report = await run_weekly_checkins(provider, factory, poll_seconds=0)
+
+    # The recorded batch is polled and written; its users were not submitted again
+    assert (report.resumed, report.batches, report.eligible, report.written) == (1, 0, 0, 3)
+    assert list(provider.batches) == [batch_id]
+    batch = await db.get(CheckInBatch, batch_id)
+    await db.refresh(batch)
+    assert (batch.status, batch.written, batch.failed) == ("written", 3, 0)
+    assert batch.finished_at is not None
+    conversations = await db.scalars(
+        select(Conversation.user_id).where(Conversation.conversation_type == "check_in")
+    )
+    assert set(conversations) == {u.id for u in users}
+
+
+async def test_reply_to_a_check_in_reaches_the_model_with_the_check_in(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    resp = await client.post(
+        "/api/v1/auth/register",
+        json={"email": "reply@example.com", "password": "pass1234", "full_name": "Reply"},
+    )
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    user = (await db.execute(select(User))).scalar_one()
+    user.onboarding_completed = True
+    await db.commit()
+
+    factory = async_sessionmaker(db.bind, expire_on_commit=False)
+    provider = FakeBatchProvider(reply=lambda request: "Dormiste menos esta semana, que paso?")
+    assert (await run_weekly_checkins(provider, factory, poll_seconds=0)).written == 1
+    conversation = (await db.execute(select(Conversation))).scalar_one()
+
+    # Opening it first warms the history cache, which must carry the check-in too
+    await client.get(f"/api/v1/conversations/{conversation.id}/messages", headers=headers)
+    resp = await client.post(
+        f"/api/v1/conversations/{conversation.id}/messages",
+        json={"content": "Tuve mucho trabajo"},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+
+    [request] = fake_llm.requests
+    system = "\n".join(block["text"] for block in request["system"])
+    assert "Dormiste menos esta semana, que paso?" in system
+    assert request["messages"][-1]["content"][-1]["text"] == "Tuve mucho trabajo"
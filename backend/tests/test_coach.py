@@ -1,9 +1,41 @@
 # ABOUTME: Tests for coach conversation and messaging endpoints.
-# ABOUTME: Validates CRUD, ownership, and SSE streaming with mocked Claude API.
+# ABOUTME: Validates CRUD, ownership, SSE streaming against a fake Claude, context and LLM gateway.
 
-from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import json
+import time
+import uuid
+from datetime import UTC, date, datetime, timedelta
+from unittest.mock import patch
 
+import pytest
 from httpx import AsyncClient
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from nove import background, database, metrics
+from nove.coach import admission, context_cache, llm, memory, replay, sse, summary, tools
+from nove.coach.context import fit_sections
+from nove.coach.models import Conversation, Message
+from nove.coach.prompts import (
+    USER_MEMORY_PROMPT_EN,
+    USER_MEMORY_PROMPT_ES,
+    get_system_prompt,
+    get_tools_prompt,
+)
+from nove.coach.routing import FAST_MODEL, FULL_MODEL, choose_route
+from nove.coach.service import MAX_TOOL_ROUNDS, build_context, stream_response
+from nove.coach.summary import SUMMARY_MODEL
+from nove.coach.tools import TOOLS
+from nove.coach.user_memory import fold_memory
+from nove.config import settings
+from nove.database import get_db
+from nove.devtools.fake_anthropic import FakeLLMConfig
+from nove.labs import summary as lab_summary
+from nove.labs.models import LabBiomarkerValue, LabResult
+from nove.labs.service import latest_biomarkers
+from nove.pagination import NEXT_CURSOR_HEADER
+from nove.users.models import User, UserHealthProfile
 
 PREFIX = "/api/v1"
 
@@ -21,6 +53,18 @@ async def _register_and_get_headers(client: AsyncClient) -> dict[str, str]:
     return {"Authorization": f"Bearer {token}"}
 
 
+def _sse_events(body: str) -> list[dict]:
+    """Parse an SSE body into [{id, event, data}], skipping comments."""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in frame.splitlines() if not line.startswith(":")
+        )
+        if fields:
+            events.append({**fields, "data": json.loads(fields["data"])})
+    return events
+
+
 async def test_create_conversation(client: AsyncClient):
     headers = await _register_and_get_headers(client)
 
@@ -84,7 +128,7 @@ async def test_get_messages_empty(client: AsyncClient):
     assert resp.json() == []
 
 
-async def test_send_message_streams_response(client: AsyncClient):
+async def test_send_message_streams_response(client: AsyncClient, fake_llm: FakeLLMConfig):
     headers = await _register_and_get_headers(client)
 
     resp = await client.post(
@@ -94,36 +138,24 @@ async def test_send_message_streams_response(client: AsyncClient):
     )
     conv_id = resp.json()["id"]
 
-    # Mock the Anthropic streaming API
-    mock_stream = AsyncMock()
-    mock_stream.__aenter__ = AsyncMock(return_value=mock_stream)
-    mock_stream.__aexit__ = AsyncMock(return_value=False)
-
-    async def fake_text_stream():
-        yield "Hola, "
-        yield "soy Nove."
-
-    mock_stream.text_stream = fake_text_stream()
-
-    mock_client = MagicMock()
-    mock_client.messages.stream = MagicMock(return_value=mock_stream)
-
-    with patch("nove.coach.service.anthropic.AsyncAnthropic", return_value=mock_client):
-        resp = await client.post(
-            f"{PREFIX}/conversations/{conv_id}/messages",
-            json={"content": "Hola coach"},
-            headers=headers,
-        )
+    fake_llm.reply = "Hola, soy Nove."
+    resp = await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Hola coach"},
+        headers=headers,
+    )
 
     assert resp.status_code == 200
     assert "text/event-stream" in resp.headers["content-type"]
-    body = resp.text
-    assert "Hola, " in body
-    assert "soy Nove." in body
-    assert "[DONE]" in body
+    events = _sse_events(resp.text)
+    assert events[0]["event"] == "start"
+    assert events[-1] == {"event": "done", "data": events[0]["data"]}
+    deltas = events[1:-1]
+    assert "".join(e["data"]["text"] for e in deltas) == "Hola, soy Nove."
+    assert [int(e["id"]) for e in deltas] == sorted(int(e["id"]) for e in deltas)
 
 
-async def test_messages_persisted_after_streaming(client: AsyncClient):
+async def test_messages_persisted_after_streaming(client: AsyncClient, fake_llm: FakeLLMConfig):
     headers = await _register_and_get_headers(client)
 
     resp = await client.post(
@@ -133,24 +165,12 @@ async def test_messages_persisted_after_streaming(client: AsyncClient):
     )
     conv_id = resp.json()["id"]
 
-    mock_stream = AsyncMock()
-    mock_stream.__aenter__ = AsyncMock(return_value=mock_stream)
-    mock_stream.__aexit__ = AsyncMock(return_value=False)
-
-    async def fake_text_stream():
-        yield "Respuesta del coach"
-
-    mock_stream.text_stream = fake_text_stream()
-
-    mock_client = MagicMock()
-    mock_client.messages.stream = MagicMock(return_value=mock_stream)
-
-    with patch("nove.coach.service.anthropic.AsyncAnthropic", return_value=mock_client):
-        await client.post(
-            f"{PREFIX}/conversations/{conv_id}/messages",
-            json={"content": "Pregunta del usuario"},
-            headers=headers,
-        )
+    fake_llm.reply = "Respuesta del coach"
+    await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Pregunta del usuario"},
+        headers=headers,
+    )
 
     resp = await client.get(
         f"{PREFIX}/conversations/{conv_id}/messages",
@@ -195,3 +215,1365 @@ async def test_conversation_ownership(client: AsyncClient):
         headers=headers_b,
     )
     assert resp.status_code == 404
+
+
+# --- Pagination ---
+
+
+async def _seed_messages(db: AsyncSession, conv_id: uuid.UUID, count: int) -> None:
+    started = datetime.now(UTC) - timedelta(days=1)
+    await db.execute(
+        insert(Message),
+        [
+            {
+                "id": uuid.uuid4(),
+                "conversation_id": conv_id,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"Mensaje {i}",
+                # Pairs share a timestamp so the id tiebreak is exercised
+                "created_at": started + timedelta(seconds=i // 2),
+            }
+            for i in range(count)
+        ],
+    )
+    await db.commit()
+
+
+async def test_messages_are_keyset_paginated(client: AsyncClient, db: AsyncSession):
+    headers = await _register_and_get_headers(client)
+    _, conv_id = await _user_and_conversation(client, db, headers)
+    await _seed_messages(db, conv_id, 120)
+
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": 50, **({"cursor": cursor} if cursor else {})}
+        resp = await client.get(
+            f"{PREFIX}/conversations/{conv_id}/messages", params=params, headers=headers
+        )
+        assert resp.status_code == 200
+        pages.append(resp.json())
+        cursor = resp.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+
+    assert [len(p) for p in pages] == [50, 50, 20]
+    # Each page is chronological, and pages walk backwards in time
+    flattened = [m for page in reversed(pages) for m in page]
+    assert len({m["id"] for m in flattened}) == 120
+    assert [m["created_at"] for m in flattened] == sorted(m["created_at"] for m in flattened)
+
+
+async def test_conversations_are_keyset_paginated(client: AsyncClient):
+    headers = await _register_and_get_headers(client)
+    for title in ("Uno", "Dos", "Tres"):
+        await client.post(f"{PREFIX}/conversations", json={"title": title}, headers=headers)
+
+    resp = await client.get(f"{PREFIX}/conversations", params={"limit": 2}, headers=headers)
+    assert [c["title"] for c in resp.json()] == ["Tres", "Dos"]
+
+    resp = await client.get(
+        f"{PREFIX}/conversations",
+        params={"limit": 2, "cursor": resp.headers[NEXT_CURSOR_HEADER]},
+        headers=headers,
+    )
+    assert [c["title"] for c in resp.json()] == ["Uno"]
+    assert NEXT_CURSOR_HEADER not in resp.headers
+
+
+async def test_inbox_orders_by_activity_with_previews(
+    client: AsyncClient, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    ids = {}
+    for title in ("Vieja", "Nueva"):
+        resp = await client.post(f"{PREFIX}/conversations", json={"title": title}, headers=headers)
+        ids[title] = resp.json()["id"]
+
+    fake_llm.reply = "Duerme  ocho\nhoras."
+    await client.post(
+        f"{PREFIX}/conversations/{ids['Vieja']}/messages",
+        json={"content": "Como duermo mejor?"},
+        headers=headers,
+    )
+
+    resp = await client.get(f"{PREFIX}/conversations/inbox", headers=headers)
+    assert resp.status_code == 200
+    inbox = resp.json()
+    assert [c["title"] for c in inbox] == ["Vieja", "Nueva"]
+    assert inbox[0]["message_count"] == 2
+    assert inbox[0]["last_message_preview"] == "Duerme ocho horas."
+    assert inbox[1]["message_count"] == 0
+    assert inbox[1]["last_message_preview"] is None
+
+
+async def test_inbox_paging_while_a_message_arrives(client: AsyncClient, fake_llm: FakeLLMConfig):
+    headers = await _register_and_get_headers(client)
+    ids = {}
+    for title in ("A", "B", "C", "D"):
+        resp = await client.post(f"{PREFIX}/conversations", json={"title": title}, headers=headers)
+        ids[title] = resp.json()["id"]
+
+    async def page(cursor: str | None = None):
+        params = {"limit": 2} | ({"cursor": cursor} if cursor else {})
+        resp = await client.get(f"{PREFIX}/conversations/inbox", params=params, headers=headers)
+        return [c["title"] for c in resp.json()], resp.headers.get(NEXT_CURSOR_HEADER)
+
+    first, cursor = await page()
+    assert first == ["D", "C"]
+
+    # Activity on a conversation already paged past and on one not reached yet
+    for title in ("C", "A"):
+        await client.post(
+            f"{PREFIX}/conversations/{ids[title]}/messages",
+            json={"content": "Hola"},
+            headers=headers,
+        )
+
+    # The accepted trade-off: nothing repeats, but the one not reached yet is
+    # skipped by this pass and shows up on a fresh first page instead
+    second, cursor = await page(cursor)
+    assert second == ["B"]
+    assert cursor is None
+    fresh, _ = await page()
+    assert fresh == ["A", "C"]
+
+
+async def test_invalid_cursor_is_rejected(client: AsyncClient):
+    headers = await _register_and_get_headers(client)
+    resp = await client.get(f"{PREFIX}/conversations", params={"cursor": "nope"}, headers=headers)
+    assert resp.status_code == 400
+
+
+async def test_newest_message_page_is_an_index_range_scan(client: AsyncClient, db: AsyncSession):
+    headers = await _register_and_get_headers(client)
+    _, conv_id = await _user_and_conversation(client, db, headers)
+    _, other_conv_id = await _user_and_conversation(client, db, headers)
+    await _seed_messages(db, conv_id, 2000)
+    await _seed_messages(db, other_conv_id, 20000)
+    await db.execute(text("ANALYZE messages"))
+
+    plan = await db.execute(
+        text(
+            "EXPLAIN SELECT * FROM messages WHERE conversation_id = :conv_id"
+            " ORDER BY created_at DESC, id DESC LIMIT 51"
+        ),
+        {"conv_id": conv_id},
+    )
+    plan_text = "\n".join(row[0] for row in plan)
+    assert "Index Scan Backward using ix_messages_conversation_created" in plan_text
+    assert "Sort" not in plan_text
+
+
+# --- Context cache ---
+
+
+def _system_text(system: list[dict]) -> str:
+    return "\n".join(block["text"] for block in system)
+
+
+async def _user_and_conversation(client: AsyncClient, db: AsyncSession, headers: dict[str, str]):
+    me = await client.get(f"{PREFIX}/users/me", headers=headers)
+    user = await db.get(User, uuid.UUID(me.json()["id"]))
+    resp = await client.post(f"{PREFIX}/conversations", json={"title": "Cache"}, headers=headers)
+    return user, uuid.UUID(resp.json()["id"])
+
+
+async def test_back_to_back_context_assembly_hits_no_db(client: AsyncClient, db: AsyncSession):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.bind.sync_engine, "before_cursor_execute", _count)
+    try:
+        await build_context(user, conv_id, async_sessionmaker(db.bind))
+        assert statements  # cold: profile, wearable, labs, history
+        statements.clear()
+
+        system, _, _ = await build_context(user, conv_id, async_sessionmaker(db.bind))
+        assert statements == []
+        assert "Coach User" in _system_text(system)
+    finally:
+        event.remove(db.bind.sync_engine, "before_cursor_execute", _count)
+
+    resp = await client.get("/metrics")
+    gauges = resp.json()["gauges"]
+    assert gauges["coach_context_cache_hit_rate{section=profile}"] == 0.5
+
+
+async def test_profile_update_invalidates_cached_section(client: AsyncClient, db: AsyncSession):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+
+    system, _, _ = await build_context(user, conv_id, async_sessionmaker(db.bind))
+    assert "Coach User" in _system_text(system)
+
+    resp = await client.patch(
+        f"{PREFIX}/users/me", json={"full_name": "Nuevo Nombre"}, headers=headers
+    )
+    assert resp.status_code == 200
+
+    system, _, _ = await build_context(user, conv_id, async_sessionmaker(db.bind))
+    assert "Nuevo Nombre" in _system_text(system)
+
+
+async def test_history_cache_is_written_through(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+
+    # Warm the history window before the exchange
+    _, history, _ = await build_context(user, conv_id, async_sessionmaker(db.bind))
+    assert history == []
+
+    fake_llm.reply = "Respuesta"
+    await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Pregunta"},
+        headers=headers,
+    )
+
+    _, history, _ = await build_context(user, conv_id, async_sessionmaker(db.bind))
+    assert history[0] == {"role": "user", "content": "Pregunta"}
+    assert history[1]["content"][0]["text"] == "Respuesta"
+
+
+async def test_opening_a_conversation_prefetches_its_context(
+    client: AsyncClient, db: AsyncSession
+):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+
+    resp = await client.get(f"{PREFIX}/conversations/{conv_id}/messages", headers=headers)
+    assert resp.status_code == 200
+    await background.drain()
+    assert metrics.snapshot()["timings"]["coach_prefetch_ms"]["count"] == 1
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.bind.sync_engine, "before_cursor_execute", _count)
+    try:
+        await build_context(
+            user,
+            conv_id,
+            async_sessionmaker(db.bind),
+            data_sections=not settings.coach_tools_enabled,
+        )
+    finally:
+        event.remove(db.bind.sync_engine, "before_cursor_execute", _count)
+    assert statements == []
+
+
+def test_window_read_before_a_write_is_not_cached():
+    conv_id = uuid.uuid4()
+    version = context_cache.history_version(conv_id)
+    # A message is saved while the (now stale) window is being read
+    context_cache.append_history(conv_id, "user", "Hola", 1, 1000)
+    context_cache.store_history(conv_id, None, [], version)
+    assert context_cache.get_history(conv_id) is None
+
+
+class _SlowSession(AsyncSession):
+    """Session that adds a fixed network round-trip to every query."""
+
+    rtt = 0.1
+    # Most connections the engine had checked out, sampled after each query
+    peak = 0
+
+    async def _round_trip(self) -> None:
+        await asyncio.sleep(self.rtt)
+
+    def _sample(self) -> None:
+        _SlowSession.peak = max(_SlowSession.peak, self.bind.pool.checkedout())
+
+    async def execute(self, *args, **kwargs):
+        await self._round_trip()
+        result = await super().execute(*args, **kwargs)
+        self._sample()
+        return result
+
+    async def get(self, *args, **kwargs):
+        await self._round_trip()
+        result = await super().get(*args, **kwargs)
+        self._sample()
+        return result
+
+
+async def test_context_sections_are_fetched_concurrently(client: AsyncClient, db: AsyncSession):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    await db.commit()
+
+    factory = async_sessionmaker(db.bind, class_=_SlowSession)
+    _SlowSession.peak = 0
+    started = time.perf_counter()
+    await build_context(user, conv_id, factory, "como dormi")
+    elapsed = time.perf_counter() - started
+
+    # Eight round-trips back to back would take 800ms+; each of the three
+    # sessions makes about three
+    assert elapsed < 5 * _SlowSession.rtt
+    assert _SlowSession.peak <= 3
+
+
+# --- Prompt accounting ---
+
+
+async def test_turn_records_section_tokens_and_timings(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    _, conv_id = await _user_and_conversation(client, db, headers)
+
+    fake_llm.usage = {"cache_read_input_tokens": 300}
+    await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Hola"},
+        headers=headers,
+    )
+
+    reply = (await db.execute(select(Message).where(Message.role == "assistant"))).scalar_one()
+    meta = reply.metadata_
+    assert meta["max_tokens"] == 1024
+    assert meta["usage"]["cache_read_input_tokens"] == 300
+    assert set(meta["context_tokens"]) == {
+        "system_prompt",
+        "history",
+        "profile",
+        "user_memory",
+        "labs",
+        "wearable",
+        "summary",
+        "memory",
+    }
+    assert meta["context_tokens"]["history"] == 1
+    assert meta["context_tokens"]["labs"] == 0
+    assert 0 <= meta["ttft_ms"] <= meta["latency_ms"]
+
+    timings = metrics.snapshot()["timings"]
+    assert timings["coach_ttft_ms{route=full}"]["count"] == 1
+    assert timings["coach_context_tokens{section=profile}"]["max"] > 0
+
+
+def test_context_over_budget_trims_lowest_priority_first(monkeypatch):
+    monkeypatch.setattr(settings, "coach_context_token_budget", 1000)
+    monkeypatch.setattr(settings, "coach_lab_token_budget", 500)
+    texts = {
+        "profile": "perfil " * 100,
+        "labs": "\n".join(f"- Biomarcador {i}: valor" for i in range(200)),
+        "wearable": "sueno " * 100,
+        "summary": "resumen " * 100,
+        "memory": "- recuerdo " * 100,
+    }
+
+    fitted, tokens = fit_sections(texts, fixed_tokens=200)
+
+    # Labs were cut at a line boundary to their own cap
+    assert fitted["labs"].endswith("valor")
+    assert tokens["labs"] <= 500
+    # Then memory and wearable were dropped whole, and the summary cut to fit
+    assert fitted["memory"] is None and fitted["wearable"] is None
+    assert fitted["profile"] == texts["profile"]
+    assert 200 + sum(tokens.values()) <= 1000
+    counters = metrics.snapshot()["counters"]
+    assert counters["coach_context_trimmed{reason=section_budget,section=labs}"] == 1
+    assert counters["coach_context_trimmed{reason=context_budget,section=memory}"] == 1
+
+
+def test_routing_sends_only_short_follow_ups_to_the_fast_model():
+    ongoing = [{"role": "user", "content": "Hola"}, {"role": "assistant", "content": "Hola!"}]
+
+    assert choose_route("Gracias, lo intento mañana", ongoing, "general").name == "fast"
+    assert choose_route("Gracias", ongoing[:1], "general").reason == "first_turn"
+    assert choose_route("Y mi glucosa?", ongoing, "general").reason == "lab_terms"
+    assert choose_route("Salio 5,8 %", ongoing, "general").reason == "lab_terms"
+    assert choose_route("Si", ongoing, "lab_review").reason == "lab_review"
+    long_turn = "Esta semana dormi poco porque tuve mucho trabajo y ademas entrene tres dias"
+    assert choose_route(long_turn, ongoing, "general").name == "full"
+
+
+async def test_route_is_recorded_per_turn(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    _, conv_id = await _user_and_conversation(client, db, headers)
+
+    for content in ["Quiero mejorar mi sueno", "Ok, gracias"]:
+        await client.post(
+            f"{PREFIX}/conversations/{conv_id}/messages",
+            json={"content": content},
+            headers=headers,
+        )
+
+    assert [r["model"] for r in fake_llm.requests] == [FULL_MODEL, FAST_MODEL]
+    assert fake_llm.requests[-1]["max_tokens"] == 512
+    replies = (
+        (
+            await db.execute(
+                select(Message).where(Message.role == "assistant").order_by(Message.created_at)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert [m.metadata_["route"] for m in replies] == ["full", "fast"]
+    timings = metrics.snapshot()["timings"]
+    assert timings["coach_ttft_ms{route=fast}"]["count"] == 1
+    assert metrics.counter("coach_routes", route="fast", reason="short_turn") == 1
+
+
+# --- Tools ---
+
+
+async def test_labs_are_fetched_through_tools_on_demand(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig, monkeypatch
+):
+    monkeypatch.setattr(settings, "coach_tools_enabled", True)
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    result = LabResult(user_id=user.id, processing_status="verified")
+    db.add(result)
+    await db.flush()
+    db.add(
+        LabBiomarkerValue(
+            result_id=result.id,
+            user_id=user.id,
+            biomarker_code="GLU",
+            biomarker_name="Glucosa",
+            value=128,
+            unit="mg/dL",
+            status="flagged",
+            date=date(2026, 7, 10),
+        )
+    )
+    await db.commit()
+
+    fake_llm.tool_calls = [{"name": "get_biomarker_history", "input": {"biomarker_code": "glu"}}]
+    fake_llm.reply = "Tu glucosa salio en 128."
+    resp = await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Como va mi glucosa?"},
+        headers=headers,
+    )
+    assert "Tu glucosa salio en 128." in resp.text
+
+    first, second = fake_llm.requests
+    assert [t["name"] for t in first["tools"]] == [t["name"] for t in TOOLS]
+    # The tool note is its own block; the cached static prompt is unchanged
+    assert [b["text"] for b in first["system"][:2]] == [
+        get_system_prompt("es"),
+        get_tools_prompt("es"),
+    ]
+    assert "## Resultados de Laboratorio" not in _system_text(first["system"])
+    assert second["messages"][-2]["content"][0]["type"] == "tool_use"
+    [tool_result] = second["messages"][-1]["content"]
+    assert tool_result["content"] == "- Glucosa (GLU): 128.0 mg/dL [FLAGGED] (2026-07-10)"
+
+    reply = (await db.execute(select(Message).where(Message.role == "assistant"))).scalar_one()
+    assert reply.content == "Tu glucosa salio en 128."
+    [call] = reply.metadata_["tool_calls"]
+    assert call["name"] == "get_biomarker_history" and call["ms"] >= 0
+    timings = metrics.snapshot()["timings"]
+    assert timings["coach_tool_ms{tool=get_biomarker_history}"]["count"] == 1
+    assert timings["coach_tool_round_ms"]["count"] == 1
+
+
+async def test_tool_rounds_are_capped(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig, monkeypatch
+):
+    monkeypatch.setattr(settings, "coach_tools_enabled", True)
+    headers = await _register_and_get_headers(client)
+    _, conv_id = await _user_and_conversation(client, db, headers)
+
+    fake_llm.tool_calls = [{"name": "get_wearable_summary", "input": {"days": 30}}] * 5
+    await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Como dormi este mes?"},
+        headers=headers,
+    )
+
+    assert len(fake_llm.requests) == MAX_TOOL_ROUNDS + 1
+    assert fake_llm.requests[-1]["tool_choice"] == {"type": "none"}
+    assert "tool_choice" not in fake_llm.requests[0]
+    tool_result = fake_llm.requests[1]["messages"][-1]["content"][0]
+    assert tool_result["content"].startswith("No hay datos de wearable")
+
+
+async def test_lab_overview_tool_reads_the_cached_lab_section(
+    client: AsyncClient, db: AsyncSession
+):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    result = LabResult(user_id=user.id, processing_status="verified")
+    db.add(result)
+    await db.flush()
+    db.add(
+        LabBiomarkerValue(
+            result_id=result.id,
+            user_id=user.id,
+            biomarker_code="GLU",
+            biomarker_name="Glucosa",
+            value=128,
+            unit="mg/dL",
+            status="flagged",
+            date=date(2026, 7, 10),
+        )
+    )
+    await db.commit()
+    factory = async_sessionmaker(db.bind)
+    system, _, _ = await build_context(user, conv_id, factory)
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.bind.sync_engine, "before_cursor_execute", _count)
+    try:
+        overview = await tools.run("get_lab_overview", {}, user.id, factory)
+    finally:
+        event.remove(db.bind.sync_engine, "before_cursor_execute", _count)
+    assert statements == []
+    assert overview.content in _system_text(system)
+
+    # A new lab value invalidates the section for the tool as well
+    context_cache.invalidate(user.id, "labs")
+    overview = await tools.run("get_lab_overview", {}, user.id, factory)
+    assert metrics.counter("coach_context_cache", section="labs", outcome="miss") == 2
+
+
+# --- Prompt caching ---
+
+
+async def test_prompt_is_sent_as_cacheable_blocks(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    _, conv_id = await _user_and_conversation(client, db, headers)
+
+    fake_llm.reply = "Hola"
+    fake_llm.usage = {"cache_read_input_tokens": 1800}
+    await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Hola coach"},
+        headers=headers,
+    )
+
+    kwargs = fake_llm.requests[-1]
+    static, stable = kwargs["system"][:2]
+    assert static["text"] == get_system_prompt("es")
+    # Tools are off by default, so nothing tells the model to use them
+    assert "tools" not in kwargs
+    assert "herramientas" not in _system_text(kwargs["system"])
+    assert static["cache_control"] == {"type": "ephemeral"}
+    assert "Coach User" in stable["text"]
+    assert stable["cache_control"] == {"type": "ephemeral"}
+    last = kwargs["messages"][-1]["content"][0]
+    assert last == {"type": "text", "text": "Hola coach", "cache_control": {"type": "ephemeral"}}
+
+    result = await db.execute(
+        select(Message).where(Message.conversation_id == conv_id, Message.role == "assistant")
+    )
+    assistant = result.scalar_one()
+    assert assistant.metadata_["usage"]["cache_read_input_tokens"] == 1800
+    assert assistant.metadata_["usage"]["cache_creation_input_tokens"] == 0
+
+
+# --- Long-term memory ---
+
+
+async def test_relevant_turns_from_other_conversations_are_recalled(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    _, first_id = await _user_and_conversation(client, db, headers)
+    _, second_id = await _user_and_conversation(client, db, headers)
+
+    fake_llm.reply = "Prueba con hielo y descanso."
+    await client.post(
+        f"{PREFIX}/conversations/{first_id}/messages",
+        json={"content": "Me duele la rodilla cuando corro"},
+        headers=headers,
+    )
+    await client.post(
+        f"{PREFIX}/conversations/{first_id}/messages",
+        json={"content": "Tambien quiero comer mas verduras"},
+        headers=headers,
+    )
+
+    await client.post(
+        f"{PREFIX}/conversations/{second_id}/messages",
+        json={"content": "Que ejercicios hago para las rodillas si corri ayer?"},
+        headers=headers,
+    )
+
+    # Recall rides on the new user turn, ahead of the message itself
+    recall_block, question = fake_llm.requests[-1]["messages"][-1]["content"]
+    memory_block = recall_block["text"]
+    assert memory_block.startswith("## Memoria de Largo Plazo")
+    assert "(Usuario, " in memory_block
+    assert "Me duele la rodilla cuando corro" in memory_block
+    assert "verduras" not in memory_block
+    # The current conversation is already in the window
+    assert "ayer" not in memory_block
+    assert question == {
+        "type": "text",
+        "text": "Que ejercicios hago para las rodillas si corri ayer?",
+    }
+    assert "Memoria de Largo Plazo" not in _system_text(fake_llm.requests[-1]["system"])
+
+
+async def test_recall_leaves_the_cached_prefix_byte_stable(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    user, first_id = await _user_and_conversation(client, db, headers)
+    _, second_id = await _user_and_conversation(client, db, headers)
+    fake_llm.reply = "Anotado."
+    for content in ("Me duele la rodilla cuando corro", "Quiero comer mas verduras"):
+        await client.post(
+            f"{PREFIX}/conversations/{first_id}/messages",
+            json={"content": content},
+            headers=headers,
+        )
+    started = datetime.now(UTC) - timedelta(minutes=10)
+    for i, (role, content) in enumerate(
+        [("user", "Hola"), ("assistant", "Hola, en que te ayudo?"), ("user", "Y mi rodilla?")]
+    ):
+        db.add(
+            Message(
+                conversation_id=second_id,
+                role=role,
+                content=content,
+                created_at=started + timedelta(minutes=i),
+            )
+        )
+    await db.commit()
+
+    factory = async_sessionmaker(db.bind)
+    system, messages, _ = await build_context(user, second_id, factory, "Y mi rodilla?")
+    context_cache.drop_history(second_id)
+    other_system, other_messages, _ = await build_context(
+        user, second_id, factory, "Y las verduras?"
+    )
+
+    # Only the final turn differs: recall never lands before the last breakpoint
+    assert json.dumps(system) == json.dumps(other_system)
+    assert json.dumps(messages[:-1]) == json.dumps(other_messages[:-1])
+    assert messages[-2]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert "rodilla cuando corro" in messages[-1]["content"][0]["text"]
+    assert "verduras" in other_messages[-1]["content"][0]["text"]
+
+
+async def test_memory_search_ranks_with_bm25_in_both_languages(
+    client: AsyncClient, db: AsyncSession
+):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    documents = [
+        ("es", "Dormi mal y el sueno fue corto"),
+        ("es", "Sueno profundo: el sueno mejora con rutina de sueno"),
+        ("es", "Sueno " + "y muchas otras cosas sin relacion " * 20),
+        ("en", "My sleep was poor and my knees hurt"),
+        ("es", "Hoy comi ensalada"),
+    ]
+    for language, content in documents:
+        await memory.index(db, user.id, "user", uuid.uuid4(), content, language, conv_id)
+    await db.commit()
+
+    hits = await memory.search(db, user.id, "como mejorar mi sueno? sleep", top_k=5)
+    contents = [h.content for h in hits]
+    # Repeated terms rank first; the long document is length-penalized
+    assert contents[0].startswith("Sueno profundo")
+    assert contents.index("Dormi mal y el sueno fue corto") < contents.index(documents[2][1])
+    assert "My sleep was poor and my knees hurt" in contents
+    assert "Hoy comi ensalada" not in contents
+
+
+def test_memory_snippets_fit_the_token_budget():
+    hits = [
+        memory.Hit("assistant", "palabra " * 500, date(2026, 1, 5), 2.0),
+        memory.Hit("lab", "Glucosa 95", date(2026, 1, 4), 1.0),
+    ]
+    text = memory.format_snippets(hits, budget=200)
+    first, second = text.split("\n")
+    assert first.startswith("- (Coach, 2026-01-05) palabra")
+    assert first.endswith("...")
+    assert second == "- (Laboratorio, 2026-01-04) Glucosa 95"
+    assert memory.format_snippets(hits, budget=10) is None
+
+
+# --- History window and rolling summary ---
+
+
+def test_fit_to_budget_keeps_newest_turns_starting_on_user():
+    history = [
+        {"role": "user", "content": "a", "tokens": 400},
+        {"role": "assistant", "content": "b", "tokens": 400},
+        {"role": "user", "content": "c", "tokens": 300},
+        {"role": "assistant", "content": "d", "tokens": 300},
+    ]
+    assert context_cache.fit_to_budget(history, 900)
+    assert [m["content"] for m in history] == ["c", "d"]
+
+    assert not context_cache.fit_to_budget(history, 900)
+
+
+async def test_long_conversation_is_folded_into_summary(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig, monkeypatch
+):
+    monkeypatch.setattr(settings, "coach_history_token_budget", 3000)
+    # The coach reply would go to the same fast model as the summary
+    monkeypatch.setattr(settings, "coach_model_routing", False)
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+
+    started = datetime.now(UTC) - timedelta(hours=1)
+    for i in range(10):
+        db.add(
+            Message(
+                conversation_id=conv_id,
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"Turno {i}",
+                metadata_={"tokens": 1000},
+                created_at=started + timedelta(minutes=i),
+            )
+        )
+    await db.commit()
+
+    fake_llm.reply = "Resumen de lo hablado"
+    await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Pregunta nueva"},
+        headers=headers,
+    )
+    await background.drain()
+
+    [summary_request] = [r for r in fake_llm.requests if r["model"] == SUMMARY_MODEL]
+    [coach_request] = [r for r in fake_llm.requests if r["model"] != SUMMARY_MODEL]
+    assert sum(len(m["content"]) for m in coach_request["messages"]) < 100
+    assert "Turno 0" in summary_request["messages"][0]["content"]
+
+    conversation = await db.get(Conversation, conv_id)
+    await db.refresh(conversation)
+    assert conversation.summary == "Resumen de lo hablado"
+    assert conversation.summary_through is not None
+
+    system, messages, _ = await build_context(user, conv_id, async_sessionmaker(db.bind))
+    assert "Resumen de lo hablado" in _system_text(system)
+    assert messages[0]["role"] == "user"
+    assert all(m["content"] != "Turno 0" for m in messages[:-1])
+
+
+async def test_summary_backlog_is_folded_in_capped_chunks(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig, monkeypatch
+):
+    monkeypatch.setattr(settings, "coach_history_token_budget", 3000)
+    monkeypatch.setattr(summary, "MAX_FOLD_TOKENS", 2500)
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+
+    started = datetime.now(UTC) - timedelta(hours=1)
+    for i in range(10):
+        db.add(
+            Message(
+                conversation_id=conv_id,
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"Turno {i}",
+                metadata_={"tokens": 1000},
+                created_at=started + timedelta(minutes=i),
+            )
+        )
+    await db.commit()
+
+    fake_llm.reply = "Resumen parcial"
+    summary.schedule_refresh(user.id, conv_id)
+    await background.drain()
+
+    # Nine turns fall outside the verbatim half; two fit each fold, oldest first
+    prompts = [r["messages"][0]["content"] for r in fake_llm.requests]
+    assert [p.count("Turno ") for p in prompts] == [2, 2, 2, 2, 1]
+    assert "Turno 0" in prompts[0] and "Resumen previo" not in prompts[0]
+    assert "Resumen previo:\nResumen parcial" in prompts[1]
+    assert "Turno 8" in prompts[-1] and "Turno 9" not in prompts[-1]
+
+    conversation = await db.get(Conversation, conv_id)
+    await db.refresh(conversation)
+    assert conversation.summary_through == started + timedelta(minutes=8)
+
+
+async def test_turns_from_all_conversations_are_folded_into_user_memory(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig, monkeypatch
+):
+    monkeypatch.setattr(settings, "coach_user_memory_trigger_tokens", 200)
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    older = Conversation(user_id=user.id, title="Antes")
+    db.add(older)
+    await db.flush()
+    db.add(
+        Message(
+            conversation_id=older.id,
+            role="user",
+            content="Soy alergico al mani",
+            metadata_={"tokens": 200},
+            created_at=datetime.now(UTC) - timedelta(days=30),
+        )
+    )
+    await db.commit()
+
+    fake_llm.reply = "Salud: alergico al mani. " * 30
+    await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Hola"},
+        headers=headers,
+    )
+    await background.drain()
+    # One turn (about 120 tokens) is below the trigger: nothing is folded yet
+    assert not any(r["system"] == USER_MEMORY_PROMPT_ES for r in fake_llm.requests)
+
+    await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Que puedo desayunar?"},
+        headers=headers,
+    )
+    await background.drain()
+
+    [fold] = [r for r in fake_llm.requests if r["system"] == USER_MEMORY_PROMPT_ES]
+    assert "Soy alergico al mani" in fold["messages"][0]["content"]
+    assert "Que puedo desayunar?" in fold["messages"][0]["content"]
+    profile = await db.get(UserHealthProfile, user.id)
+    await db.refresh(profile)
+    assert profile.ai_summary.startswith("Salud: alergico al mani.")
+    assert profile.ai_summary_through is not None
+
+    # Nothing new since the watermark
+    assert await fold_memory(user.id, async_sessionmaker(db.bind)) is False
+
+    system, _, tokens = await build_context(user, conv_id, async_sessionmaker(db.bind))
+    assert "## Lo que Sabes del Usuario\nSalud: alergico al mani." in _system_text(system)
+    assert 0 < tokens["user_memory"] <= settings.coach_user_memory_token_budget
+
+
+async def test_user_memory_follows_the_user_language_and_is_trimmed_to_budget(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig, monkeypatch
+):
+    monkeypatch.setattr(settings, "coach_user_memory_trigger_tokens", 200)
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    user.language = "en"
+    db.add(
+        Message(
+            conversation_id=conv_id,
+            role="user",
+            content="I am allergic to peanuts",
+            metadata_={"tokens": 200},
+        )
+    )
+    await db.commit()
+
+    line = "- Health: allergic to peanuts, takes vitamin D every morning with breakfast."
+    fake_llm.reply = "\n".join([line] * 40)
+    assert await fold_memory(user.id, async_sessionmaker(db.bind))
+
+    [fold] = fake_llm.requests
+    assert fold["system"] == USER_MEMORY_PROMPT_EN
+    assert fold["messages"][0]["content"].startswith("New messages:\n")
+    assert fold["max_tokens"] > settings.coach_user_memory_token_budget
+    profile = await db.get(UserHealthProfile, user.id)
+    await db.refresh(profile)
+    # Cut back to the budget at a line boundary, never mid-sentence
+    assert summary.estimate_tokens(profile.ai_summary) <= settings.coach_user_memory_token_budget
+    assert set(profile.ai_summary.splitlines()) == {line}
+
+
+async def test_lab_context_uses_precomputed_summaries(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    earlier = LabResult(user_id=user.id, processing_status="verified")
+    result = LabResult(user_id=user.id, processing_status="verified")
+    db.add_all([earlier, result])
+    await db.flush()
+    values = [("GLU", "Glucosa", 128, "flagged"), ("TC", "Colesterol total", 90, "normal")]
+    values += [(f"N{i:02d}", f"Analito {i}", 80, "normal") for i in range(10)]
+    db.add(
+        LabBiomarkerValue(
+            result_id=earlier.id,
+            user_id=user.id,
+            biomarker_code="GLU",
+            biomarker_name="Glucosa",
+            value=110,
+            unit="mg/dL",
+            status="flagged",
+            date=date.today() - timedelta(days=90),
+        )
+    )
+    db.add_all(
+        [
+            LabBiomarkerValue(
+                result_id=result.id,
+                user_id=user.id,
+                biomarker_code=code,
+                biomarker_name=name,
+                value=value,
+                unit="mg/dL",
+                reference_range_low=70,
+                reference_range_high=100,
+                status=bm_status,
+                date=date.today(),
+            )
+            for code, name, value, bm_status in values
+        ]
+    )
+    await db.commit()
+    factory = async_sessionmaker(db.bind, expire_on_commit=False)
+
+    system, _, raw_tokens = await build_context(user, conv_id, factory)
+    assert "### Resumen del" not in _system_text(system)
+    assert "(TC): 90.0 mg/dL" in _system_text(system)
+
+    fake_llm.reply = "Glucosa alta (128 mg/dL); lipidos normales."
+    assert await lab_summary.summarize_result(user.id, result.id, factory)
+    assert "[FLAGGED]" in fake_llm.requests[-1]["messages"][0]["content"]
+    await db.refresh(result)
+    assert result.ai_summary_version == lab_summary.LAB_SUMMARY_VERSION
+
+    # Writing the summary invalidated the cached section
+    system, _, tokens = await build_context(user, conv_id, factory)
+    labs = _system_text(system)
+    assert f"### Resumen del {date.today().isoformat()}\nGlucosa alta (128 mg/dL)" in labs
+    # Raw rows give way to the summary: only the out-of-range trend stays beside it
+    assert labs.count("(GLU)") == 1 and "; antes 110.0" in labs
+    assert "(TC)" not in labs and "(N00)" not in labs
+    assert tokens["labs"] < raw_tokens["labs"] / 2
+
+    # A summary from a newer prompt is never replaced by an older deploy
+    result.ai_summary_version = lab_summary.LAB_SUMMARY_VERSION + 1
+    await db.commit()
+    assert not await lab_summary.summarize_result(user.id, result.id, factory)
+
+
+async def test_lab_context_has_latest_value_per_biomarker_with_delta(
+    client: AsyncClient, db: AsyncSession
+):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    taken = [date(2026, 1, 10), date(2026, 4, 10), date(2026, 7, 10)]
+    for i, day in enumerate(taken):
+        result = LabResult(user_id=user.id, processing_status="verified")
+        db.add(result)
+        await db.flush()
+        values = [("GLU", "Glucosa", 90 + 10 * i)]
+        if i == 0:
+            values.append(("TSH", "Tirotropina", 2.5))
+        db.add_all(
+            [
+                LabBiomarkerValue(
+                    result_id=result.id,
+                    user_id=user.id,
+                    biomarker_code=code,
+                    biomarker_name=name,
+                    value=value,
+                    unit="u",
+                    date=day,
+                )
+                for code, name, value in values
+            ]
+        )
+    await db.commit()
+
+    system, _, _ = await build_context(user, conv_id, async_sessionmaker(db.bind))
+    labs = _system_text(system)
+    assert labs.count("(GLU)") == 1
+    assert "- Glucosa (GLU): 110.0 u [NORMAL] (2026-07-10); antes 100.0 (2026-04-10), +10" in labs
+    # Biomarkers only measured long ago are still there
+    assert "- Tirotropina (TSH): 2.5 u [NORMAL] (2026-01-10)\n" in labs + "\n"
+
+    plan = await db.execute(
+        text(
+            "EXPLAIN "
+            + str(
+                latest_biomarkers([user.id]).compile(
+                    dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}
+                )
+            )
+        )
+    )
+    assert "ix_biomarker_user_code_date" in "\n".join(row[0] for row in plan)
+
+
+async def test_lab_budget_cuts_normal_biomarkers_before_flagged_ones(
+    client: AsyncClient, db: AsyncSession, monkeypatch
+):
+    monkeypatch.setattr(settings, "coach_lab_token_budget", 100)
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    result = LabResult(user_id=user.id, processing_status="verified")
+    db.add(result)
+    await db.flush()
+    # Alphabetically last, so ordering by code alone would cut them first
+    values = [(f"A{i:02d}", f"Analito {i}", "normal") for i in range(30)]
+    values += [("ZGLU", "Glucosa", "flagged"), ("ZTSH", "Tirotropina", "borderline")]
+    db.add_all(
+        [
+            LabBiomarkerValue(
+                result_id=result.id,
+                user_id=user.id,
+                biomarker_code=code,
+                biomarker_name=name,
+                value=1,
+                unit="u",
+                status=bm_status,
+                date=date.today(),
+            )
+            for code, name, bm_status in values
+        ]
+    )
+    await db.commit()
+
+    system, _, _ = await build_context(user, conv_id, async_sessionmaker(db.bind))
+    labs = _system_text(system)
+    assert "(ZGLU): 1.0 u [FLAGGED]" in labs
+    assert "(ZTSH): 1.0 u [BORDERLINE]" in labs
+    assert labs.index("(ZGLU)") < labs.index("(ZTSH)") < labs.index("(A00)")
+    assert "(A29)" not in labs
+
+
+# --- LLM gateway ---
+
+
+async def test_transient_error_before_first_token_is_retried(
+    client: AsyncClient, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    resp = await client.post(f"{PREFIX}/conversations", json={"title": "Retry"}, headers=headers)
+    conv_id = resp.json()["id"]
+
+    fake_llm.fail_next = 2
+    with patch("nove.coach.llm._backoff", return_value=0):
+        resp = await client.post(
+            f"{PREFIX}/conversations/{conv_id}/messages",
+            json={"content": "Hola"},
+            headers=headers,
+        )
+
+    assert _sse_events(resp.text)[-1]["event"] == "done"
+    assert len(fake_llm.requests) == 3
+    assert metrics.counter("llm_retries") == 2
+    assert metrics.counter("llm_requests", outcome="ok") == 1
+
+
+async def test_overloaded_error_mid_stream_ends_the_reply_with_an_error_event(
+    client: AsyncClient, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    resp = await client.post(f"{PREFIX}/conversations", json={"title": "Corte"}, headers=headers)
+    conv_id = resp.json()["id"]
+
+    fake_llm.reply = "Una respuesta que se corta"
+    fake_llm.stream_error_rate = 1.0
+    resp = await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages",
+        json={"content": "Hola"},
+        headers=headers,
+    )
+
+    events = _sse_events(resp.text)
+    assert [e["event"] for e in events if e["event"] != "delta"] == ["start", "error"]
+    assert len(fake_llm.requests) == 1
+
+
+async def test_per_user_concurrency_is_capped(fake_llm: FakeLLMConfig):
+    gateway = llm.get_gateway()
+    gateway.per_user_concurrency = 1
+    fake_llm.gate = asyncio.Event()
+    user_id = uuid.uuid4()
+    params = {"model": "fake", "max_tokens": 10, "messages": [{"role": "user", "content": "x"}]}
+
+    async def call() -> str:
+        async with gateway.stream(user_id, **params) as stream:
+            return "".join([text async for text in stream.text_stream()])
+
+    first = asyncio.create_task(call())
+    second = asyncio.create_task(call())
+    while len(fake_llm.requests) < 1:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+
+    # The second call for the same user waits for a slot instead of hitting the API
+    assert len(fake_llm.requests) == 1
+    fake_llm.gate.set()
+    assert await asyncio.gather(first, second) == [fake_llm.reply, fake_llm.reply]
+    assert len(fake_llm.requests) == 2
+
+
+async def test_admission_queues_briefly_then_sheds_load():
+    controller = admission.AdmissionController(
+        max_streams=1, per_user=2, queue_size=1, wait_seconds=0.1, retry_after=3
+    )
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    await controller.acquire(a)
+    queued = asyncio.create_task(controller.acquire(b))
+    await asyncio.sleep(0)
+    with pytest.raises(admission.OverloadedError) as full:
+        await controller.acquire(c)
+    assert (full.value.reason, full.value.retry_after) == ("queue_full", 3)
+    assert metrics.snapshot()["gauges"]["coach_admission_queue_depth"] == 1
+
+    # A released slot goes straight to the oldest waiter
+    controller.release(a)
+    await queued
+    assert controller.inflight == 1
+
+    with pytest.raises(admission.OverloadedError) as timed_out:
+        await controller.acquire(c)
+    assert timed_out.value.reason == "queue_timeout"
+    controller.release(b)
+    assert controller.inflight == 0
+    assert metrics.counter("coach_admission_rejected", reason="queue_full") == 1
+    assert metrics.counter("coach_admission_rejected", reason="queue_timeout") == 1
+
+
+async def test_stream_over_the_user_cap_gets_503_with_retry_after(
+    client: AsyncClient, fake_llm: FakeLLMConfig
+):
+    controller = admission.AdmissionController(
+        max_streams=10, per_user=1, queue_size=0, wait_seconds=0, retry_after=7
+    )
+    admission.set_controller(controller)
+    headers = await _register_and_get_headers(client)
+    resp = await client.post(f"{PREFIX}/conversations", json={"title": "Carga"}, headers=headers)
+    url = f"{PREFIX}/conversations/{resp.json()['id']}/messages"
+
+    fake_llm.gate = asyncio.Event()
+    first = asyncio.create_task(client.post(url, json={"content": "Hola"}, headers=headers))
+    while controller.inflight == 0:
+        await asyncio.sleep(0.01)
+
+    resp = await client.post(url, json={"content": "Otra"}, headers=headers)
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "7"
+    assert metrics.counter("coach_admission_rejected", reason="user_limit") == 1
+
+    fake_llm.gate.set()
+    assert (await first).status_code == 200
+    await background.drain()
+    assert controller.inflight == 0
+
+
+# --- Connection lifetime ---
+
+
+async def test_streams_in_flight_hold_no_pooled_connections(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    resp = await client.post(f"{PREFIX}/conversations", json={"title": "Pool"}, headers=headers)
+    conv_id = resp.json()["id"]
+    await db.commit()
+
+    # One session per request, like production, instead of the shared test session
+    request_sessions = async_sessionmaker(db.bind, expire_on_commit=False)
+
+    async def per_request_db():
+        async with request_sessions() as session:
+            yield session
+
+    client._transport.app.dependency_overrides[get_db] = per_request_db
+    llm.get_gateway().per_user_concurrency = 100
+    admission.set_controller(
+        admission.AdmissionController(
+            max_streams=100, per_user=100, queue_size=0, wait_seconds=0, retry_after=1
+        )
+    )
+    fake_llm.gate = asyncio.Event()
+
+    streams = [
+        asyncio.create_task(
+            client.post(
+                f"{PREFIX}/conversations/{conv_id}/messages",
+                json={"content": f"Mensaje {i}"},
+                headers=headers,
+            )
+        )
+        for i in range(100)
+    ]
+    # With connections pinned for the whole stream the pool runs dry before this
+    async with asyncio.timeout(10):
+        while len(fake_llm.requests) < 100:
+            await asyncio.sleep(0.01)
+
+    # Every stream is waiting on the model; none of them should pin a connection
+    assert db.bind.pool.checkedout() == 0
+    assert database.engine.pool.checkedout() == 0
+
+    fake_llm.gate.set()
+    responses = await asyncio.gather(*streams)
+    assert all(r.status_code == 200 for r in responses)
+    result = await db.execute(select(Message).where(Message.conversation_id == uuid.UUID(conv_id)))
+    assert len(result.scalars().all()) == 200
+
+
+# --- SSE framing and disconnects ---
+
+
+class _Request:
+    def __init__(self) -> None:
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+async def _chunks(*pieces: str, delay: float = 0):
+    for piece in pieces:
+        await asyncio.sleep(delay)
+        yield piece
+
+
+def _buffer(chunks) -> replay.StreamBuffer:
+    return replay.start(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), chunks)
+
+
+async def test_sse_frames_json_and_coalesces_deltas():
+    buffer = _buffer(_chunks("Linea uno\n", "linea ", "dos"))
+    body = "".join([e async for e in sse.event_stream(_Request(), buffer)])
+    events = _sse_events(body)
+
+    # Deltas that arrive together go out as one event; newlines survive the framing
+    message = {"message_id": str(buffer.message_id)}
+    assert events == [
+        {"id": "0", "event": "start", "data": message},
+        {"id": "3", "event": "delta", "data": {"text": "Linea uno\nlinea dos"}},
+        {"event": "done", "data": message},
+    ]
+
+
+async def test_sse_sends_heartbeats_while_idle(monkeypatch):
+    monkeypatch.setattr(sse, "HEARTBEAT_SECONDS", 0.01)
+    buffer = _buffer(_chunks("Hola", delay=0.05))
+
+    body = "".join([e async for e in sse.event_stream(_Request(), buffer)])
+    assert ": ping\n\n" in body
+    assert _sse_events(body)[-1]["event"] == "done"
+
+
+async def test_client_disconnect_cancels_upstream_and_keeps_partial_reply(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig, monkeypatch
+):
+    monkeypatch.setattr(replay, "RESUME_GRACE_SECONDS", 0)
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    conversation = await db.get(Conversation, conv_id)
+
+    fake_llm.reply = "uno dos tres cuatro cinco seis siete ocho"
+    fake_llm.delta_interval = 0.2
+    message_id = uuid.uuid4()
+    buffer = replay.start(
+        message_id, user.id, conv_id, stream_response(user, conversation, "Cuenta", message_id)
+    )
+    events = sse.event_stream(_Request(), buffer)
+    await anext(events)
+    delta = await anext(events)
+    await events.aclose()
+    await background.drain()
+
+    assert _sse_events(delta)[0]["data"]["text"] == "uno "
+    assert fake_llm.cancelled == 1
+    assert metrics.counter("coach_streams_cancelled") == 1
+
+    partial = await db.get(Message, message_id)
+    assert partial.content == "uno "
+    assert partial.metadata_["truncated"] is True
+
+
+# --- Resumable streams ---
+
+
+async def test_finished_reply_is_replayed_after_last_event_id(
+    client: AsyncClient, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    resp = await client.post(f"{PREFIX}/conversations", json={"title": "Resume"}, headers=headers)
+    conv_id = resp.json()["id"]
+
+    resp = await client.post(
+        f"{PREFIX}/conversations/{conv_id}/messages", json={"content": "Hola"}, headers=headers
+    )
+    message_id = _sse_events(resp.text)[0]["data"]["message_id"]
+
+    resp = await client.get(
+        f"{PREFIX}/conversations/{conv_id}/messages/{message_id}/stream",
+        headers={**headers, "Last-Event-ID": "1"},
+    )
+    events = _sse_events(resp.text)
+    assert "".join(e["data"]["text"] for e in events if e["event"] == "delta") == "soy Nove."
+    assert events[-1]["event"] == "done"
+    assert len(fake_llm.requests) == 1
+
+
+async def test_reconnect_attaches_to_live_reply(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    headers = await _register_and_get_headers(client)
+    user, conv_id = await _user_and_conversation(client, db, headers)
+    conversation = await db.get(Conversation, conv_id)
+
+    fake_llm.gate = asyncio.Event()
+    message_id = uuid.uuid4()
+    buffer = replay.start(
+        message_id, user.id, conv_id, stream_response(user, conversation, "Hola", message_id)
+    )
+    async with asyncio.timeout(5):
+        while not buffer.chunks:
+            await asyncio.sleep(0.01)
+
+    resumed = asyncio.create_task(
+        client.get(
+            f"{PREFIX}/conversations/{conv_id}/messages/{message_id}/stream",
+            headers={**headers, "Last-Event-ID": "1"},
+        )
+    )
+    async with asyncio.timeout(5):
+        while not buffer.subscribers:
+            await asyncio.sleep(0.01)
+    fake_llm.gate.set()
+
+    events = _sse_events((await resumed).text)
+    assert "".join(e["data"]["text"] for e in events if e["event"] == "delta") == "soy Nove."
+    assert len(fake_llm.requests) == 1
+
+
+async def test_resume_is_scoped_to_the_owner(client: AsyncClient, db: AsyncSession):
+    headers = await _register_and_get_headers(client)
+    _, conv_id = await _user_and_conversation(client, db, headers)
+    buffer = replay.start(uuid.uuid4(), uuid.uuid4(), conv_id, _chunks("secreto"))
+
+    resp = await client.get(
+        f"{PREFIX}/conversations/{conv_id}/messages/{buffer.message_id}/stream", headers=headers
+    )
+    assert resp.status_code == 404
+
+
+async def test_replay_buffers_are_evicted_by_count_and_age(monkeypatch):
+    monkeypatch.setattr(replay, "MAX_BUFFERS", 2)
+    first, second, third = (_buffer(_chunks("x")) for _ in range(3))
+    assert replay.get(first.message_id) is None
+    assert replay.get(third.message_id) is third
+
+    await background.drain()
+    monkeypatch.setattr(replay, "MAX_AGE_SECONDS", 0)
+    await asyncio.sleep(0.01)
+    assert replay.get(second.message_id) is None
+    assert replay.get(third.message_id) is None
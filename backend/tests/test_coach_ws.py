@@ -0,0 +1,208 @@
+# ABOUTME: Tests for the WebSocket coach channel.
+# ABOUTME: Drives the socket in-process against the fake Claude: auth, multiplexing, idle memory.
+
+import asyncio
+import gc
+import time
+import tracemalloc
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from nove import database
+from nove.coach import admission, ws
+from nove.coach.prompts import get_system_prompt
+from nove.devtools.asgi_websocket import ASGIWebSocket, WebSocketClosedError
+from nove.devtools.fake_anthropic import FakeLLMConfig
+from nove.main import create_app
+
+PREFIX = "/api/v1"
+PATH = f"{PREFIX}/conversations/ws"
+
+
+async def _register(client: AsyncClient) -> str:
+    resp = await client.post(
+        f"{PREFIX}/auth/register",
+        json={"email": "ws@example.com", "password": "pass1234", "full_name": "Socket User"},
+    )
+    return resp.json()["access_token"]
+
+
+async def _conversation(client: AsyncClient, token: str, title: str) -> str:
+    resp = await client.post(
+        f"{PREFIX}/conversations",
+        json={"title": title},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    return resp.json()["id"]
+
+
+async def _until_done(socket: ASGIWebSocket, replies: int) -> dict[str, dict]:
+    """Collect frames until ``replies`` replies finished, keyed by message id."""
+    streams: dict[str, dict] = {}
+    finished = 0
+    while finished < replies:
+        frame = await socket.receive_json()
+        stream = streams.setdefault(
+            frame["message_id"], {"conversation_id": frame["conversation_id"], "text": ""}
+        )
+        if frame["type"] == "delta":
+            stream["text"] += frame["text"]
+        elif frame["type"] in ("done", "error"):
+            stream["end"] = frame["type"]
+            finished += 1
+    return streams
+
+
+async def test_one_socket_streams_several_conversations(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    token = await _register(client)
+    first = await _conversation(client, token, "Sueno")
+    second = await _conversation(client, token, "Comida")
+    fake_llm.reply = "Respuesta del coach por socket"
+
+    async with ASGIWebSocket(create_app(), PATH) as socket:
+        await socket.send_json({"type": "auth", "token": token})
+        assert await socket.receive_json() == {"type": "ready"}
+
+        await socket.send_json({"type": "send", "conversation_id": first, "content": "Hola"})
+        await socket.send_json({"type": "send", "conversation_id": second, "content": "Hola"})
+        streams = await _until_done(socket, 2)
+        assert {s["conversation_id"] for s in streams.values()} == {first, second}
+        assert all(s["text"] == fake_llm.reply and s["end"] == "done" for s in streams.values())
+
+        # The conversation is not loaded again on later turns; the user is, by primary key
+        statements: list[str] = []
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(database.engine.sync_engine, "before_cursor_execute", _count)
+        try:
+            await socket.send_json({"type": "send", "conversation_id": first, "content": "Otra"})
+            await _until_done(socket, 1)
+        finally:
+            event.remove(database.engine.sync_engine, "before_cursor_execute", _count)
+        assert statements
+        assert sum("users.email" in s for s in statements) == 1
+        assert not any("FROM conversations" in s for s in statements)
+
+        await socket.send_json({"type": "send", "conversation_id": first, "content": None})
+        assert (await socket.receive_json())["detail"] == "Invalid message"
+
+
+async def test_turn_after_a_profile_edit_uses_the_edited_profile(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    token = await _register(client)
+    conversation_id = await _conversation(client, token, "Perfil")
+
+    async with ASGIWebSocket(create_app(), PATH) as socket:
+        await socket.send_json({"type": "auth", "token": token})
+        await socket.receive_json()
+        await socket.send_json(
+            {"type": "send", "conversation_id": conversation_id, "content": "Hola"}
+        )
+        await _until_done(socket, 1)
+
+        resp = await client.patch(
+            f"{PREFIX}/users/me",
+            json={"full_name": "Nombre Nuevo", "language": "en"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert resp.status_code == 200
+        await socket.send_json(
+            {"type": "send", "conversation_id": conversation_id, "content": "Hi"}
+        )
+        await _until_done(socket, 1)
+
+    system = "".join(block["text"] for block in fake_llm.requests[-1]["system"])
+    assert "Nombre: Nombre Nuevo" in system
+    assert "Socket User" not in system
+    assert system.startswith(get_system_prompt("en"))
+
+
+async def test_turn_queued_for_admission_does_not_block_the_socket(
+    client: AsyncClient, db: AsyncSession, fake_llm: FakeLLMConfig
+):
+    token = await _register(client)
+    conversation_id = await _conversation(client, token, "Cola")
+    admission.set_controller(
+        admission.AdmissionController(
+            max_streams=1, per_user=2, queue_size=1, wait_seconds=0.5, retry_after=4
+        )
+    )
+    fake_llm.gate = asyncio.Event()
+    send = {"type": "send", "conversation_id": conversation_id, "content": "Hola"}
+
+    async with ASGIWebSocket(create_app(), PATH) as socket:
+        await socket.send_json({"type": "auth", "token": token})
+        await socket.receive_json()
+        await socket.send_json(send)
+        assert (await socket.receive_json())["type"] == "start"
+        # The second turn waits for the only slot; the socket keeps answering meanwhile
+        await socket.send_json(send)
+        started = time.perf_counter()
+        await socket.send_json({"type": "open", "conversation_id": conversation_id})
+        frame = await socket.receive_json()
+        while frame["type"] != "opened":
+            frame = await socket.receive_json()
+        assert time.perf_counter() - started < 0.25
+
+        shed = await socket.receive_json()
+        while shed["type"] != "error":
+            shed = await socket.receive_json()
+        assert (shed["conversation_id"], shed["retry_after"]) == (conversation_id, 4)
+        fake_llm.gate.set()
+        assert [s["end"] for s in (await _until_done(socket, 1)).values()] == ["done"]
+
+
+async def test_socket_rejects_bad_tokens_and_foreign_conversations(client: AsyncClient):
+    token = await _register(client)
+    app = create_app()
+
+    async with ASGIWebSocket(app, PATH) as socket:
+        await socket.send_json({"type": "auth", "token": "nope"})
+        with pytest.raises(WebSocketClosedError) as closed:
+            await socket.receive_json()
+    assert closed.value.code == ws.CLOSE_UNAUTHORIZED
+
+    resp = await client.post(
+        f"{PREFIX}/auth/register",
+        json={"email": "other@example.com", "password": "pass1234", "full_name": "Other"},
+    )
+    foreign = await _conversation(client, resp.json()["access_token"], "Ajena")
+    async with ASGIWebSocket(app, PATH) as socket:
+        await socket.send_json({"type": "auth", "token": token})
+        await socket.receive_json()
+        await socket.send_json({"type": "open", "conversation_id": foreign})
+        assert (await socket.receive_json())["detail"] == "Conversation not found"
+
+
+async def test_idle_socket_memory_is_small(client: AsyncClient, db: AsyncSession):
+    token = await _register(client)
+    app = create_app()
+    count = 50
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sockets = [ASGIWebSocket(app, PATH) for _ in range(count)]
+    for socket in sockets:
+        await socket.__aenter__()
+        await socket.send_json({"type": "auth", "token": token})
+        await socket.receive_json()
+    gc.collect()
+    per_socket = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+
+    assert len(ws._sockets) == count
+    for socket in sockets:
+        await socket.close()
+    assert not ws._sockets
+    # About 25KB here, nearly all of it the ASGI task, middleware frames and the
+    # test client's queues; CoachSocket itself with its empty maps is ~300 bytes
+    assert per_socket < 40_000, per_socket
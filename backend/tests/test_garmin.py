@@ -6,8 +6,10 @@ from datetime import UTC, date, datetime, timedelta
 from unittest.mock import AsyncMock, patch
 
 from httpx import AsyncClient
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from nove.coach.models import MemoryDocument
 from nove.garmin.models import GarminConnection, GarminDataPoint
 from nove.garmin.service import generate_pkce
 
@@ -226,6 +228,11 @@ async def test_webhook_push(client: AsyncClient, db: AsyncSession):
     assert resp.status_code == 200
     assert resp.json()["status"] == "ok"
 
+    # The day is indexed for the coach's long-term memory
+    result = await db.execute(select(MemoryDocument).where(MemoryDocument.source == "wearable"))
+    document = result.scalar_one()
+    assert document.content == f"Datos de Garmin del {date.today().isoformat()}: Pasos: 8500"
+
 
 async def test_webhook_unknown_user(client: AsyncClient):
     payload = {
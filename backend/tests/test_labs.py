@@ -1,13 +1,21 @@
 # ABOUTME: Tests for lab endpoints, portal auth, and extraction logic.
-# ABOUTME: Validates ordering flow, result retrieval, biomarker history, and confidence routing.
+# ABOUTME: Validates ordering, result retrieval, confidence routing and background PDF processing.
 
+import asyncio
 import uuid
+from datetime import UTC, datetime
 
+import bcrypt
+import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from nove import background
+from nove.config import settings
+from nove.devtools.fake_anthropic import FakeLLMConfig
+from nove.labs import extraction, processing, storage
 from nove.labs.extraction import route_by_confidence, validate_extraction
-from nove.labs.models import LabPanel
+from nove.labs.models import LabPanel, LabPartner, LabResult
 from nove.labs.service import generate_order_code
 
 PREFIX = "/api/v1"
@@ -213,3 +221,198 @@ def test_route_medium_confidence():
 
 def test_route_low_confidence():
     assert route_by_confidence(0.3) == "review_needed"
+
+
+# --- Background processing ---
+
+GLUCOSE = {
+    "biomarker_code": "GLU",
+    "biomarker_name": "Glucosa",
+    "value": 95.0,
+    "unit": "mg/dL",
+    "reference_range_low": 70,
+    "reference_range_high": 100,
+    "confidence": 0.95,
+}
+
+
+@pytest.fixture
+def fake_extraction(monkeypatch, tmp_path, fake_llm: FakeLLMConfig) -> dict[str, asyncio.Event]:
+    """Store PDFs under tmp_path and fake OCR and Gemini.
+
+    The "PDF" bytes are the OCR text; extraction of a text waits on its gate
+    if one is set in the returned dict.
+    """
+    monkeypatch.setattr(settings, "lab_storage_dir", str(tmp_path))
+    monkeypatch.setattr(extraction, "_ocr_pdf_sync", lambda pdf: (pdf.decode(), 1))
+    gates: dict[str, asyncio.Event] = {}
+
+    async def fake_biomarkers(text: str, user_id: uuid.UUID | None = None) -> list[dict]:
+        if text in gates:
+            await gates[text].wait()
+        return [dict(GLUCOSE)]
+
+    monkeypatch.setattr(extraction, "extract_biomarkers", fake_biomarkers)
+    return gates
+
+
+async def _wait_for_status(
+    client: AsyncClient, url: str, headers: dict[str, str], wanted: str
+) -> dict:
+    for _ in range(200):
+        data = (await client.get(url, headers=headers)).json()
+        if data["processing_status"] == wanted:
+            return data
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{url} never reached {wanted}: {data}")
+
+
+async def test_upload_answers_once_stored_and_processes_in_background(
+    client: AsyncClient, db: AsyncSession, fake_extraction: dict[str, asyncio.Event]
+):
+    headers = await _register_user(client)
+    gate = fake_extraction["informe"] = asyncio.Event()
+
+    resp = await client.post(
+        f"{PREFIX}/lab/results/upload",
+        files={"file": ("informe.pdf", b"informe", "application/pdf")},
+        headers=headers,
+    )
+    assert resp.status_code == 202
+    result_id = resp.json()["id"]
+    assert resp.json()["processing_status"] == "pending"
+    key = (await db.get(LabResult, uuid.UUID(result_id))).pdf_storage_key
+    assert storage.download_pdf(key) == b"informe"
+
+    url = f"{PREFIX}/lab/results/{result_id}/status"
+    data = await _wait_for_status(client, url, headers, "processing")
+    assert data["processing_started_at"] and not data["extracted_at"]
+
+    gate.set()
+    await background.drain()
+    data = (await client.get(url, headers=headers)).json()
+    assert data["processing_status"] == "verified"
+    assert data["created_at"] <= data["processing_started_at"] <= data["extracted_at"]
+    assert data["extracted_at"] <= data["processed_at"]
+
+    resp = await client.get(f"{PREFIX}/lab/results/{result_id}", headers=headers)
+    assert [v["biomarker_code"] for v in resp.json()["biomarker_values"]] == ["GLU"]
+    # Processing is claimed once; a second run finds nothing pending
+    assert await processing.process_result(uuid.UUID(result_id)) is None
+
+
+async def test_portal_uploads_have_their_own_lane(
+    client: AsyncClient,
+    db: AsyncSession,
+    fake_extraction: dict[str, asyncio.Event],
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, "lab_processing_concurrency", 1)
+    panel = await _seed_panel(db)
+    partner = LabPartner(
+        name="Lab Central",
+        code_prefix="LCN",
+        password_hash=bcrypt.hashpw(b"portal123", bcrypt.gensalt()).decode(),
+    )
+    db.add(partner)
+    await db.commit()
+    headers = await _register_user(client)
+    resp = await client.post(
+        f"{PREFIX}/lab/orders",
+        json={"panel_id": str(panel.id), "lab_partner_id": str(partner.id)},
+        headers=headers,
+    )
+    order_id = resp.json()["id"]
+    resp = await client.post(
+        f"{PREFIX}/portal/auth/login", json={"code_prefix": "LCN", "password": "portal123"}
+    )
+    portal = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    # The user lane is full
+    gate = fake_extraction["propio"] = asyncio.Event()
+    await client.post(
+        f"{PREFIX}/lab/results/upload",
+        files={"file": ("propio.pdf", b"propio", "application/pdf")},
+        headers=headers,
+    )
+    await client.post(
+        f"{PREFIX}/lab/results/upload",
+        files={"file": ("otro.pdf", b"otro", "application/pdf")},
+        headers=headers,
+    )
+
+    resp = await client.post(
+        f"{PREFIX}/portal/orders/{order_id}/results",
+        files={"file": ("orden.pdf", b"orden", "application/pdf")},
+        headers=portal,
+    )
+    assert resp.status_code == 202
+    result_id = resp.json()["result_id"]
+    data = await _wait_for_status(
+        client, f"{PREFIX}/portal/results/{result_id}/status", portal, "verified"
+    )
+    assert data["processed_at"]
+    user_results = (await client.get(f"{PREFIX}/lab/results", headers=headers)).json()
+    assert {r["processing_status"] for r in user_results if r["id"] != result_id} == {
+        "processing",
+        "pending",
+    }
+
+    gate.set()
+    await background.drain()
+
+
+async def test_waiting_portal_work_gets_the_next_slot_first(monkeypatch):
+    monkeypatch.setattr(settings, "lab_processing_concurrency", 1)
+    monkeypatch.setattr(settings, "lab_portal_concurrency", 0)
+    release = asyncio.Event()
+    order = []
+
+    async def work(lane: str, name: str, hold: bool = False) -> None:
+        async with processing._slot(lane):
+            order.append(name)
+            if hold:
+                await release.wait()
+
+    running = asyncio.create_task(work("user", "running", hold=True))
+    await asyncio.sleep(0)
+    # The user upload queued first, but the portal result overtakes it
+    waiting = [
+        asyncio.create_task(work("user", "user")),
+        asyncio.create_task(work("portal", "portal")),
+    ]
+    await asyncio.sleep(0)
+    assert order == ["running"]
+
+    release.set()
+    await asyncio.gather(running, *waiting)
+    assert order == ["running", "portal", "user"]
+
+
+async def test_results_cut_off_by_a_restart_are_resumed(
+    client: AsyncClient, db: AsyncSession, fake_extraction: dict[str, asyncio.Event]
+):
+    headers = await _register_user(client)
+    user_id = (await client.get(f"{PREFIX}/users/me", headers=headers)).json()["id"]
+    storage.upload_pdf("restart/a.pdf", b"a")
+    storage.upload_pdf("restart/b.pdf", b"b")
+    stalled = LabResult(
+        user_id=uuid.UUID(user_id),
+        pdf_storage_key="restart/a.pdf",
+        processing_status="processing",
+        processing_started_at=datetime.now(UTC) - processing.STALE_AFTER * 2,
+    )
+    running = LabResult(
+        user_id=uuid.UUID(user_id),
+        pdf_storage_key="restart/b.pdf",
+        processing_status="processing",
+        processing_started_at=datetime.now(UTC),
+    )
+    db.add_all([stalled, running])
+    await db.commit()
+
+    assert await processing.resume_pending() == 1
+    await background.drain()
+    await db.refresh(stalled)
+    await db.refresh(running)
+    assert (stalled.processing_status, running.processing_status) == ("verified", "processing")
@@ -0,0 +1,205 @@
+# ABOUTME: Tests for the nudge rule engine and notifications outbox.
+# ABOUTME: Validates rule selection, per-rule evaluation, and nudges fired on Garmin/lab ingest.
+
+import uuid
+from datetime import UTC, date, datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from nove.garmin.models import GarminConnection
+from nove.labs.models import LabBiomarkerValue, LabResult
+from nove.notifications.engine import (
+    _hydrate,
+    clear_state_cache,
+    garmin_observations,
+    lab_observation,
+)
+from nove.notifications.models import Notification
+from nove.notifications.rules import STATE_WINDOW, Observation, UserMetricState, affected_rules
+
+PREFIX = "/api/v1"
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state_cache():
+    clear_state_cache()
+    yield
+    clear_state_cache()
+
+
+def _days_ago(n: int) -> date:
+    return date.today() - timedelta(days=n)
+
+
+async def _register_user(client: AsyncClient) -> str:
+    resp = await client.post(
+        f"{PREFIX}/auth/register",
+        json={
+            "email": f"nudge-{uuid.uuid4().hex[:8]}@example.com",
+            "password": "pass1234",
+            "full_name": "Nudge User",
+        },
+    )
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    me = await client.get(f"{PREFIX}/users/me", headers=headers)
+    return me.json()["id"]
+
+
+# --- Rule selection ---
+
+
+def test_affected_rules_only_match_dependencies():
+    assert [r.id for r in affected_rules({"sleep_hours"})] == ["low_sleep"]
+    assert {r.id for r in affected_rules({"steps", "resting_hr"})} == {
+        "steps_drop",
+        "resting_hr_up",
+    }
+    assert affected_rules({"vo2max"}) == []
+
+
+def test_lab_metrics_match_wildcard_and_specific_rules():
+    assert [r.id for r in affected_rules({"lab:GLU"})] == ["flagged_biomarker"]
+    assert {r.id for r in affected_rules({"lab:HBA1C"})} == {"flagged_biomarker", "hba1c_rising"}
+
+
+# --- Rule evaluation ---
+
+
+def test_garmin_observations_extract_metrics():
+    obs = garmin_observations(
+        "activity", date.today(), {"steps": 9000, "restingHeartRateInBeatsPerMinute": 58}
+    )
+    assert {o.metric: o.value for o in obs} == {"steps": 9000, "resting_hr": 58}
+    assert garmin_observations("sleep", date.today(), {"durationInSeconds": 7200})[0].value == 2
+
+
+def test_low_sleep_fires_after_three_short_nights():
+    (rule,) = affected_rules({"sleep_hours"})
+    state = UserMetricState()
+    nights = [Observation("sleep_hours", _days_ago(i), 5.0) for i in (2, 1)]
+    state.apply(nights)
+    assert rule.evaluate(state, nights) is None
+
+    latest = [Observation("sleep_hours", _days_ago(0), 5.5)]
+    state.apply(latest)
+    nudge = rule.evaluate(state, latest)
+    assert nudge is not None
+    assert nudge.dedupe_key == date.today().isoformat()
+
+
+def test_state_keeps_bounded_window():
+    state = UserMetricState()
+    state.apply([Observation("steps", _days_ago(i), i) for i in range(40)])
+    values = state.values("steps")
+    assert len(values) == 14
+    assert values[-1] == 0  # newest last
+
+
+def test_flagged_biomarker_only_fires_on_flagged():
+    (rule,) = affected_rules({"lab:GLU"})
+    normal = [lab_observation("GLU", date.today(), 90, "normal")]
+    assert rule.evaluate(UserMetricState(), normal) is None
+
+    flagged = [lab_observation("GLU", date.today(), 140, "flagged")]
+    nudge = rule.evaluate(UserMetricState(), flagged)
+    assert nudge is not None
+    assert nudge.payload["biomarker_codes"] == ["GLU"]
+
+    # A whole flagged panel still fits the dedupe key column
+    panel = [lab_observation(f"MARKER_{i:03}", date.today(), 1, "flagged") for i in range(60)]
+    nudge = rule.evaluate(UserMetricState(), panel)
+    assert nudge is not None
+    assert len(nudge.dedupe_key) == len(date.today().isoformat()) + 1 + 16
+    assert rule.evaluate(UserMetricState(), list(reversed(panel))).dedupe_key == nudge.dedupe_key
+
+
+# --- Ingest ---
+
+
+async def test_hydrate_loads_a_window_per_biomarker(client: AsyncClient, db: AsyncSession):
+    user_id = uuid.UUID(await _register_user(client))
+    result = LabResult(user_id=user_id, processing_status="verified")
+    db.add(result)
+    await db.flush()
+    # Glucose is tested daily; HbA1c twice, long before the glucose run started
+    series = [("GLU", _days_ago(i)) for i in range(STATE_WINDOW * 2)]
+    series += [("HBA1C", _days_ago(200)), ("HBA1C", _days_ago(100))]
+    db.add_all(
+        LabBiomarkerValue(
+            result_id=result.id,
+            user_id=user_id,
+            biomarker_code=code,
+            biomarker_name=code,
+            value=5.0,
+            unit="u",
+            date=day,
+        )
+        for code, day in series
+    )
+    await db.commit()
+
+    state = UserMetricState()
+    await _hydrate(db, user_id, state, {"lab:GLU", "lab:HBA1C"})
+    assert len(state.values("lab:GLU")) == STATE_WINDOW
+    assert len(state.values("lab:HBA1C")) == 2
+    assert state.loaded == {"lab:GLU", "lab:HBA1C"}
+
+
+async def test_webhook_ingest_writes_nudge_to_outbox(client: AsyncClient, db: AsyncSession):
+    user_id = await _register_user(client)
+    conn = GarminConnection(
+        user_id=user_id,
+        garmin_user_id=f"garmin-{uuid.uuid4().hex[:8]}",
+        access_token="test-access-token",
+        refresh_token="test-refresh-token",
+        token_expires_at=datetime.now(UTC) + timedelta(days=30),
+    )
+    db.add(conn)
+    await db.commit()
+
+    payload = {
+        "sleep": [
+            {
+                "userId": conn.garmin_user_id,
+                "calendarDate": _days_ago(i).isoformat(),
+                "durationInSeconds": 5 * 3600,
+            }
+            for i in (2, 1, 0)
+        ]
+    }
+    resp = await client.post(f"{PREFIX}/garmin/webhooks", json=payload)
+    assert resp.status_code == 200
+
+    # Re-delivery of the same push must not duplicate the nudge
+    resp = await client.post(f"{PREFIX}/garmin/webhooks", json=payload)
+    assert resp.status_code == 200
+
+    result = await db.execute(select(Notification).where(Notification.user_id == user_id))
+    notifications = result.scalars().all()
+    assert [n.rule_id for n in notifications] == ["low_sleep"]
+    assert notifications[0].status == "pending"
+
+
+async def test_unrelated_data_does_not_fire(client: AsyncClient, db: AsyncSession):
+    user_id = await _register_user(client)
+    conn = GarminConnection(
+        user_id=user_id,
+        garmin_user_id=f"garmin-{uuid.uuid4().hex[:8]}",
+        access_token="test-access-token",
+        refresh_token="test-refresh-token",
+        token_expires_at=datetime.now(UTC) + timedelta(days=30),
+    )
+    db.add(conn)
+    await db.commit()
+
+    payload = {
+        "userMetrics": [{"userId": conn.garmin_user_id, "calendarDate": date.today().isoformat()}]
+    }
+    resp = await client.post(f"{PREFIX}/garmin/webhooks", json=payload)
+    assert resp.status_code == 200
+
+    result = await db.execute(select(Notification).where(Notification.user_id == user_id))
+    assert result.scalars().all() == []
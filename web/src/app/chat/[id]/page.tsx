@@ -7,7 +7,7 @@ import { FormEvent, useCallback, useEffect, useRef, useState } from "react";
 import { useParams, useRouter } from "next/navigation";
 import Link from "next/link";
 import { useAuth } from "@/contexts/auth";
-import { api, API_BASE } from "@/lib/api";
+import { apiPage, API_BASE } from "@/lib/api";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { ScrollArea } from "@/components/ui/scroll-area";
@@ -27,6 +27,7 @@ export default function ConversationPage() {
   const [input, setInput] = useState("");
   const [streaming, setStreaming] = useState(false);
   const [streamingContent, setStreamingContent] = useState("");
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
   const scrollRef = useRef<HTMLDivElement>(null);
 
   const scrollToBottom = useCallback(() => {
@@ -41,12 +42,22 @@ export default function ConversationPage() {
       return;
     }
     if (user && params.id) {
-      api<Message[]>(`/conversations/${params.id}/messages`).then(
-        setMessages,
-      );
+      apiPage<Message>(`/conversations/${params.id}/messages`).then((page) => {
+        setMessages(page.items);
+        setOlderCursor(page.nextCursor);
+      });
     }
   }, [user, authLoading, router, params.id]);
 
+  async function loadOlder() {
+    if (!olderCursor) return;
+    const page = await apiPage<Message>(
+      `/conversations/${params.id}/messages?cursor=${encodeURIComponent(olderCursor)}`,
+    );
+    setMessages((prev) => [...page.items, ...prev]);
+    setOlderCursor(page.nextCursor);
+  }
+
   useEffect(scrollToBottom, [messages, streamingContent, scrollToBottom]);
 
   async function handleSubmit(e: FormEvent) {
@@ -67,50 +78,102 @@ export default function ConversationPage() {
     };
     setMessages((prev) => [...prev, tempUserMsg]);
 
-    try {
-      const token = localStorage.getItem("access_token");
-      const resp = await fetch(
-        `${API_BASE}/conversations/${params.id}/messages`,
-        {
-          method: "POST",
-          headers: {
-            "Content-Type": "application/json",
-            Authorization: `Bearer ${token}`,
-          },
-          body: JSON.stringify({ content: userMessage }),
-        },
-      );
+    const token = localStorage.getItem("access_token");
+    const messagesUrl = `${API_BASE}/conversations/${params.id}/messages`;
+    const reply = {
+      messageId: null as string | null,
+      lastEventId: "0",
+      content: "",
+      finished: false,
+      failed: false,
+    };
 
+    // Reads one SSE response, remembering the last event id so a dropped
+    // connection can resume the same reply instead of generating a new one.
+    async function readEvents(resp: Response) {
       if (!resp.ok || !resp.body) {
         throw new Error("Stream failed");
       }
 
       const reader = resp.body.getReader();
       const decoder = new TextDecoder();
-      let assistantContent = "";
+      let buffer = "";
 
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value, { stream: true });
-        const lines = chunk.split("\n");
+        // Events are separated by a blank line and may span reads
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop() ?? "";
 
-        for (const line of lines) {
-          if (line.startsWith("data: ")) {
-            const data = line.slice(6);
-            if (data === "[DONE]") continue;
-            assistantContent += data;
-            setStreamingContent(assistantContent);
+        for (const frame of frames) {
+          let event = "message";
+          let data = "";
+          for (const line of frame.split("\n")) {
+            if (line.startsWith("id: ")) reply.lastEventId = line.slice(4);
+            else if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
           }
+          if (event === "start") {
+            reply.messageId = JSON.parse(data).message_id;
+          } else if (event === "delta") {
+            reply.content += JSON.parse(data).text;
+            setStreamingContent(reply.content);
+          } else if (event === "done") {
+            reply.finished = true;
+          } else if (event === "error") {
+            reply.failed = true;
+          }
+        }
+      }
+    }
+
+    try {
+      try {
+        await readEvents(
+          await fetch(messagesUrl, {
+            method: "POST",
+            headers: {
+              "Content-Type": "application/json",
+              Authorization: `Bearer ${token}`,
+            },
+            body: JSON.stringify({ content: userMessage }),
+          }),
+        );
+      } catch {
+        // Connection dropped; try to resume below
+      }
+
+      for (
+        let attempt = 0;
+        attempt < 3 && reply.messageId && !reply.finished && !reply.failed;
+        attempt++
+      ) {
+        try {
+          await readEvents(
+            await fetch(`${messagesUrl}/${reply.messageId}/stream`, {
+              headers: {
+                Authorization: `Bearer ${token}`,
+                "Last-Event-ID": reply.lastEventId,
+              },
+            }),
+          );
+        } catch {
+          // Retry while attempts remain
         }
       }
 
+      if (reply.failed || !reply.content) {
+        throw new Error("Stream failed");
+      }
+
       // Replace streaming content with final message
       const assistantMsg: Message = {
-        id: crypto.randomUUID(),
+        id: reply.messageId ?? crypto.randomUUID(),
         role: "assistant",
-        content: assistantContent,
+        content: reply.content,
         created_at: new Date().toISOString(),
       };
       setMessages((prev) => [...prev, assistantMsg]);
@@ -145,6 +208,13 @@ export default function ConversationPage() {
       {/* Messages */}
       <ScrollArea className="flex-1" ref={scrollRef}>
         <div className="mx-auto max-w-3xl space-y-4 px-4 py-6">
+          {olderCursor && (
+            <div className="flex justify-center">
+              <Button variant="ghost" size="sm" onClick={loadOlder}>
+                Cargar mensajes anteriores
+              </Button>
+            </div>
+          )}
           {messages.map((msg) => (
             <div
               key={msg.id}
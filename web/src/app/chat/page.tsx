@@ -16,6 +16,9 @@ interface Conversation {
   conversation_type: string;
   created_at: string;
   updated_at: string;
+  last_message_at: string;
+  last_message_preview: string | null;
+  message_count: number;
 }
 
 export default function ChatPage() {
@@ -26,7 +29,7 @@ export default function ChatPage() {
 
   const fetchConversations = useCallback(async () => {
     try {
-      const data = await api<Conversation[]>("/conversations");
+      const data = await api<Conversation[]>("/conversations/inbox");
       setConversations(data);
     } catch {
       // silently fail on load
@@ -91,8 +94,13 @@ export default function ChatPage() {
                 <CardTitle className="text-base">
                   {conv.title || "Nueva conversacion"}
                 </CardTitle>
+                {conv.last_message_preview && (
+                  <p className="line-clamp-1 text-sm text-muted-foreground">
+                    {conv.last_message_preview}
+                  </p>
+                )}
                 <CardDescription>
-                  {new Date(conv.updated_at).toLocaleDateString("es-GT", {
+                  {new Date(conv.last_message_at).toLocaleDateString("es-GT", {
                     day: "numeric",
                     month: "short",
                     hour: "2-digit",
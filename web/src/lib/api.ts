@@ -46,10 +46,7 @@ async function refreshTokens(): Promise<TokenPair | null> {
   return newTokens;
 }
 
-export async function api<T = unknown>(
-  path: string,
-  options: RequestInit = {}
-): Promise<T> {
+async function request(path: string, options: RequestInit = {}): Promise<Response> {
   const tokens = getTokens();
   const headers: Record<string, string> = {
     "Content-Type": "application/json",
@@ -75,9 +72,26 @@ export async function api<T = unknown>(
     throw new ApiError(resp.status, error.detail || "Request failed");
   }
 
+  return resp;
+}
+
+export async function api<T = unknown>(
+  path: string,
+  options: RequestInit = {}
+): Promise<T> {
+  const resp = await request(path, options);
   return resp.json();
 }
 
+// For cursor-paginated list endpoints: the next page's cursor comes back in a header
+export async function apiPage<T>(
+  path: string,
+  options: RequestInit = {}
+): Promise<{ items: T[]; nextCursor: string | null }> {
+  const resp = await request(path, options);
+  return { items: await resp.json(), nextCursor: resp.headers.get("X-Next-Cursor") };
+}
+
 export class ApiError extends Error {
   constructor(
     public status: number,